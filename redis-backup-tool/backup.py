@@ -3,18 +3,34 @@ from __future__ import annotations
 import json
 import random
 import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import asdict
 from datetime import datetime, timezone
 from pathlib import Path
 from typing import Any
 
+from botocore.exceptions import BotoCoreError, ClientError
+
+from redis_utils import build_cluster_config, make_cluster_client
+from catalog import record_backup
+from checkpoint import BackupCheckpoint
+from chunkstore import ChunkStore
+from digest import item_digests
+from fingerprints import INDEX_SUFFIX, FingerprintWriter, write_sidecar
+from incremental import dump_incremental, load_base
+from keyindex import KEYS_SUFFIX, KeyIndexWriter
+from part_manifest import PARTS_SUFFIX, PartManifestWriter
+from readers import DumpStats, primary_clients, read_keys
+from parts import CHAIN_FILE, PartWriter, is_continuation, part_index
+from s3_utils import MANIFEST_SUFFIX, parse_s3_uri, get_s3_client, start_multipart_upload, upload_file
+
+# Options that shape the part files; a resumed backup keeps the original ones
+_RESUMED_OPTIONS = ("match", "format", "chunk_keys", "batch_keys", "page_size", "compression")
+# An incremental must select and fingerprint keys exactly like its base
+_BASE_OPTIONS = ("match", "format")
 
-from redis_utils import (
-    build_cluster_config,
-    make_cluster_client,
-    key_type,
-    pttl_safe,
-)
-from s3_utils import parse_s3_uri, get_s3_client, upload_file
 
 def _gen_backup_id(env_profile: str) -> str:
     ts = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
@@ -22,111 +38,413 @@ def _gen_backup_id(env_profile: str) -> str:
     return f"redis-backup-{env_profile}-{ts}-{suffix}"
 
 
-def _write_jsonl_part(out_dir: Path, part_idx: int, rows: list[dict[str, Any]]) -> Path:
-    out_dir.mkdir(parents=True, exist_ok=True)
-    p = out_dir / f"keys-part-{part_idx:04d}.jsonl"
-    with p.open("w", encoding="utf-8") as f:
-        for row in rows:
-            f.write(json.dumps(row, ensure_ascii=False) + "\n")
-    return p
-
-
-def _dump_key(r, key: str) -> dict[str, Any] | None:
-    t = key_type(r, key)
-
-    ttl = pttl_safe(r, key)
-    row: dict[str, Any]
-    if t == "string":
-        row = {"type": t, "key": key, "value": r.get(key)}
-    elif t == "hash":
-        row = {"type": t, "key": key, "value": r.hgetall(key)}
-    elif t == "list":
-        row = {"type": t, "key": key, "value": r.lrange(key, 0, -1)}
-    elif t == "set":
-        row = {"type": t, "key": key, "value": sorted(r.smembers(key))}
-    elif t == "zset":
-        items = r.zrange(key, 0, -1, withscores=True)
-        row = {"type": t, "key": key, "value": items}
-    elif t == "stream":
-        entries = r.xrange(key, min="-", max="+", count=None)
-        try:
-            groups = r.xinfo_groups(key)
-        except Exception:
-            groups = []
-        row = {"type": t, "key": key, "value": entries, "groups": groups}
-    else:
-        return None
-    if ttl is not None:
-        row["pttl"] = ttl
-    return row
+def _write_through(items, writer: PartWriter, fmt: str):
+    for item in items:
+        writer.write(item, new_key=fmt == "dump" or not is_continuation(item))
+        yield item
+
+
+def _dump_shard(
+    r,
+    shard_idx: int,
+    keys_dir: Path,
+    args,
+    checkpoint: BackupCheckpoint,
+    name: str,
+    fingerprints: FingerprintWriter,
+    key_index: KeyIndexWriter,
+    manifest: PartManifestWriter,
+    on_part_closed=None,
+) -> DumpStats:
+    pattern = args.match or "*"
+    state = checkpoint.shard(name)
+    stats = DumpStats(**state["stats"])
+    if state["done"]:
+        return stats
+    base = DumpStats(**state["stats"])
+    # One part stream per shard so workers never share a file; compression
+    # happens here, in the worker, while the next batch is being fetched.
+    writer = PartWriter(
+        keys_dir,
+        shard_idx,
+        args.format,
+        args.chunk_keys,
+        codec=args.compression,
+        on_part_closed=on_part_closed,
+        first_part_idx=state["next_part"],
+        key_index=key_index,
+        manifest=manifest,
+    )
+
+    def sync_stats() -> None:
+        stats.raw_bytes = base.raw_bytes + writer.raw_bytes
+        stats.stored_bytes = base.stored_bytes + writer.stored_bytes
+        stats.write_seconds = base.write_seconds + writer.write_seconds
+
+    cursor = state["cursor"]
+    # Fingerprints are tagged with the checkpoint they belong to, so a
+    # resumed backup can drop those read after it
+    epoch = state["next_part"]
+    try:
+        while True:
+            cursor, keys = r.scan(cursor=cursor, match=pattern, count=args.batch_keys)
+            stats.round_trips += 1
+            for i in range(0, len(keys), args.batch_keys):
+                batch = keys[i : i + args.batch_keys]
+                try:
+                    items = read_keys(r, batch, args.format, args.page_size, stats)
+                    written = _write_through(items, writer, args.format)
+                    for key, _t, fingerprint in item_digests(written, args.format):
+                        fingerprints.add(key, fingerprint, shard_idx, epoch)
+                except Exception as e:
+                    # Keep going for robustness
+                    print(f"WARN: failed dumping batch of {len(batch)} keys: {e}")
+            if cursor == 0:
+                break
+            # Parts only close between SCAN replies, so the cursor recorded
+            # with a closed part resumes right after its last key.
+            if writer.rotate():
+                sync_stats()
+                fingerprints.flush()
+                key_index.flush()
+                checkpoint.update(
+                    name,
+                    cursor=cursor,
+                    next_part=writer.part_idx,
+                    done=False,
+                    stats=asdict(stats),
+                )
+                epoch = writer.part_idx
+    finally:
+        writer.close()
+        sync_stats()
+    fingerprints.flush()
+    key_index.flush()
+    checkpoint.update(name, cursor=0, next_part=writer.part_idx, done=True, stats=asdict(stats))
+    return stats
+
+
+class _TeeWriter:
+    def __init__(self, *targets):
+        self.targets = targets
+
+    def write(self, data: bytes) -> int:
+        for t in self.targets:
+            t.write(data)
+        return len(data)
+
+
+class _ArchiveWriter:
+    """Appends finished (already compressed) parts to the backup tarball as
+    soon as each one closes, so no separate archive pass is needed. The tar
+    stream is also fed to the S3 uploader when one is given."""
+
+    def __init__(self, tar_path: Path, out_dir: Path, uploader=None):
+        self.tar_path = tar_path
+        self.out_dir = out_dir
+        self._file = tar_path.open("wb")
+        sink = _TeeWriter(self._file, uploader) if uploader else self._file
+        self._tar = tarfile.open(fileobj=sink, mode="w|")
+        self._lock = threading.Lock()
+        # Offset of each member's data in the tarball, for range reads
+        self.offsets: dict[str, int] = {}
+
+    def add(self, path: Path) -> None:
+        arcname = f"{self.out_dir.name}/{path.relative_to(self.out_dir).as_posix()}"
+        with self._lock:
+            self._tar.add(path, arcname=arcname)
+            padded = -(-path.stat().st_size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+            self.offsets[path.name] = self._tar.offset - padded
+
+    def close(self) -> None:
+        with self._lock:
+            if not self._file.closed:
+                self._tar.close()
+                self._file.close()
+
 
+def _mib(n: float) -> float:
+    return n / (1024 * 1024)
 
-def _tar_gz_folder(src_dir: Path, tar_path: Path) -> Path:
-    with tarfile.open(tar_path, "w:gz") as tar:
-        tar.add(src_dir, arcname=src_dir.name)
-    return tar_path
+
+def _resume_checkpoint(out_dir: Path, args, env_profile: str) -> BackupCheckpoint:
+    checkpoint = BackupCheckpoint.load(out_dir)
+    if checkpoint is None:
+        raise SystemExit(f"No checkpoint to resume in {out_dir}")
+    meta = checkpoint.meta
+    if meta.get("env_profile") != env_profile:
+        raise SystemExit(f"Backup {meta.get('backup_id')} was taken from env '{meta.get('env_profile')}'")
+    # The remaining keys must be dumped the same way as the completed parts
+    for opt in _RESUMED_OPTIONS:
+        setattr(args, opt, meta[opt])
+    return checkpoint
+
+
+def _drop_partial_parts(keys_dir: Path, checkpoint: BackupCheckpoint) -> list[Path]:
+    """Deletes parts written after a shard's last checkpoint and returns the
+    completed ones, which are re-added to the new archive."""
+    shards = checkpoint.meta["shards"]
+    kept: list[Path] = []
+    for p in sorted(keys_dir.glob("keys-part-*")):
+        idx = part_index(p.name)
+        if idx is None:
+            continue
+        if idx[1] >= checkpoint.shard(shards[idx[0]])["next_part"]:
+            p.unlink()
+        else:
+            kept.append(p)
+    return kept
 
 
 def run_backup(args) -> int:
     cfg = build_cluster_config(args.env_profile, args.redis_nodes)
-    rc = make_cluster_client(cfg)
-
-    backup_id = _gen_backup_id(cfg.env_profile)
     out_root = Path(args.out_dir).expanduser().resolve()
+    if args.chunk_store and not args.s3_uri:
+        raise SystemExit("--chunk-store requires S3_URI")
+
+    checkpoint = None
+    base_dir = None
+    base_meta: dict[str, Any] = {}
+    if args.resume:
+        if args.base:
+            raise SystemExit("--resume is not supported for incremental backups")
+        backup_id = args.resume
+        checkpoint = _resume_checkpoint(out_root / backup_id, args, cfg.env_profile)
+    else:
+        backup_id = _gen_backup_id(cfg.env_profile)
+    if args.base:
+        base_dir, base_meta = load_base(args.base, out_root, cfg.env_profile, args.s3_uri)
+        for opt in _BASE_OPTIONS:
+            setattr(args, opt, base_meta.get(opt, "jsonl" if opt == "format" else None))
     out_dir = out_root / backup_id
     keys_dir = out_dir / "keys"
     keys_dir.mkdir(parents=True, exist_ok=True)
 
-    part_rows: list[dict] = []
-    part_idx = 0
-    total = 0
+    # DUMP payloads and keys must stay raw bytes to be byte-for-byte faithful
+    rc = make_cluster_client(cfg, decode_responses=args.format != "dump")
+    primaries = primary_clients(rc)
+    workers = max(1, min(args.workers or len(primaries), len(primaries)))
 
-    # Metadata
-    meta = {
-        "backup_id": backup_id,
-        "created_at": datetime.now(timezone.utc).isoformat(),
-        "env_profile": cfg.env_profile,
-        "match": args.match,
-        "chunk_keys": args.chunk_keys,
-    }
-
-    # Iterate keys
-    pattern = args.match or "*"
-    for key in rc.scan_iter(match=pattern, count=1000):
-        try:
-            row = _dump_key(rc, key)
-            if row is None:
-                continue
-            part_rows.append(row)
-            total += 1
-            if len(part_rows) >= args.chunk_keys:
-                _write_jsonl_part(keys_dir, part_idx, part_rows)
-                part_rows.clear()
-                part_idx += 1
-        except Exception as e:
-            # Keep going for robustness
-            print(f"WARN: failed dumping key {key}: {e}")
-
-    if part_rows:
-        _write_jsonl_part(keys_dir, part_idx, part_rows)
-
-    meta["total_keys"] = total
-    with (out_dir / "metadata.json").open("w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
-
-    # Create tar.gz next to folder
-    tar_path = out_root / f"{backup_id}.tar.gz"
-    _tar_gz_folder(out_dir, tar_path)
-    print(f"Backup written: {out_dir}")
-    print(f"Archive: {tar_path}")
+    completed_parts: list[Path] = []
+    if checkpoint is not None:
+        # SCAN cursors are only meaningful on the node that issued them
+        if [name for name, _ in primaries] != checkpoint.meta["shards"]:
+            raise SystemExit(
+                "Cluster primaries changed since the checkpoint; "
+                "the backup cannot be resumed, start a new one"
+            )
+        meta = checkpoint.meta
+        meta["workers"] = workers
+        completed_parts = _drop_partial_parts(keys_dir, checkpoint)
+        done = sum(1 for name in meta["shards"] if checkpoint.shard(name)["done"])
+        print(
+            f"Resuming {backup_id}: {len(completed_parts)} completed parts, "
+            f"{done}/{len(meta['shards'])} shards done"
+        )
+    else:
+        # Metadata
+        meta = {
+            "backup_id": backup_id,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "env_profile": cfg.env_profile,
+            "match": args.match,
+            "format": args.format,
+            "chunk_keys": args.chunk_keys,
+            "batch_keys": args.batch_keys,
+            "page_size": args.page_size,
+            "compression": args.compression,
+            "shards": [name for name, _ in primaries],
+            "workers": workers,
+            "backup_type": "incremental" if args.base else "full",
+        }
+        if args.base:
+            # Restore applies the chain oldest first: full backup, then each
+            # incremental on top of it
+            meta["base_backup_id"] = args.base
+            meta["chain"] = base_meta.get("chain", [args.base]) + [backup_id]
+            with (out_dir / CHAIN_FILE).open("w", encoding="utf-8") as f:
+                json.dump({"chain": meta["chain"], "format": args.format}, f, indent=2)
+        else:
+            checkpoint = BackupCheckpoint(out_dir, meta)
+            checkpoint.save()
 
-    # Upload if requested
+    # Set the uploader up front so parts stream to S3 while the dump is
+    # still running (the multipart upload starts with the first part). In chunk-store mode each finished part is
+    # chunked and only chunks the store lacks are uploaded.
+    uploader = None
+    chunks = None
     if args.s3_uri:
         loc = parse_s3_uri(args.s3_uri)
         if not loc:
             raise SystemExit("Invalid S3 URI")
-        s3 = get_s3_client()
-        s3_uri = upload_file(s3, loc, cfg.env_profile, str(tar_path), tar_path.name)
-        print(f"Uploaded: {s3_uri}")
+    if args.chunk_store:
+        chunks = ChunkStore(
+            get_s3_client(), loc, cfg.env_profile, args.compression, args.s3_concurrency
+        )
+        print(f"Uploading parts to the chunk store under {args.s3_uri}")
+    elif args.s3_uri:
+        uploader = start_multipart_upload(
+            get_s3_client(),
+            loc,
+            cfg.env_profile,
+            f"{backup_id}.tar",
+            part_size=args.s3_part_size_mb * 1024 * 1024,
+            concurrency=args.s3_concurrency,
+        )
+        print(f"Streaming archive to {uploader.uri}")
+
+    # Scan every primary independently; each shard writes its own part stream
+    # and every finished part goes straight into the archive. A resumed
+    # backup rebuilds the archive, starting with the parts already on disk.
+    tar_path = out_root / f"{backup_id}.tar"
+    archive = _ArchiveWriter(tar_path, out_dir, uploader)
+    # A resumed backup keeps the index records of committed parts only
+    committed = None
+    if args.resume:
+        committed = {i: checkpoint.shard(name)["next_part"] for i, name in enumerate(meta["shards"])}
+    fingerprints = FingerprintWriter(out_dir, args.compression, committed)
+    key_index = KeyIndexWriter(out_dir, args.format, args.compression, committed, meta.get("chain"))
+    part_manifest = PartManifestWriter(
+        out_dir, args.format, keep={p.name for p in completed_parts} if args.resume else None
+    )
 
+    def part_closed(path: Path) -> None:
+        archive.add(path)
+        if chunks:
+            chunks.add(path)
+
+    stats = DumpStats()
+    started = time.perf_counter()
+    print(f"Dumping {len(primaries)} primaries with {workers} workers")
+    try:
+        if base_dir is not None:
+            print(f"Incremental backup against {args.base}")
+            archive.add(out_dir / CHAIN_FILE)
+            stats, tombstones_path = dump_incremental(
+                rc,
+                primaries,
+                base_dir,
+                out_dir,
+                args,
+                fingerprints,
+                key_index,
+                part_manifest,
+                workers,
+                part_closed,
+            )
+            part_closed(tombstones_path)
+        else:
+            for p in completed_parts:
+                part_closed(p)
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                futures = {
+                    pool.submit(
+                        _dump_shard,
+                        r,
+                        idx,
+                        keys_dir,
+                        args,
+                        checkpoint,
+                        name,
+                        fingerprints,
+                        key_index,
+                        part_manifest,
+                        part_closed,
+                    ): name
+                    for idx, (name, r) in enumerate(primaries)
+                }
+                for fut in as_completed(futures):
+                    shard_stats = fut.result()
+                    stats.merge(shard_stats)
+                    print(
+                        f"Shard {futures[fut]} done: {shard_stats.keys} keys, "
+                        f"{shard_stats.round_trips} round trips"
+                    )
+        index_paths = fingerprints.close()
+        key_index_path = key_index.close(archive.offsets)
+        manifest_path = part_manifest.close()
+        for p in index_paths + [key_index_path, manifest_path]:
+            archive.add(p)
+        elapsed = time.perf_counter() - started
+        print(
+            f"Dumped {stats.keys} keys in {stats.round_trips} round trips "
+            f"({stats.round_trips_per_key:.3f} per key)"
+        )
+        ratio = stats.raw_bytes / stats.stored_bytes if stats.stored_bytes else 0.0
+        per_worker = _mib(stats.raw_bytes) / stats.write_seconds if stats.write_seconds else 0.0
+        overall = _mib(stats.raw_bytes) / elapsed if elapsed else 0.0
+        print(
+            f"Compression ({args.compression}): {_mib(stats.raw_bytes):.1f} MiB -> "
+            f"{_mib(stats.stored_bytes):.1f} MiB (x{ratio:.2f}), "
+            f"{per_worker:.1f} MiB/s per worker, {overall:.1f} MiB/s overall"
+        )
+
+        meta["total_keys"] = stats.keys
+        meta["round_trips"] = stats.round_trips
+        meta["raw_bytes"] = stats.raw_bytes
+        meta["stored_bytes"] = stats.stored_bytes
+        meta["parts"] = len(part_manifest.entries)
+        meta_path = out_dir / "metadata.json"
+        with meta_path.open("w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        archive.add(meta_path)
+        archive.close()
+        if uploader:
+            s3_uri = uploader.complete()
+            total = time.perf_counter() - started
+            print(
+                f"Uploaded: {s3_uri} ({uploader.parts} parts, "
+                f"{_mib(uploader.bytes_written):.1f} MiB, {total:.1f}s since dump start)"
+            )
+        if chunks:
+            manifest_uri = chunks.finish(backup_id, meta)
+            total = time.perf_counter() - started
+            print(
+                f"Chunk store: {chunks.new_chunks} of {chunks.chunks} chunks new, "
+                f"{_mib(chunks.uploaded_bytes):.1f} MiB uploaded for "
+                f"{_mib(chunks.raw_bytes):.1f} MiB of parts ({total:.1f}s since dump start)"
+            )
+            print(f"Manifest: {manifest_uri}")
+        if args.s3_uri:
+            # Fingerprints for later incrementals, without the whole archive
+            sidecar = write_sidecar(
+                out_dir, out_root / f"{backup_id}{INDEX_SUFFIX}", index_paths + [meta_path]
+            )
+            upload_file(get_s3_client(), loc, cfg.env_profile, str(sidecar), sidecar.name)
+            # Key index on its own, for point lookups with range reads
+            upload_file(
+                get_s3_client(), loc, cfg.env_profile, str(key_index_path), f"{backup_id}{KEYS_SUFFIX}"
+            )
+            # Part checksums and sizes, for list and for validating parts
+            # with range reads
+            summary = part_manifest.write_summary(
+                out_root / f"{backup_id}{PARTS_SUFFIX}", meta, archive.offsets if uploader else {}
+            )
+            upload_file(get_s3_client(), loc, cfg.env_profile, str(summary), summary.name)
+            # Last, so the catalog only lists complete backups
+            backup_object = f"{backup_id}{MANIFEST_SUFFIX}" if chunks else f"{backup_id}.tar"
+            try:
+                stored = sum(e["bytes"] for e in part_manifest.entries)
+                record_backup(
+                    get_s3_client(), loc, cfg.env_profile, backup_object, {**meta, "stored_bytes": stored}
+                )
+            except (ClientError, BotoCoreError) as e:
+                # The backup itself is complete; an old botocore without
+                # conditional writes fails here with a ParamValidationError
+                print(f"WARN: backup catalog not updated: {e}; run: list --rebuild-catalog")
+    except BaseException:
+        archive.close()
+        if uploader:
+            uploader.abort()
+        if chunks:
+            chunks.abort()
+        if checkpoint is not None:
+            print(f"Backup interrupted; continue it with: backup --resume {backup_id}")
+        raise
+    fingerprints.remove_spills()
+    key_index.remove_spills()
+    if checkpoint is not None:
+        checkpoint.remove()
+    print(f"Backup written: {out_dir}")
+    print(f"Archive: {tar_path}")
     return 0
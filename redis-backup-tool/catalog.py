@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import random
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from part_manifest import load_parts_summary
+from s3_utils import (
+    BACKUP_SUFFIXES,
+    S3Location,
+    get_object_if_changed,
+    list_backups,
+    object_key,
+    put_object_if_match,
+)
+
+# One object per env prefix: {"version", "latest", "backups": {id: entry}}
+CATALOG_FILE = "catalog.json"
+CATALOG_VERSION = 1
+# Local copies of the catalog, revalidated against its ETag on every use
+CACHE_DIR_ENV = "REDIS_BACKUP_CACHE_DIR"
+
+_ENTRY_FIELDS = (
+    "created_at",
+    "backup_type",
+    "base_backup_id",
+    "format",
+    "compression",
+    "total_keys",
+    "raw_bytes",
+    "stored_bytes",
+    "parts",
+)
+_UPDATE_ATTEMPTS = 8
+
+
+def backup_id_of(key: str) -> str:
+    name = Path(key).name
+    for suffix in BACKUP_SUFFIXES:
+        if name.endswith(suffix):
+            return name[: -len(suffix)]
+    return name
+
+
+def _cache_path(loc: S3Location, env_profile: str) -> Path:
+    root = os.environ.get(CACHE_DIR_ENV) or Path.home() / ".cache" / "redis-backup-tool"
+    where = f"{loc.bucket}/{object_key(loc, env_profile, CATALOG_FILE)}"
+    return Path(root) / f"catalog-{hashlib.sha256(where.encode('utf-8')).hexdigest()[:16]}.json"
+
+
+def _read_cache(path: Path) -> tuple[str | None, dict[str, Any] | None]:
+    try:
+        cached = json.loads(path.read_text(encoding="utf-8"))
+        return cached["etag"], cached["catalog"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+
+def _write_cache(path: Path, etag: str, catalog: dict[str, Any]) -> None:
+    # The cache only saves a download; failing to write it is harmless
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps({"etag": etag, "catalog": catalog}), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def _fetch(s3: Any, loc: S3Location, env_profile: str) -> tuple[str | None, dict[str, Any] | None]:
+    """ETag and content of the catalog; the cached copy is reused when S3
+    answers 304 Not Modified."""
+    path = _cache_path(loc, env_profile)
+    etag, cached = _read_cache(path)
+    try:
+        fetched = get_object_if_changed(s3, loc, env_profile, CATALOG_FILE, etag)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return None, None
+        raise
+    if fetched is None:
+        return etag, cached
+    data, etag = fetched
+    catalog = json.loads(data)
+    _write_cache(path, etag, catalog)
+    return etag, catalog
+
+
+def load_catalog(s3: Any, loc: S3Location, env_profile: str) -> dict[str, Any] | None:
+    """The env's backup catalog, or None when it has none yet."""
+    catalog = _fetch(s3, loc, env_profile)[1]
+    if catalog is not None and catalog.get("version", 0) > CATALOG_VERSION:
+        raise SystemExit(f"Backup catalog version {catalog['version']} is newer than this tool")
+    return catalog
+
+
+def _entry(key: str, last_modified: datetime, size: int, meta: dict[str, Any]) -> dict[str, Any]:
+    entry = {"key": key, "last_modified": last_modified.isoformat(), "size": size}
+    entry.update((field, meta[field]) for field in _ENTRY_FIELDS if meta.get(field) is not None)
+    return entry
+
+
+def _newness(entry: dict[str, Any]) -> tuple[str, str]:
+    # S3 times have second precision; backups made in the same second are
+    # told apart by their creation time
+    return str(entry["last_modified"]), entry.get("created_at", "")
+
+
+def _new_catalog(backups: dict[str, dict[str, Any]]) -> dict[str, Any]:
+    latest = max(backups, key=lambda b: _newness(backups[b]), default=None)
+    return {"version": CATALOG_VERSION, "latest": latest, "backups": backups}
+
+
+def _scan(s3: Any, loc: S3Location, env_profile: str) -> dict[str, dict[str, Any]]:
+    """Catalog entries for every backup in a full listing, with the
+    totals from each backup's part summary when it has one."""
+    backups = {}
+    for item in list_backups(s3, loc, env_profile=env_profile):
+        backup_id = backup_id_of(item["key"])
+        meta = load_parts_summary(s3, loc, env_profile, backup_id) or {}
+        if meta.get("parts") is not None:
+            meta = {**meta, "parts": len(meta["parts"])}
+        backups[backup_id] = _entry(item["key"], item["last_modified"], item["size"], meta)
+    return backups
+
+
+def _store(
+    s3: Any, loc: S3Location, env_profile: str, catalog: dict[str, Any], etag: str | None
+) -> bool:
+    data = json.dumps(catalog, ensure_ascii=False, indent=1).encode("utf-8")
+    new_etag = put_object_if_match(s3, loc, env_profile, CATALOG_FILE, data, etag)
+    if new_etag is None:
+        return False
+    _write_cache(_cache_path(loc, env_profile), new_etag, catalog)
+    return True
+
+
+def rebuild_catalog(s3: Any, loc: S3Location, env_profile: str) -> dict[str, Any]:
+    """Replaces the catalog with one built from a full listing."""
+    for attempt in range(_UPDATE_ATTEMPTS):
+        etag = _fetch(s3, loc, env_profile)[0]
+        catalog = _new_catalog(_scan(s3, loc, env_profile))
+        if _store(s3, loc, env_profile, catalog, etag):
+            return catalog
+        time.sleep(random.uniform(0, 0.1 * 2**attempt))
+    raise SystemExit("Backup catalog kept changing while it was rebuilt; try again")
+
+
+def record_backup(
+    s3: Any, loc: S3Location, env_profile: str, object_name: str, meta: dict[str, Any]
+) -> None:
+    """Adds an uploaded backup to the catalog. Concurrent backups each
+    retry their conditional write until it lands on the latest version,
+    so none of them is lost."""
+    key = object_key(loc, env_profile, object_name)
+    head = s3.head_object(Bucket=loc.bucket, Key=key)
+    entry = _entry(key, head["LastModified"], head["ContentLength"], meta)
+    for attempt in range(_UPDATE_ATTEMPTS):
+        etag, catalog = _fetch(s3, loc, env_profile)
+        if catalog is None:
+            # First catalog of this env: take in the backups already there
+            print("Building the backup catalog from a listing of S3")
+            backups = _scan(s3, loc, env_profile)
+        else:
+            backups = catalog["backups"]
+        backups[backup_id_of(key)] = entry
+        if _store(s3, loc, env_profile, _new_catalog(backups), etag):
+            return
+        time.sleep(random.uniform(0, 0.1 * 2**attempt))
+    print(f"WARN: backup catalog not updated after {_UPDATE_ATTEMPTS} attempts; run: list --rebuild-catalog")
+
+
+def catalog_items(catalog: dict[str, Any]) -> list[dict[str, Any]]:
+    """Catalog entries as ``list_backups`` items, newest first."""
+    entries = sorted(catalog["backups"].values(), key=_newness, reverse=True)
+    return [
+        {**entry, "last_modified": datetime.fromisoformat(entry["last_modified"])}
+        for entry in entries
+    ]
+
+
+def _exists(s3: Any, loc: S3Location, key: str) -> bool:
+    try:
+        s3.head_object(Bucket=loc.bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("NoSuchKey", "404"):
+            return False
+        raise
+    return True
+
+
+def find_backup(
+    s3: Any, loc: S3Location, env_profile: str, backup_id: str | None = None
+) -> dict[str, Any] | None:
+    """The backup ``backup_id`` (the latest one with None) as a
+    ``list_backups`` item. The catalog answers without a listing; backups
+    it does not know (or stale entries) fall back to listing S3."""
+    catalog = load_catalog(s3, loc, env_profile)
+    if catalog is not None:
+        found = catalog["latest"] if backup_id is None else backup_id
+        entry = catalog["backups"].get(found) if found else None
+        if entry and _exists(s3, loc, entry["key"]):
+            return {**entry, "last_modified": datetime.fromisoformat(entry["last_modified"])}
+        if entry:
+            print(f"WARN: backup catalog lists {entry['key']}, which is gone; run: list --rebuild-catalog")
+    backups = list_backups(s3, loc, env_profile=env_profile)
+    if backup_id is None:
+        return backups[0] if backups else None
+    for item in backups:
+        if backup_id_of(item["key"]) == backup_id:
+            return item
+    return None
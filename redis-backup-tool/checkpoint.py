@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from parts import PartStream, iter_part_items
+
+CHECKPOINT_FILE = "checkpoint.json"
+
+
+def _write_json(path: Path, data: Any) -> None:
+    # Write-then-rename so a crash never leaves a half-written file
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+class BackupCheckpoint:
+    """Per-shard progress of a running backup, kept in ``checkpoint.json``
+    inside the backup directory. A shard's entry is only advanced when a part
+    closes, so its SCAN cursor always points just past the keys already
+    sitting in completed parts."""
+
+    def __init__(self, out_dir: Path, meta: dict[str, Any], shards: dict[str, dict[str, Any]] | None = None):
+        self.path = out_dir / CHECKPOINT_FILE
+        self.meta = meta
+        self.shards: dict[str, dict[str, Any]] = shards or {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, out_dir: Path) -> "BackupCheckpoint | None":
+        path = out_dir / CHECKPOINT_FILE
+        if not path.exists():
+            return None
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(out_dir, data["meta"], data.get("shards", {}))
+
+    def shard(self, name: str) -> dict[str, Any]:
+        with self._lock:
+            state = self.shards.get(name)
+        return dict(state) if state else {"cursor": 0, "next_part": 0, "done": False, "stats": {}}
+
+    def update(self, name: str, **state: Any) -> None:
+        with self._lock:
+            self.shards[name] = state
+            self._save()
+
+    def save(self) -> None:
+        with self._lock:
+            self._save()
+
+    def _save(self) -> None:
+        _write_json(self.path, {"meta": self.meta, "shards": self.shards})
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+
+
+class KeyLog:
+    """Keys a restore worker is about to write, one JSON string per line,
+    in a file per journal barrier. Written ahead of the pipeline, so after
+    a crash it names every key the worker may have applied since the last
+    saved position."""
+
+    def __init__(self, journal: "RestoreJournal", worker: int, seq: int):
+        self.journal = journal
+        self.worker = worker
+        self._f = journal.key_log_path(worker, seq).open("a", encoding="utf-8")
+
+    def write(self, keys: Iterable[str]) -> None:
+        self._f.write("".join(json.dumps(key) + "\n" for key in keys))
+        self._f.flush()
+
+    def rotate(self, seq: int) -> None:
+        """Starts the file of barrier ``seq``; called once everything before
+        it is flushed, so earlier files can go when ``seq`` is saved."""
+        self._f.close()
+        self._f = self.journal.key_log_path(self.worker, seq).open("a", encoding="utf-8")
+
+    def close(self) -> None:
+        self._f.close()
+
+
+class RestoreJournal:
+    """Progress of a restore, kept in ``--work-dir``: the part files already
+    applied and how many items of the current part were. Compressed parts
+    cannot be seeked, so a resumed restore re-reads the current part and
+    drops its first ``items`` items instead of resending them.
+
+    Workers run ahead of the saved position, so keys past it may already be
+    (partly) written. Without --overwrite such a key would be skipped as
+    existing, losing its remaining pages; workers therefore log the keys
+    they write (``KeyLog``) and a resumed restore rewrites the logged ones
+    from their head row (``replay``)."""
+
+    def __init__(
+        self,
+        path: Path,
+        completed: list[str] | None = None,
+        part: str | None = None,
+        items: int = 0,
+    ):
+        self.path = path
+        self.completed = completed or []
+        self.part = part
+        self.items = items
+        # Reader position, ahead of what the workers have applied
+        self._completed = list(self.completed)
+        self._part: str | None = None
+        self._count = 0
+        self._seq = 0
+        self._saved_seq = -1
+        self._lock = threading.Lock()
+        # Keys written past the saved position by the interrupted run(s)
+        self.replay: set[str] = set()
+
+    @classmethod
+    def open(cls, work_dir: Path, name: str, resume: bool) -> "RestoreJournal":
+        path = work_dir / f"restore-{name}.journal.json"
+        if not resume:
+            journal = cls(path)
+            journal._remove_key_logs(replay=True)
+            return journal
+        if path.exists():
+            with path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            journal = cls(path, data["completed"], data["part"], data["items"])
+        else:
+            # Stopped before its first save: starts over, but the keys it
+            # wrote are still logged
+            journal = cls(path)
+        journal._load_replay()
+        return journal
+
+    def key_log_path(self, worker: int, seq: int) -> Path:
+        return self.path.with_name(f"{self.path.stem}.w{worker}.{seq}.keys")
+
+    def _key_logs(self) -> list[tuple[int, Path]]:
+        logs = []
+        for p in self.path.parent.glob(f"{self.path.stem}.w*.keys"):
+            seq = p.name[: -len(".keys")].rsplit(".", 1)[-1]
+            if seq.isdigit():
+                logs.append((int(seq), p))
+        return logs
+
+    def _replay_path(self) -> Path:
+        return self.path.with_name(f"{self.path.stem}.replay.keys")
+
+    def _load_replay(self) -> None:
+        # The keys of earlier resumes stay: this run may stop again before
+        # it gets past them
+        paths = [self._replay_path()] + [p for _seq, p in self._key_logs()]
+        for p in paths:
+            if not p.exists():
+                continue
+            with p.open("r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        self.replay.add(json.loads(line))
+                    except ValueError:
+                        break  # line cut short by the crash
+        tmp = self._replay_path().with_suffix(".tmp")
+        tmp.write_text("".join(json.dumps(key) + "\n" for key in sorted(self.replay)), encoding="utf-8")
+        os.replace(tmp, self._replay_path())
+        self._remove_key_logs()
+
+    def _remove_key_logs(self, before: int | None = None, replay: bool = False) -> None:
+        for seq, p in self._key_logs():
+            if before is None or seq < before:
+                p.unlink(missing_ok=True)
+        if replay:
+            self._replay_path().unlink(missing_ok=True)
+
+    def key_log(self, worker: int) -> KeyLog:
+        """Key log of restore worker ``worker``, from the last barrier on."""
+        return KeyLog(self, worker, self._seq)
+
+    @property
+    def resuming(self) -> bool:
+        return bool(self.completed or self.part)
+
+    def track(
+        self,
+        streams: Iterable[PartStream],
+        prefix: str = "",
+        skipped: Callable[[Any], None] | None = None,
+    ) -> Iterator[Any]:
+        """Yields the items of ``streams`` not applied yet, keeping track of
+        the reader position for ``position``. ``prefix`` tells apart parts of
+        the different backups of an incremental chain. ``skipped`` is given
+        the items applied before the resume (completed parts are then read
+        too)."""
+        done = set(self.completed)
+        for stream in streams:
+            name = prefix + stream[0]
+            if name in done:
+                if skipped is not None:
+                    for item in iter_part_items(stream):
+                        skipped(item)
+                continue
+            skip = self.items if name == self.part else 0
+            self._part, self._count = name, 0
+            for n, item in enumerate(iter_part_items(stream)):
+                self._count = n
+                if n >= skip:
+                    yield item
+                elif skipped is not None:
+                    skipped(item)
+            self._completed.append(name)
+            self._part, self._count = None, 0
+
+    def position(self) -> dict[str, Any]:
+        """Position just before the item last yielded by ``track``."""
+        return {"completed": list(self._completed), "part": self._part, "items": self._count}
+
+    def mark(self) -> tuple[int, dict[str, Any]]:
+        """Current position with an increasing sequence number for ``save``."""
+        self._seq += 1
+        return self._seq, self.position()
+
+    def save(self, seq: int, position: dict[str, Any]) -> None:
+        # Barriers may complete out of order across threads; keep the newest
+        with self._lock:
+            if seq <= self._saved_seq:
+                return
+            self._saved_seq = seq
+            _write_json(self.path, position)
+            self._remove_key_logs(before=seq)
+
+    def remove(self) -> None:
+        self.path.unlink(missing_ok=True)
+        self._remove_key_logs(replay=True)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import threading
+import zlib
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from compression import SUFFIXES, codec_for, compress_bytes, decompress_bytes
+from parts import CHAIN_FILE, FORMATS, PartStream, iter_part_records, member_kind
+from s3_utils import (
+    MANIFEST_SUFFIX,
+    S3Location,
+    list_object_names,
+    open_object_stream,
+    put_object_bytes,
+)
+
+CHUNKS_PREFIX = "chunks/"
+
+# Chunks are cut on row/record boundaries. Past _MIN_CHUNK bytes, a record
+# ends the chunk with a probability proportional to its size, decided by a
+# hash of its bytes: cut points follow the content, so an added, removed or
+# changed key only replaces the chunks around it.
+_MIN_CHUNK = 64 * 1024
+_AVG_EXTRA = 64 * 1024
+_MAX_CHUNK = 1024 * 1024
+
+# Chunks fetched ahead of the reader when reassembling a part
+_PREFETCH = 4
+
+
+def split_chunks(records: Iterator[bytes]) -> Iterator[bytes]:
+    buf = bytearray()
+    for rec in records:
+        buf += rec
+        if len(buf) < _MIN_CHUNK:
+            continue
+        if len(buf) >= _MAX_CHUNK or zlib.crc32(rec) * _AVG_EXTRA < len(rec) << 32:
+            yield bytes(buf)
+            buf.clear()
+    if buf:
+        yield bytes(buf)
+
+
+def _chunk_object(chunk_id: str, codec: str) -> str:
+    return f"{CHUNKS_PREFIX}{chunk_id[:2]}/{chunk_id}.bin{SUFFIXES[codec]}"
+
+
+def plain_name(name: str) -> str:
+    suffix = SUFFIXES[codec_for(name)]
+    return name[: -len(suffix)] if suffix else name
+
+
+class ChunkStore:
+    """Content-addressed store of part chunks under ``<prefix>/<env>/chunks/``.
+    A chunk is named by the SHA-256 of its uncompressed bytes and uploaded
+    only if no earlier backup stored it; a backup is then a small manifest
+    listing the chunks of each of its parts. ``dump`` backups deduplicate
+    best: JSONL rows carry a relative ``pttl``, so keys with a TTL change on
+    every backup. Chunks are never deleted."""
+
+    def __init__(self, s3: Any, loc: S3Location, env_profile: str, codec: str, concurrency: int):
+        self.s3 = s3
+        self.loc = loc
+        self.env_profile = env_profile
+        self.codec = codec
+        self.chunks = 0
+        self.new_chunks = 0
+        self.raw_bytes = 0
+        self.uploaded_bytes = 0
+        self._parts: dict[str, dict[str, Any]] = {}
+        self._known = set(list_object_names(s3, loc, env_profile, CHUNKS_PREFIX))
+        self._lock = threading.Lock()
+        self._futures: list[Future] = []
+        self._max_pending = max(1, concurrency) * 2
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+
+    def _upload(self, obj: str, data: bytes) -> None:
+        body = compress_bytes(data, self.codec)
+        put_object_bytes(self.s3, self.loc, self.env_profile, obj, body)
+        with self._lock:
+            self.uploaded_bytes += len(body)
+
+    def add(self, path: Path) -> None:
+        """Splits a finished part (or tombstones file) into chunks and
+        queues the ones not in the store yet for upload."""
+        kind = member_kind(path.name)
+        chunk_ids: list[str] = []
+        sizes: list[int] = []
+        with path.open("rb") as f:
+            for data in split_chunks(iter_part_records((path.name, kind, f))):
+                chunk_id = hashlib.sha256(data).hexdigest()
+                obj = _chunk_object(chunk_id, self.codec)
+                chunk_ids.append(chunk_id)
+                sizes.append(len(data))
+                with self._lock:
+                    self.chunks += 1
+                    if obj in self._known:
+                        continue
+                    self._known.add(obj)
+                    self.new_chunks += 1
+                    pending = [fut for fut in self._futures if not fut.done()]
+                if len(pending) >= self._max_pending:
+                    pending[0].result()
+                fut = self._pool.submit(self._upload, obj, data)
+                with self._lock:
+                    self._futures.append(fut)
+        with self._lock:
+            self.raw_bytes += sum(sizes)
+            self._parts[path.name] = {
+                "name": plain_name(path.name),
+                "kind": kind,
+                "bytes": sum(sizes),
+                "chunks": chunk_ids,
+                "chunk_bytes": sizes,
+            }
+
+    def finish(self, backup_id: str, meta: dict[str, Any]) -> str:
+        """Waits for the uploads and writes the backup's manifest."""
+        for fut in self._futures:
+            fut.result()
+        self._pool.shutdown()
+        # Tombstones first, like in an archive, then the parts in order
+        parts = sorted(self._parts.values(), key=lambda p: (p["kind"] in FORMATS, p["name"]))
+        manifest = {
+            "backup_id": backup_id,
+            "format": meta.get("format", "jsonl"),
+            "chunk_codec": self.codec,
+            "chain": meta.get("chain"),
+            "metadata": meta,
+            "raw_bytes": self.raw_bytes,
+            "parts": parts,
+        }
+        data = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+        return put_object_bytes(self.s3, self.loc, self.env_profile, f"{backup_id}{MANIFEST_SUFFIX}", data)
+
+    def abort(self) -> None:
+        # Chunks already uploaded stay; later backups reuse them
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+
+def load_manifest(s3: Any, loc: S3Location, env_profile: str, name: str) -> dict[str, Any]:
+    body = open_object_stream(s3, loc, env_profile, name)
+    try:
+        return json.load(body)
+    finally:
+        body.close()
+
+
+def read_chunk_object(s3: Any, loc: S3Location, env_profile: str, obj: str) -> bytes:
+    body = open_object_stream(s3, loc, env_profile, obj)
+    try:
+        return decompress_bytes(body.read(), obj)
+    finally:
+        body.close()
+
+
+def fetch_chunk(s3: Any, loc: S3Location, env_profile: str, chunk_id: str, codec: str) -> bytes:
+    """Uncompressed bytes of a chunk, checked against its hash."""
+    data = read_chunk_object(s3, loc, env_profile, _chunk_object(chunk_id, codec))
+    if hashlib.sha256(data).hexdigest() != chunk_id:
+        raise ValueError(f"Chunk {chunk_id} is corrupt")
+    return data
+
+
+def chunk_objects(s3: Any, loc: S3Location, env_profile: str, name: str) -> list[dict[str, Any]]:
+    """The distinct chunks a manifest references, as part-manifest style
+    entries (object name, SHA-256 and size of the uncompressed bytes)."""
+    manifest = load_manifest(s3, loc, env_profile, name)
+    codec = manifest.get("chunk_codec", "none")
+    entries: dict[str, dict[str, Any]] = {}
+    for part in manifest["parts"]:
+        for chunk_id, size in zip(part["chunks"], part["chunk_bytes"]):
+            obj = _chunk_object(chunk_id, codec)
+            entries[obj] = {"name": obj, "kind": "chunk", "sha256": chunk_id, "bytes": size}
+    return list(entries.values())
+
+
+class _ChunkReader(io.RawIOBase):
+    """Reads one part back from its chunks, fetching a few ahead."""
+
+    def __init__(self, chunk_ids: list[str], fetch: Callable[[str], bytes], pool: ThreadPoolExecutor):
+        self._ids = iter(chunk_ids)
+        self._fetch = fetch
+        self._pool = pool
+        self._pending: deque[Future] = deque()
+        self._buf = b""
+        self._pos = 0
+
+    def _fill(self) -> None:
+        while len(self._pending) < _PREFETCH:
+            chunk_id = next(self._ids, None)
+            if chunk_id is None:
+                return
+            self._pending.append(self._pool.submit(self._fetch, chunk_id))
+
+    def readable(self) -> bool:
+        return True
+
+    def readinto(self, b) -> int:
+        if self._pos >= len(self._buf):
+            # Nothing is fetched before the first read, so a part that is
+            # skipped costs no requests
+            self._fill()
+            if not self._pending:
+                return 0
+            self._buf, self._pos = self._pending.popleft().result(), 0
+            self._fill()
+        n = min(len(b), len(self._buf) - self._pos)
+        b[:n] = self._buf[self._pos : self._pos + n]
+        self._pos += n
+        return n
+
+
+def manifest_part_streams(
+    s3: Any, loc: S3Location, env_profile: str, name: str, extras: bool = False
+) -> Iterator[PartStream]:
+    """Part streams of a chunk-store backup, reassembled from its chunks
+    (uncompressed, so the stream names carry no compression suffix)."""
+    manifest = load_manifest(s3, loc, env_profile, name)
+    codec = manifest.get("chunk_codec", "none")
+
+    def fetch(chunk_id: str) -> bytes:
+        return fetch_chunk(s3, loc, env_profile, chunk_id, codec)
+
+    if extras and manifest.get("chain"):
+        chain = {"chain": manifest["chain"], "format": manifest["format"]}
+        yield CHAIN_FILE, "chain", io.BytesIO(json.dumps(chain).encode("utf-8"))
+    with ThreadPoolExecutor(max_workers=_PREFETCH) as pool:
+        for part in manifest["parts"]:
+            if part["kind"] not in FORMATS and not extras:
+                continue
+            reader = io.BufferedReader(_ChunkReader(part["chunks"], fetch, pool))
+            yield part["name"], part["kind"], reader
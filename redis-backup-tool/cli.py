@@ -6,6 +6,9 @@ from backup import run_backup
 from restore import run_restore
 from listing import run_list
 from verify import run_verify
+from diff import run_diff
+from parts import FORMATS
+from compression import CODECS
 
 
 def add_common_env_args(parser: argparse.ArgumentParser) -> None:
@@ -42,20 +45,84 @@ def build_parser() -> argparse.ArgumentParser:
     )
     add_common_env_args(p_b)
     p_b.add_argument("--match", default="*", help="Key pattern to match (default: *)")
-    p_b.add_argument("--chunk-keys", type=int, default=5000, help="Keys per JSONL part")
+    p_b.add_argument(
+        "--chunk-keys",
+        type=int,
+        default=5000,
+        help="Keys per part; parts are also split by hash slot range",
+    )
+    p_b.add_argument(
+        "--format",
+        choices=FORMATS,
+        default="jsonl",
+        help="Part format: jsonl (logical rows) or dump (binary DUMP payloads)",
+    )
+    p_b.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parallel SCAN workers, one primary each (default: one per primary)",
+    )
+    p_b.add_argument(
+        "--batch-keys",
+        type=int,
+        default=500,
+        help="Keys per SCAN batch fetched with pipelined TYPE/PTTL/value reads",
+    )
+    p_b.add_argument(
+        "--page-size",
+        type=int,
+        default=1000,
+        help="Elements per page when dumping hashes/lists/sets/zsets/streams",
+    )
+    p_b.add_argument(
+        "--compression",
+        choices=CODECS,
+        default="gzip",
+        help="Per-part compression, applied while dumping (default: %(default)s)",
+    )
+    p_b.add_argument(
+        "--s3-part-size-mb",
+        type=int,
+        default=16,
+        help="Multipart upload part size in MiB, min 5 (default: %(default)s)",
+    )
+    p_b.add_argument(
+        "--s3-concurrency",
+        type=int,
+        default=4,
+        help="Parallel multipart part uploads (default: %(default)s)",
+    )
     p_b.add_argument(
         "-o",
         "--out-dir",
         default=os.environ.get("BACKUP_DIR", "/data/backups"),
         help="Local output dir",
     )
+    p_b.add_argument(
+        "--resume",
+        metavar="BACKUP_ID",
+        help="Continue an interrupted backup in --out-dir from its checkpoint",
+    )
+    p_b.add_argument(
+        "--chunk-store",
+        action="store_true",
+        help="Upload parts as deduplicated chunks plus a manifest instead of the archive",
+    )
+    p_b.add_argument(
+        "--base",
+        metavar="BACKUP_ID",
+        help="Incremental backup: store only keys changed since this backup",
+    )
     p_b.set_defaults(func=run_backup)
 
     # restore
     p_r = sub.add_parser("restore", help="Restore from local backup or S3")
     add_common_env_args(p_r)
     src = p_r.add_mutually_exclusive_group()
-    src.add_argument("--input", "-i", help="Local backup directory or .tar.gz path")
+    src.add_argument(
+        "--input", "-i", help="Local backup directory or .tar/.tar.gz path"
+    )
     src.add_argument(
         "--from-s3",
         choices=["latest", "by-id"],
@@ -71,13 +138,64 @@ def build_parser() -> argparse.ArgumentParser:
         help="Recreate stream consumer groups metadata",
     )
     p_r.add_argument(
-        "--work-dir", default="/tmp", help="Working directory for downloads/extracts"
+        "--batch-keys",
+        type=int,
+        default=1000,
+        help="Rows per pipelined batch, grouped by owning node (default: %(default)s)",
+    )
+    p_r.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parallel restore workers; rows are routed by hash slot (default: %(default)s)",
+    )
+    p_r.add_argument(
+        "--work-dir",
+        default="/tmp",
+        help="Directory for the restore journal (archives are streamed, nothing is extracted here)",
+    )
+    p_r.add_argument(
+        "--resume",
+        action="store_true",
+        help="Skip parts and rows already applied according to the restore journal",
+    )
+    p_r.add_argument(
+        "--no-validate",
+        action="store_true",
+        help="Do not check parts against the backup's part manifest before restoring",
+    )
+    p_r.add_argument(
+        "--keys",
+        nargs="+",
+        metavar="KEY",
+        help="Restore only these keys, looked up in the backup's key index",
+    )
+    p_r.add_argument(
+        "--match",
+        metavar="PATTERN",
+        help="Restore only keys matching this glob, looked up in the key index",
+    )
+    p_r.add_argument(
+        "--slots",
+        metavar="RANGES",
+        help="Restore only keys in these hash slots, e.g. 0-5460 or 0-100,200; "
+        "parts of other slot ranges are skipped unread",
+    )
+    p_r.add_argument(
+        "--types",
+        metavar="TYPES",
+        help="Restore only keys of these types, e.g. hash,zset",
     )
     p_r.set_defaults(func=run_restore)
 
     # list
     p_l = sub.add_parser("list", help="List backups available in S3")
     add_common_env_args(p_l)
+    p_l.add_argument(
+        "--rebuild-catalog",
+        action="store_true",
+        help="Rebuild the backup catalog from a full listing of S3, e.g. after deleting backups",
+    )
     p_l.set_defaults(func=run_list)
 
     # verify
@@ -86,11 +204,56 @@ def build_parser() -> argparse.ArgumentParser:
     )
     add_common_env_args(p_v)
     p_v.add_argument(
-        "-i", "--input", required=True, help="Local backup directory (extracted)"
+        "-i",
+        "--input",
+        required=True,
+        help="Local backup directory (extracted), or the id of a chunk-store backup in S3; "
+        "with --checksums also a .tar or any backup id in S3",
     )
     p_v.add_argument("--sample", type=int, default=500, help="Number of keys to sample")
+    p_v.add_argument(
+        "--full",
+        action="store_true",
+        help="Compare a content digest of every key, per hash slot, instead of sampling",
+    )
+    p_v.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Parallel readers for --full, one primary each (default: one per primary)",
+    )
+    p_v.add_argument(
+        "--checksums",
+        action="store_true",
+        help="Only check the parts against the backup's part manifest (no cluster needed)",
+    )
     p_v.set_defaults(func=run_verify)
 
+    # diff
+    p_d = sub.add_parser(
+        "diff", help="Compare two backups (local dirs/archives or S3 backup ids)"
+    )
+    add_common_env_args(p_d)
+    p_d.add_argument("old", help="Older backup: local dir, .tar/.tar.gz, or backup id in S3")
+    p_d.add_argument("new", help="Newer backup: local dir, .tar/.tar.gz, or backup id in S3")
+    p_d.add_argument(
+        "--buckets",
+        type=int,
+        default=256,
+        help="Hash buckets spilled to disk; memory holds one bucket (default: %(default)s)",
+    )
+    p_d.add_argument(
+        "--prefix-delim",
+        default=":",
+        help="Keys are grouped by the part before this delimiter (default: %(default)s)",
+    )
+    p_d.add_argument(
+        "--work-dir",
+        default="/tmp",
+        help="Directory for the spilled buckets (default: %(default)s)",
+    )
+    p_d.set_defaults(func=run_diff)
+
     return parser
 
 
@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+from typing import BinaryIO
+
+try:
+    import zstandard
+except ImportError:  # optional: pip install zstandard
+    zstandard = None
+
+CODECS = ("gzip", "zstd", "none")
+SUFFIXES = {"gzip": ".gz", "zstd": ".zst", "none": ""}
+
+# Parts are small and produced concurrently by every worker, so a mid-level
+# setting keeps compression from becoming the bottleneck of the dump.
+_GZIP_LEVEL = 6
+_ZSTD_LEVEL = 3
+
+
+def _require_zstd() -> None:
+    if zstandard is None:
+        raise SystemExit("zstd compression requires the 'zstandard' package")
+
+
+def codec_for(name: str) -> str:
+    if name.endswith(".zst"):
+        return "zstd"
+    if name.endswith(".gz"):
+        return "gzip"
+    return "none"
+
+
+def open_writer(path: Path, codec: str) -> BinaryIO:
+    if codec == "gzip":
+        return gzip.open(path, "wb", compresslevel=_GZIP_LEVEL)  # type: ignore[return-value]
+    if codec == "zstd":
+        _require_zstd()
+        cctx = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+        return cctx.stream_writer(path.open("wb"))  # type: ignore[return-value]
+    return path.open("wb")
+
+
+class FrameWriter:
+    """Compressed file made of independent frames (gzip members, zstd
+    frames). ``end_frame`` finishes the current one, so a reader can later
+    decompress just that frame from its offset; streaming readers see one
+    continuous file."""
+
+    def __init__(self, path: Path, codec: str):
+        if codec == "zstd":
+            _require_zstd()
+            self._cctx = zstandard.ZstdCompressor(level=_ZSTD_LEVEL)
+        self.codec = codec
+        self._raw = path.open("wb")
+        self._f: BinaryIO | None = None
+        self.frame_offset = 0
+
+    def write(self, data: bytes) -> None:
+        if self._f is None:
+            if self.codec == "gzip":
+                self._f = gzip.GzipFile(  # type: ignore[assignment]
+                    filename="", fileobj=self._raw, mode="wb", compresslevel=_GZIP_LEVEL, mtime=0
+                )
+            elif self.codec == "zstd":
+                self._f = self._cctx.stream_writer(self._raw, closefd=False)
+            else:
+                self._f = self._raw
+        self._f.write(data)
+
+    def end_frame(self) -> tuple[int, int]:
+        """(offset, length) in the file of the frame just finished."""
+        if self._f is not None and self._f is not self._raw:
+            self._f.close()
+        self._f = None
+        end = self._raw.tell()
+        frame = (self.frame_offset, end - self.frame_offset)
+        self.frame_offset = end
+        return frame
+
+    def close(self) -> None:
+        self.end_frame()
+        self._raw.close()
+
+
+def wrap_reader(f: BinaryIO, name: str) -> BinaryIO:
+    """Returns a decompressing reader over ``f`` based on the file name."""
+    codec = codec_for(name)
+    if codec == "gzip":
+        return gzip.GzipFile(fileobj=f, mode="rb")  # type: ignore[return-value]
+    if codec == "zstd":
+        _require_zstd()
+        # Parts are sequences of frames (see FrameWriter)
+        return zstandard.ZstdDecompressor().stream_reader(f, read_across_frames=True)  # type: ignore[return-value]
+    return f
+
+
+def compress_bytes(data: bytes, codec: str) -> bytes:
+    if codec == "gzip":
+        return gzip.compress(data, compresslevel=_GZIP_LEVEL)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdCompressor(level=_ZSTD_LEVEL).compress(data)
+    return data
+
+
+def decompress_bytes(data: bytes, name: str) -> bytes:
+    codec = codec_for(name)
+    if codec == "gzip":
+        return gzip.decompress(data)
+    if codec == "zstd":
+        _require_zstd()
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    return data
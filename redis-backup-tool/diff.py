@@ -0,0 +1,194 @@
+from __future__ import annotations
+
+import itertools
+import json
+import struct
+import tempfile
+import time
+import zlib
+from collections import Counter
+from pathlib import Path
+from typing import Iterator
+
+from digest import item_digests
+from parts import PartStream, iter_part_items
+from redis_utils import build_cluster_config
+from restore import chain_link_source, open_part_streams
+
+_TYPES = ("string", "hash", "list", "set", "zset", "stream", "unknown")
+_TYPE_IDX = {t: i for i, t in enumerate(_TYPES)}
+
+# Spilled record: u32 key length | u8 type index | 16-byte digest | key
+_RECORD = struct.Struct(">IB16s")
+# Type index of a tombstone record: the key was deleted by a later link
+_DELETED = 255
+
+_KINDS = ("added", "removed", "changed")
+_REPORT_LIMIT = 20
+
+
+def _open_backup(
+    source: str, env_profile: str, s3_uri: str | None
+) -> tuple[str, str | None, list[Iterator[PartStream]]]:
+    """Name, format and part streams of every backup ``source`` is made
+    of, oldest first: for an incremental its whole chain, so the diff sees
+    the keyspace it restores to."""
+    name, streams = open_part_streams(source, env_profile, s3_uri, extras=True)
+    first = next(streams, None)
+    if first is None:
+        return name, None, []
+    if first[1] != "chain":
+        return name, first[1], [itertools.chain([first], streams)]
+    chain = json.load(first[2])
+    links = [
+        open_part_streams(chain_link_source(link, source), env_profile, s3_uri, extras=True)[1]
+        for link in chain["chain"][:-1]
+    ]
+    return name, chain.get("format", "jsonl"), links + [streams]
+
+
+def _spill(links: list[Iterator[PartStream]], fmt: str, work: Path, side: str, buckets: int) -> None:
+    """Writes (key, type, digest) of every key into ``buckets`` files by key
+    hash, so each bucket of both backups can later be compared in memory.
+    Links of a chain are spilled oldest first, tombstones included, and
+    the last record of a key wins when a bucket is read."""
+    files = [(work / f"{side}-{i:04d}.bin").open("wb") for i in range(buckets)]
+
+    def write(key: bytes, type_idx: int, digest: bytes) -> None:
+        files[zlib.crc32(key) % buckets].write(_RECORD.pack(len(key), type_idx, digest) + key)
+
+    try:
+        for streams in links:
+            for stream in streams:
+                if stream[1] == "chain":
+                    continue
+                if stream[1] == "tombstones":
+                    for tombstone in iter_part_items(stream):
+                        write(tombstone.key, _DELETED, bytes(16))
+                    continue
+                for key, t, digest in item_digests(iter_part_items(stream), fmt):
+                    write(key, _TYPE_IDX.get(t, _TYPE_IDX["unknown"]), digest.to_bytes(16, "big"))
+    finally:
+        for f in files:
+            f.close()
+
+
+def _read_bucket(path: Path) -> Iterator[tuple[bytes, int, bytes]]:
+    data = path.read_bytes()
+    pos = 0
+    while pos < len(data):
+        key_len, type_idx, digest = _RECORD.unpack_from(data, pos)
+        pos += _RECORD.size
+        yield data[pos : pos + key_len], type_idx, digest
+        pos += key_len
+
+
+class _DiffReport:
+    def __init__(self, delim: bytes):
+        self.delim = delim
+        self.totals: Counter[str] = Counter()
+        self.by_type: Counter[tuple[str, str]] = Counter()
+        self.by_prefix: Counter[tuple[str, str]] = Counter()
+        self.examples: dict[str, list[bytes]] = {kind: [] for kind in _KINDS}
+
+    def _prefix(self, key: bytes) -> str:
+        if not self.delim or self.delim not in key:
+            return "(no prefix)"
+        return key.split(self.delim, 1)[0].decode("utf-8", "backslashreplace")
+
+    def add(self, kind: str, key: bytes, type_idx: int) -> None:
+        self.totals[kind] += 1
+        if kind == "unchanged":
+            return
+        self.by_type[(_TYPES[type_idx], kind)] += 1
+        self.by_prefix[(self._prefix(key), kind)] += 1
+        if len(self.examples[kind]) < _REPORT_LIMIT:
+            self.examples[kind].append(key)
+
+    @property
+    def differs(self) -> bool:
+        return any(self.totals[kind] for kind in _KINDS)
+
+    def _print_table(self, title: str, counts: Counter[tuple[str, str]], limit: int | None = None) -> None:
+        names: Counter[str] = Counter()
+        for (name, _kind), n in counts.items():
+            names[name] += n
+        ranked = names.most_common(limit)
+        if not ranked:
+            return
+        more = f" (top {limit} of {len(names)})" if limit and len(names) > limit else ""
+        print(f"By {title}{more}:")
+        width = max(len(name) for name, _ in ranked)
+        for name, _ in ranked:
+            cells = " ".join(f"{kind}={counts[(name, kind)]}" for kind in _KINDS)
+            print(f"  {name:<{width}}  {cells}")
+
+    def show(self) -> None:
+        print(" ".join(f"{kind}={self.totals[kind]}" for kind in (*_KINDS, "unchanged")))
+        self._print_table("type", self.by_type)
+        self._print_table("prefix", self.by_prefix, _REPORT_LIMIT)
+        for kind in _KINDS:
+            keys = self.examples[kind]
+            if keys:
+                shown = ", ".join(k.decode("utf-8", "backslashreplace") for k in keys)
+                more = " ..." if self.totals[kind] > len(keys) else ""
+                print(f"{kind.capitalize()}: {shown}{more}")
+
+
+def _load_bucket(path: Path) -> dict[bytes, tuple[int, bytes]]:
+    keys: dict[bytes, tuple[int, bytes]] = {}
+    for key, t, digest in _read_bucket(path):
+        if t == _DELETED:
+            keys.pop(key, None)
+        else:
+            keys[key] = (t, digest)
+    return keys
+
+
+def _compare_bucket(old_path: Path, new_path: Path, report: _DiffReport) -> tuple[int, int]:
+    """Compares one bucket; returns the key counts of both sides."""
+    old = _load_bucket(old_path)
+    new = _load_bucket(new_path)
+    counts = len(old), len(new)
+    for key, (t, digest) in new.items():
+        prev = old.pop(key, None)
+        if prev is None:
+            report.add("added", key, t)
+        elif prev != (t, digest):
+            report.add("changed", key, t)
+        else:
+            report.add("unchanged", key, t)
+    for key, (t, _digest) in old.items():
+        report.add("removed", key, t)
+    return counts
+
+
+def run_diff(args) -> int:
+    cfg = build_cluster_config(args.env_profile, args.redis_nodes)
+    buckets = max(1, args.buckets)
+    report = _DiffReport(args.prefix_delim.encode("utf-8"))
+    started = time.perf_counter()
+
+    work_root = Path(args.work_dir).expanduser()
+    work_root.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="redis-diff-", dir=work_root) as tmp:
+        work = Path(tmp)
+        # One backup is streamed at a time; memory is bounded by a bucket
+        old_name, old_fmt, links = _open_backup(args.old, cfg.env_profile, args.s3_uri)
+        _spill(links, old_fmt or "jsonl", work, "old", buckets)
+        new_name, new_fmt, links = _open_backup(args.new, cfg.env_profile, args.s3_uri)
+        if old_fmt and new_fmt and old_fmt != new_fmt:
+            raise SystemExit(f"Cannot diff a {old_fmt} backup against a {new_fmt} backup")
+        _spill(links, new_fmt or "jsonl", work, "new", buckets)
+
+        # Keys are counted after the chains are applied
+        old_keys = new_keys = 0
+        for i in range(buckets):
+            o, n = _compare_bucket(work / f"old-{i:04d}.bin", work / f"new-{i:04d}.bin", report)
+            old_keys += o
+            new_keys += n
+
+    elapsed = time.perf_counter() - started
+    print(f"Diff {old_name} ({old_keys} keys) -> {new_name} ({new_keys} keys) in {elapsed:.1f}s")
+    report.show()
+    return 1 if report.differs else 0
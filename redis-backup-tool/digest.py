@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import hashlib
+import json
+from typing import Any, Iterable, Iterator
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+from parts import is_continuation
+
+_MOD = 1 << 128
+
+# DUMP payloads end with a 2-byte RDB version and an 8-byte CRC64
+_DUMP_FOOTER = 10
+
+# RDB object type ids (all encodings) -> Redis type
+_RDB_TYPES = {
+    0: "string",
+    1: "list",
+    2: "set",
+    3: "zset",
+    4: "hash",
+    5: "zset",
+    9: "hash",
+    10: "list",
+    11: "set",
+    12: "zset",
+    13: "hash",
+    14: "list",
+    15: "stream",
+    16: "hash",
+    17: "zset",
+    18: "list",
+    19: "stream",
+    20: "set",
+    21: "stream",
+    22: "hash",
+    24: "hash",
+}
+
+
+def _h(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=16).digest(), "big")
+
+
+def _enc(value: Any) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8") + b"\n"
+
+
+def _key_bytes(key: Any) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+class _KeyDigest:
+    """Canonical digest of one key's value, fed page by page. Ordered types
+    (strings, lists, streams) go through a running hash; unordered ones
+    (hashes, sets, zsets) sum per-element hashes, so page boundaries and
+    reply order do not matter."""
+
+    def __init__(self, t: str):
+        self.t = t
+        self._seq = hashlib.blake2b(digest_size=16)
+        self._sum = 0
+
+    def add(self, value: Any) -> None:
+        if self.t == "hash":
+            for f, v in (value or {}).items():
+                self._sum = (self._sum + _h(_enc([f, v]))) % _MOD
+        elif self.t in ("set", "zset"):
+            for e in value or []:
+                self._sum = (self._sum + _h(_enc(e))) % _MOD
+        elif self.t in ("list", "stream"):
+            for e in value or []:
+                self._seq.update(_enc(e))
+        else:
+            self._seq.update(_enc(value))
+
+    def digest(self) -> int:
+        return _h(self.t.encode() + self._seq.digest() + self._sum.to_bytes(16, "big"))
+
+
+def row_digests(rows: Iterable[dict[str, Any]]) -> Iterator[tuple[bytes, str, int]]:
+    """(key, type, digest) for each key of a row stream; a key's
+    continuation rows directly follow its head row."""
+    key: Any = None
+    acc: _KeyDigest | None = None
+    for row in rows:
+        if is_continuation(row) and acc is not None and row["key"] == key:
+            acc.add(row.get("value"))
+            continue
+        if acc is not None:
+            yield _key_bytes(key), acc.t, acc.digest()
+        key, acc = row["key"], _KeyDigest(row["type"])
+        acc.add(row.get("value"))
+    if acc is not None:
+        yield _key_bytes(key), acc.t, acc.digest()
+
+
+def dump_type(payload: bytes) -> str:
+    # A DUMP payload starts with the RDB object type of the value
+    return _RDB_TYPES.get(payload[0], "unknown") if payload else "unknown"
+
+
+def record_digests(records: Iterable[Any]) -> Iterator[tuple[bytes, str, int]]:
+    # Version/CRC footer left out so equal values digest the same; the
+    # serialized encoding itself may still differ across Redis versions.
+    for key, _expire_at, payload in records:
+        yield _key_bytes(key), dump_type(payload), _h(payload[:-_DUMP_FOOTER])
+
+
+def item_digests(items: Iterable[Any], fmt: str) -> Iterator[tuple[bytes, str, int]]:
+    return record_digests(items) if fmt == "dump" else row_digests(items)
+
+
+class SlotDigests:
+    """Order-independent digest and key count per hash slot."""
+
+    def __init__(self):
+        self.sums = [0] * REDIS_CLUSTER_HASH_SLOTS
+        self.counts = [0] * REDIS_CLUSTER_HASH_SLOTS
+
+    def add(self, key: bytes, digest: int) -> None:
+        slot = key_slot(key)
+        self.sums[slot] = (self.sums[slot] + _h(key + digest.to_bytes(16, "big"))) % _MOD
+        self.counts[slot] += 1
+
+    def merge(self, other: "SlotDigests") -> None:
+        for slot in range(REDIS_CLUSTER_HASH_SLOTS):
+            self.sums[slot] = (self.sums[slot] + other.sums[slot]) % _MOD
+            self.counts[slot] += other.counts[slot]
+
+    @property
+    def keys(self) -> int:
+        return sum(self.counts)
+
+    def mismatching(self, other: "SlotDigests") -> list[int]:
+        return [
+            slot
+            for slot in range(REDIS_CLUSTER_HASH_SLOTS)
+            if self.sums[slot] != other.sums[slot] or self.counts[slot] != other.counts[slot]
+        ]
@@ -0,0 +1,193 @@
+from __future__ import annotations
+
+import io
+import os
+import struct
+import tarfile
+import threading
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+from compression import SUFFIXES, open_writer, wrap_reader
+
+# Every backup records a content fingerprint per key under index/, split in
+# buckets by key hash so two backups can be compared one bucket at a time.
+INDEX_DIR = "index"
+INDEX_BUCKETS = 64
+# Small sidecar object uploaded next to the archive holding index/ and
+# metadata.json, so an incremental never has to download its base archive.
+INDEX_SUFFIX = ".index"
+
+# u32 key length | 16-byte fingerprint | key bytes
+_RECORD = struct.Struct(">I16s")
+# While the dump runs, records go to uncompressed spill files, one
+# generation per run of a resumed backup, tagged with the shard and the
+# part index of its last checkpoint: u32 key length | fingerprint |
+# u16 shard | u32 checkpointed part | key bytes
+_SPILL = struct.Struct(">I16sHI")
+
+
+# Fingerprint of a key an incremental failed to read; matches no digest,
+# so the key counts as changed
+UNREAD = 0
+
+
+def bucket_of(key: bytes) -> int:
+    return zlib.crc32(key) % INDEX_BUCKETS
+
+
+def spill_generations(index_dir: Path, prefix: str) -> list[tuple[int, Path]]:
+    """(generation, path) of ``<prefix>.<gen>.spill`` files, oldest first."""
+    found = []
+    for p in index_dir.glob(f"{prefix}.*.spill"):
+        gen = p.name[len(prefix) + 1 : -len(".spill")]
+        if gen.isdigit():
+            found.append((int(gen), p))
+    return sorted(found)
+
+
+def next_generation(index_dir: Path, prefix: str) -> int:
+    gens = spill_generations(index_dir, prefix)
+    return gens[-1][0] + 1 if gens else 0
+
+
+def _spill_records(data: bytes) -> Iterator[tuple[int, int, int, int]]:
+    # (start, end, shard, part) of each whole record; a record cut short by
+    # a killed backup ends the file
+    pos = 0
+    while pos + _SPILL.size <= len(data):
+        key_len, _fingerprint, shard, part = _SPILL.unpack_from(data, pos)
+        end = pos + _SPILL.size + key_len
+        if end > len(data):
+            return
+        yield pos, end, shard, part
+        pos = end
+
+
+def rewrite_spill(path: Path, records: Iterator[bytes]) -> None:
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("wb") as f:
+        for record in records:
+            f.write(record)
+    os.replace(tmp, path)
+
+
+class FingerprintWriter:
+    """Thread-safe writer of one backup's fingerprint index. A resumed
+    backup starts a new generation of spill files, after cutting the
+    earlier ones back to what ``committed`` (next part index per shard at
+    the last checkpoint) covers; ``close`` merges every generation into
+    one file per bucket."""
+
+    def __init__(self, out_dir: Path, codec: str, committed: dict[int, int] | None = None):
+        self.dir = out_dir / INDEX_DIR
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.codec = codec
+        if committed is not None:
+            for b in range(INDEX_BUCKETS):
+                for _gen, p in spill_generations(self.dir, f"fp-{b:03d}"):
+                    data = p.read_bytes()
+                    rewrite_spill(
+                        p,
+                        (
+                            data[start:end]
+                            for start, end, shard, part in _spill_records(data)
+                            if part < committed.get(shard, 0)
+                        ),
+                    )
+        gen = next_generation(self.dir, "fp-000")
+        self._spills = [self.dir / f"fp-{b:03d}.{gen}.spill" for b in range(INDEX_BUCKETS)]
+        self._files = [p.open("wb") for p in self._spills]
+        self.paths = [self.dir / f"fp-{b:03d}.bin{SUFFIXES[codec]}" for b in range(INDEX_BUCKETS)]
+        self._lock = threading.Lock()
+        self._closed = False
+        self.keys = 0
+
+    def add(self, key: bytes, fingerprint: int, shard: int = 0, part: int = 0) -> None:
+        """Records a key's fingerprint; ``part`` is the next part index of
+        the shard's last checkpoint when the key was read."""
+        rec = _SPILL.pack(len(key), fingerprint.to_bytes(16, "big"), shard, part) + key
+        with self._lock:
+            self._files[bucket_of(key)].write(rec)
+            self.keys += 1
+
+    def flush(self) -> None:
+        """Pushes buffered records to the spills; called before a checkpoint
+        so it never covers records a killed backup had not written."""
+        with self._lock:
+            for f in self._files:
+                f.flush()
+
+    def close(self) -> list[Path]:
+        """Merges the spill generations into ``fp-<bucket>.bin[.gz|.zst]``,
+        later generations last. The spills stay until ``remove_spills``, so
+        a backup resumed after this point still has them."""
+        with self._lock:
+            if self._closed:
+                return self.paths
+            self._closed = True
+            for f in self._files:
+                f.close()
+        for b, path in enumerate(self.paths):
+            tmp = path.with_name(f"{path.name}.tmp")
+            with open_writer(tmp, self.codec) as out:
+                for _gen, p in spill_generations(self.dir, f"fp-{b:03d}"):
+                    data = p.read_bytes()
+                    for start, end, _shard, _part in _spill_records(data):
+                        key_len, fingerprint, _s, _p = _SPILL.unpack_from(data, start)
+                        out.write(_RECORD.pack(key_len, fingerprint) + data[start + _SPILL.size : end])
+            os.replace(tmp, path)
+        return self.paths
+
+    def remove_spills(self) -> None:
+        for b in range(INDEX_BUCKETS):
+            for _gen, p in spill_generations(self.dir, f"fp-{b:03d}"):
+                p.unlink()
+
+
+def _bucket_files(backup_dir: Path, bucket: int) -> list[Path]:
+    # Merged bucket files, not the spills of an unfinished backup
+    suffixes = (".bin", *(s for s in SUFFIXES.values() if s))
+    return [p for p in (backup_dir / INDEX_DIR).glob(f"fp-{bucket:03d}.*") if p.name.endswith(suffixes)]
+
+
+def read_bucket(backup_dir: Path, bucket: int) -> Iterator[tuple[bytes, bytes]]:
+    """(key, fingerprint) records of one bucket; later generations last
+    (backups resumed before generations were merged have several files)."""
+    for p in sorted(_bucket_files(backup_dir, bucket), key=lambda p: (len(p.name), p.name)):
+        with p.open("rb") as raw, wrap_reader(raw, p.name) as f:
+            data = f.read()
+        pos = 0
+        while pos + _RECORD.size <= len(data):
+            key_len, fingerprint = _RECORD.unpack_from(data, pos)
+            pos += _RECORD.size
+            if pos + key_len > len(data):
+                return
+            yield data[pos : pos + key_len], fingerprint
+            pos += key_len
+
+
+def has_index(backup_dir: Path) -> bool:
+    return bool(_bucket_files(backup_dir, 0))
+
+
+def write_sidecar(backup_dir: Path, dest: Path, paths: list[Path]) -> Path:
+    with tarfile.open(dest, "w") as tar:
+        for p in paths:
+            tar.add(p, arcname=p.relative_to(backup_dir).as_posix())
+    return dest
+
+
+def extract_sidecar(body: io.RawIOBase, dest_dir: Path) -> None:
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    with tarfile.open(fileobj=body, mode="r|*") as tar:
+        for member in tar:
+            name = member.name
+            if not member.isfile() or name.startswith("/") or ".." in name.split("/"):
+                continue
+            target = dest_dir / name
+            target.parent.mkdir(parents=True, exist_ok=True)
+            f = tar.extractfile(member)
+            if f is not None:
+                target.write_bytes(f.read())
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+from botocore.exceptions import ClientError
+
+from readers import DumpStats, read_keys
+from compression import SUFFIXES, open_writer
+from digest import item_digests
+from fingerprints import (
+    INDEX_BUCKETS,
+    INDEX_SUFFIX,
+    UNREAD,
+    FingerprintWriter,
+    extract_sidecar,
+    has_index,
+    read_bucket,
+)
+from keyindex import KeyIndexWriter
+from part_manifest import PartManifestWriter
+from parts import TOMBSTONES_FILE, PartWriter, encode_tombstone, is_continuation, load_metadata
+from s3_utils import get_s3_client, open_object_stream, parse_s3_uri
+
+
+def load_base(base_id: str, out_root: Path, env_profile: str, s3_uri: str | None) -> tuple[Path, dict]:
+    """Directory holding the base backup's fingerprint index and metadata:
+    the local backup if present, else its index sidecar fetched from S3."""
+    local = out_root / base_id
+    if not has_index(local):
+        local = out_root / ".base-index" / base_id
+    if not has_index(local):
+        loc = parse_s3_uri(s3_uri)
+        if not loc:
+            raise SystemExit(f"Base backup {base_id} not found in {out_root} and S3_URI is not set")
+        try:
+            body = open_object_stream(get_s3_client(), loc, env_profile, f"{base_id}{INDEX_SUFFIX}")
+        except ClientError as e:
+            raise SystemExit(f"No fingerprint index for base backup {base_id} in S3: {e}")
+        try:
+            extract_sidecar(body, local)
+        finally:
+            body.close()
+    meta = load_metadata(local)
+    if not has_index(local) or not meta:
+        raise SystemExit(
+            f"Base backup {base_id} has no fingerprint index; take a new full backup first"
+        )
+    return local, meta
+
+
+class _TombstoneWriter:
+    def __init__(self, out_dir: Path, codec: str, key_index: KeyIndexWriter):
+        self.path = out_dir / f"{TOMBSTONES_FILE}{SUFFIXES[codec]}"
+        self._f = open_writer(self.path, codec)
+        # Point restores look tombstones up in the key index
+        self.key_index = key_index
+        self._lock = threading.Lock()
+        self.keys = 0
+
+    def add(self, key: bytes) -> None:
+        with self._lock:
+            self._f.write(encode_tombstone(key))
+            self.keys += 1
+        self.key_index.add_tombstone(key)
+
+    def close(self) -> Path:
+        with self._lock:
+            self._f.close()
+        return self.path
+
+
+def _key_bytes(key: Any) -> bytes:
+    return key if isinstance(key, bytes) else key.encode("utf-8")
+
+
+def _fingerprint_shard(r, args, fingerprints: FingerprintWriter) -> DumpStats:
+    # Phase 1: read every key like a full backup, but only keep fingerprints
+    stats = DumpStats()
+    pattern = args.match or "*"
+    cursor = 0
+    while True:
+        cursor, keys = r.scan(cursor=cursor, match=pattern, count=args.batch_keys)
+        stats.round_trips += 1
+        for i in range(0, len(keys), args.batch_keys):
+            batch = keys[i : i + args.batch_keys]
+            try:
+                items = read_keys(r, batch, args.format, args.page_size, stats)
+                digests = [(key, fp) for key, _t, fp in item_digests(items, args.format)]
+            except Exception as e:
+                # Not knowing them must not make them tombstones or unchanged:
+                # they are indexed as unread and so dumped again in phase 3
+                print(f"WARN: failed fingerprinting batch of {len(batch)} keys, dumping them: {e}")
+                digests = [(_key_bytes(key), UNREAD) for key in batch]
+            for key, fingerprint in digests:
+                fingerprints.add(key, fingerprint)
+        if cursor == 0:
+            break
+    return stats
+
+
+def _dump_changed(
+    r,
+    keys: list[Any],
+    writer: PartWriter,
+    tombstones: _TombstoneWriter,
+    args,
+) -> DumpStats:
+    # Phase 3: re-read only the keys whose fingerprint differs from the base
+    stats = DumpStats()
+    for i in range(0, len(keys), args.batch_keys):
+        batch = keys[i : i + args.batch_keys]
+        seen: set[Any] = set()
+        for item in read_keys(r, batch, args.format, args.page_size, stats):
+            key = item[0] if args.format == "dump" else item["key"]
+            seen.add(key)
+            writer.write(item, new_key=args.format == "dump" or not is_continuation(item))
+        for key in batch:
+            # Deleted between fingerprinting and now
+            if key not in seen:
+                tombstones.add(_key_bytes(key))
+        writer.rotate()
+    return stats
+
+
+def dump_incremental(
+    rc,
+    primaries: list[tuple[str, Any]],
+    base_dir: Path,
+    out_dir: Path,
+    args,
+    fingerprints: FingerprintWriter,
+    key_index: KeyIndexWriter,
+    manifest: PartManifestWriter,
+    workers: int,
+    on_part_closed=None,
+) -> tuple[DumpStats, Path]:
+    """Fingerprints the whole keyspace, compares it with the base index one
+    bucket at a time and dumps only added/changed keys; keys missing from
+    the cluster become tombstones. Returns the stats and tombstones file."""
+    stats = DumpStats()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for shard_stats in pool.map(
+            lambda r: _fingerprint_shard(r, args, fingerprints), [r for _, r in primaries]
+        ):
+            stats.round_trips += shard_stats.round_trips
+    fingerprints.close()
+    scanned = fingerprints.keys
+
+    shard_of = {name: idx for idx, (name, _) in enumerate(primaries)}
+    writers = [
+        PartWriter(
+            out_dir / "keys",
+            idx,
+            args.format,
+            args.chunk_keys,
+            codec=args.compression,
+            on_part_closed=on_part_closed,
+            key_index=key_index,
+            manifest=manifest,
+        )
+        for idx in range(len(primaries))
+    ]
+    tombstones = _TombstoneWriter(out_dir, args.compression, key_index)
+    changed_total = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            for bucket in range(INDEX_BUCKETS):
+                base = dict(read_bucket(base_dir, bucket))
+                changed: dict[int, list[Any]] = {}
+                for key, fingerprint in read_bucket(out_dir, bucket):
+                    if base.pop(key, None) == fingerprint:
+                        continue
+                    node = rc.nodes_manager.get_node_from_slot(rc.keyslot(key))
+                    if node.name not in shard_of:
+                        raise SystemExit(
+                            "Cluster topology changed during the incremental backup; run it again"
+                        )
+                    # Keys of decoded (jsonl) backups are read back as str
+                    k = key if args.format == "dump" else key.decode("utf-8")
+                    changed.setdefault(shard_of[node.name], []).append(k)
+                    changed_total += 1
+                for key in base:
+                    tombstones.add(key)
+                futures = [
+                    pool.submit(_dump_changed, primaries[idx][1], keys, writers[idx], tombstones, args)
+                    for idx, keys in changed.items()
+                ]
+                for fut in futures:
+                    stats.merge(fut.result())
+    finally:
+        for w in writers:
+            w.close()
+            stats.raw_bytes += w.raw_bytes
+            stats.stored_bytes += w.stored_bytes
+            stats.write_seconds += w.write_seconds
+        tombstones_path = tombstones.close()
+    manifest.add(tombstones_path, keys=tombstones.keys)
+    print(
+        f"Incremental: {scanned} keys scanned, {changed_total} changed or added, "
+        f"{tombstones.keys} deleted"
+    )
+    return stats, tombstones_path
@@ -0,0 +1,327 @@
+from __future__ import annotations
+
+import bisect
+import fnmatch
+import heapq
+import json
+import struct
+import threading
+import zlib
+from pathlib import Path
+from typing import Any, Callable, Iterator, NamedTuple
+
+from redis.crc import key_slot
+
+from digest import dump_type
+from fingerprints import (
+    INDEX_BUCKETS,
+    INDEX_DIR,
+    bucket_of,
+    next_generation,
+    rewrite_spill,
+    spill_generations,
+)
+from parts import SLOT_RANGE, part_format, part_index, part_name
+
+# Sorted key -> location index of one backup, written next to metadata.json
+# and uploaded to S3 as <backup_id>.keys so single keys can be found with a
+# few range reads. Layout: zlib blocks of sorted entries, a JSON footer
+# (block table, part archive offsets) and the footer length as a u64.
+KEY_INDEX_FILE = "keys.idx"
+KEYS_SUFFIX = ".keys"
+
+TYPES = ("string", "hash", "list", "set", "zset", "stream", "unknown")
+_TYPE_IDX = {t: i for i, t in enumerate(TYPES)}
+# Type of the tombstones of an incremental: the key was deleted since the
+# backups it builds on
+DELETED = "deleted"
+_DELETED_IDX = 255
+
+# Entry: u32 key length | u16 shard | u32 part | u64 frame offset |
+# u32 frame length | u64 frame raw offset | u32 row offset in frame |
+# u32 rows length | u8 type | u16 slot | key
+_ENTRY = struct.Struct(">IHIQIQIIBH")
+_TAIL = struct.Struct(">Q")
+_BLOCK_BYTES = 64 * 1024
+# Enough to get the whole footer in one read for most backups
+_TAIL_READ = 64 * 1024
+
+
+class KeyEntry(NamedTuple):
+    key: bytes
+    part: str
+    frame_offset: int
+    frame_length: int
+    frame_raw_offset: int
+    row_offset: int
+    row_length: int
+    type: str
+    slot: int
+
+
+def _key_bytes(key: Any) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+def _entries(data: bytes) -> Iterator[tuple[bytes, bytes]]:
+    # (key, packed entry) records; an entry cut short by a killed backup
+    # ends the spill
+    pos = 0
+    while pos + _ENTRY.size <= len(data):
+        header = data[pos : pos + _ENTRY.size]
+        key_len = _ENTRY.unpack(header)[0]
+        pos += _ENTRY.size
+        if pos + key_len > len(data):
+            return
+        yield data[pos : pos + key_len], header
+        pos += key_len
+
+
+def _read_entries(path: Path) -> Iterator[tuple[bytes, bytes]]:
+    with path.open("rb") as f:
+        while header := f.read(_ENTRY.size):
+            yield f.read(_ENTRY.unpack(header)[0]), header
+
+
+class KeyIndexWriter:
+    """Collects where each key's rows were written (part, compressed frame,
+    offset in the frame) while the dump runs, spilled in hash buckets, and
+    builds the sorted ``keys.idx`` from them once all parts are written.
+
+    A resumed backup starts a new generation of spills, after dropping the
+    entries of parts past ``committed`` (next part index per shard at the
+    last checkpoint): those parts are written again under the same names.
+    An incremental also indexes its tombstones and records its ``chain``.
+    """
+
+    def __init__(
+        self,
+        out_dir: Path,
+        fmt: str,
+        codec: str,
+        committed: dict[int, int] | None = None,
+        chain: list[str] | None = None,
+    ):
+        self.out_dir = out_dir
+        self.fmt = fmt
+        self.codec = codec
+        self.chain = chain
+        self.dir = out_dir / INDEX_DIR
+        self.dir.mkdir(parents=True, exist_ok=True)
+        if committed is not None:
+
+            def kept(data: bytes) -> Iterator[bytes]:
+                for key, header in _entries(data):
+                    _kl, shard, part_idx = _ENTRY.unpack(header)[:3]
+                    if part_idx < committed.get(shard, 0):
+                        yield header + key
+
+            for b in range(INDEX_BUCKETS):
+                for _gen, p in spill_generations(self.dir, f"keys-{b:03d}"):
+                    rewrite_spill(p, kept(p.read_bytes()))
+        # Later generations win
+        gen = next_generation(self.dir, "keys-000")
+        self._paths = [self.dir / f"keys-{b:03d}.{gen}.spill" for b in range(INDEX_BUCKETS)]
+        self._files = [p.open("wb") for p in self._paths]
+        self._lock = threading.Lock()
+
+    def describe(self, item: Any) -> tuple[bytes, int]:
+        """Key and type index of a head row / dump record."""
+        if self.fmt == "dump":
+            return item[0], _TYPE_IDX.get(dump_type(item[2]), _TYPE_IDX["unknown"])
+        return _key_bytes(item["key"]), _TYPE_IDX.get(item["type"], _TYPE_IDX["unknown"])
+
+    def add_frame(
+        self,
+        part: str,
+        frame_offset: int,
+        frame_length: int,
+        frame_raw_offset: int,
+        keys: list[list[Any]],
+    ) -> None:
+        """Records the keys of a finished frame as [key, type, row offset,
+        rows length] lists."""
+        shard, part_idx = part_index(part) or (0, 0)
+        with self._lock:
+            for key, t, row_offset, row_length in keys:
+                entry = _ENTRY.pack(
+                    len(key), shard, part_idx, frame_offset, frame_length,
+                    frame_raw_offset, row_offset, row_length, t, key_slot(key),
+                )
+                self._files[bucket_of(key)].write(entry + key)
+
+    def add_tombstone(self, key: bytes) -> None:
+        entry = _ENTRY.pack(len(key), 0, 0, 0, 0, 0, 0, 0, _DELETED_IDX, key_slot(key))
+        with self._lock:
+            self._files[bucket_of(key)].write(entry + key)
+
+    def flush(self) -> None:
+        # Before a checkpoint, like FingerprintWriter.flush
+        with self._lock:
+            for f in self._files:
+                f.flush()
+
+    def close(self, archive_offsets: dict[str, int]) -> Path:
+        """Writes ``keys.idx``; ``archive_offsets`` are the offsets of the
+        part files' data inside the backup tarball."""
+        with self._lock:
+            for f in self._files:
+                f.close()
+        runs: list[Path] = []
+        for b in range(INDEX_BUCKETS):
+            entries: dict[bytes, bytes] = {}
+            for _gen, p in spill_generations(self.dir, f"keys-{b:03d}"):
+                # SCAN may return a key twice; the last location is kept
+                entries.update(_entries(p.read_bytes()))
+            run = self.dir / f"keys-{b:03d}.run"
+            with run.open("wb") as f:
+                for key in sorted(entries):
+                    f.write(entries[key] + key)
+            runs.append(run)
+
+        path = self.out_dir / KEY_INDEX_FILE
+        blocks: list[list[Any]] = []
+        keys = 0
+        with path.open("wb") as out:
+            buf = bytearray()
+            first: bytes | None = None
+
+            def flush() -> None:
+                data = zlib.compress(bytes(buf))
+                blocks.append([first.hex(), out.tell(), len(data)])  # type: ignore[union-attr]
+                out.write(data)
+                buf.clear()
+
+            # Buckets are sorted runs of disjoint keys; merging them gives
+            # one sorted index without holding it in memory
+            merged = heapq.merge(*(_read_entries(run) for run in runs))
+            for key, header in merged:
+                if not buf:
+                    first = key
+                buf += header + key
+                keys += 1
+                if len(buf) >= _BLOCK_BYTES:
+                    flush()
+            if buf:
+                flush()
+            footer = {
+                "format": self.fmt,
+                "codec": self.codec,
+                "keys": keys,
+                "blocks": blocks,
+                "slot_range": SLOT_RANGE,
+                "archive": {n: o for n, o in archive_offsets.items() if part_format(n)},
+            }
+            if self.chain:
+                footer["chain"] = self.chain
+            data = json.dumps(footer, separators=(",", ":")).encode("utf-8")
+            out.write(data + _TAIL.pack(len(data)))
+        for run in runs:
+            run.unlink()
+        return path
+
+    def remove_spills(self) -> None:
+        # Kept until the backup is complete, so it can still be resumed
+        for b in range(INDEX_BUCKETS):
+            for _gen, p in spill_generations(self.dir, f"keys-{b:03d}"):
+                p.unlink()
+
+
+def _glob_prefix(pattern: str) -> str:
+    # Literal part of a Redis glob before its first wildcard
+    for i, c in enumerate(pattern):
+        if c in "*?[\\":
+            return pattern[:i]
+    return pattern
+
+
+class KeyIndex:
+    """Reader of a ``keys.idx`` through ``read_range(offset, length)`` and
+    ``read_tail(length)``, so it works the same on a local file or an S3
+    object; only the footer and the blocks holding wanted keys are read."""
+
+    def __init__(self, read_range: Callable[[int, int], bytes], footer: dict[str, Any]):
+        self._read_range = read_range
+        self.footer = footer
+        self.fmt = footer["format"]
+        self.codec = footer["codec"]
+        # Backup ids oldest first, this one last (incrementals only)
+        self.chain: list[str] = footer.get("chain", [])
+        self.archive: dict[str, int] = footer.get("archive", {})
+        # Slots per part; part names carry the range of the entry's slot
+        self.slot_range: int | None = footer.get("slot_range")
+        self._blocks = footer["blocks"]
+        self._first_keys = [bytes.fromhex(b[0]) for b in self._blocks]
+        self._cache: dict[int, list[tuple[bytes, bytes]]] = {}
+
+    @classmethod
+    def open(
+        cls, read_range: Callable[[int, int], bytes], read_tail: Callable[[int], bytes]
+    ) -> "KeyIndex":
+        tail = read_tail(_TAIL_READ)
+        (footer_len,) = _TAIL.unpack(tail[-_TAIL.size :])
+        data = tail[max(0, len(tail) - _TAIL.size - footer_len) : -_TAIL.size]
+        if len(data) < footer_len:
+            # Footer larger than the first read: fetch it whole
+            data = read_tail(footer_len + _TAIL.size)[:footer_len]
+        return cls(read_range, json.loads(data))
+
+    @classmethod
+    def open_file(cls, path: Path) -> "KeyIndex":
+        def read_range(offset: int, length: int) -> bytes:
+            with path.open("rb") as f:
+                f.seek(offset)
+                return f.read(length)
+
+        def read_tail(length: int) -> bytes:
+            with path.open("rb") as f:
+                size = f.seek(0, 2)
+                f.seek(max(0, size - length))
+                return f.read()
+
+        return cls.open(read_range, read_tail)
+
+    @property
+    def keys(self) -> int:
+        return self.footer["keys"]
+
+    def _block(self, i: int) -> list[tuple[bytes, bytes]]:
+        if i not in self._cache:
+            _first, offset, length = self._blocks[i]
+            self._cache[i] = list(_entries(zlib.decompress(self._read_range(offset, length))))
+        return self._cache[i]
+
+    def _entry(self, key: bytes, header: bytes) -> KeyEntry:
+        _kl, shard, part, f_off, f_len, f_raw, r_off, r_len, t, slot = _ENTRY.unpack(header)
+        slots = None
+        if self.slot_range:
+            first = slot - slot % self.slot_range
+            slots = (first, first + self.slot_range - 1)
+        name = part_name(shard, part, self.fmt, self.codec, slots)
+        type_name = DELETED if t == _DELETED_IDX else TYPES[t]
+        return KeyEntry(key, name, f_off, f_len, f_raw, r_off, r_len, type_name, slot)
+
+    def get(self, key: bytes) -> KeyEntry | None:
+        i = bisect.bisect_right(self._first_keys, key) - 1
+        if i < 0:
+            return None
+        block = self._block(i)
+        j = bisect.bisect_left(block, (key,))
+        if j < len(block) and block[j][0] == key:
+            return self._entry(*block[j])
+        return None
+
+    def match(self, pattern: str) -> Iterator[KeyEntry]:
+        """Entries whose key matches a Redis glob; only blocks that can hold
+        the pattern's literal prefix are read."""
+        prefix = _glob_prefix(pattern).encode("utf-8")
+        # Redis globs negate classes with [^...], fnmatch with [!...]
+        bpat = pattern.replace("[^", "[!").encode("utf-8")
+        start = max(0, bisect.bisect_right(self._first_keys, prefix) - 1)
+        for i in range(start, len(self._blocks)):
+            if prefix and self._first_keys[i][: len(prefix)] > prefix:
+                return
+            self._cache.pop(i - 1, None)
+            for key, header in self._block(i):
+                if key.startswith(prefix) and fnmatch.fnmatchcase(key, bpat):
+                    yield self._entry(key, header)
@@ -1,6 +1,49 @@
 from __future__ import annotations
 
-from s3_utils import parse_s3_uri, get_s3_client, list_backups
+from pathlib import Path
+
+from catalog import backup_id_of, catalog_items, load_catalog, rebuild_catalog
+from chunkstore import load_manifest
+from part_manifest import load_parts_summary
+from s3_utils import MANIFEST_SUFFIX, parse_s3_uri, get_s3_client, list_backups
+
+
+def _describe(entry: dict) -> str:
+    line = f"{entry['last_modified'].isoformat()}\t{entry['size']:>10}\t{entry['key']}"
+    if entry["key"].endswith(MANIFEST_SUFFIX):
+        line += "\t(chunk store)"
+    if entry.get("base_backup_id"):
+        line += f"\t(incremental on {entry['base_backup_id']})"
+    if entry.get("parts") is not None:
+        line += (
+            f"\t{entry['parts']} parts, {entry.get('total_keys')} keys, "
+            f"{entry.get('raw_bytes')} raw / {entry.get('stored_bytes')} stored bytes"
+        )
+    return line
+
+
+def _list_uncataloged(s3, loc, env_profile: str | None) -> int:
+    items = list_backups(s3, loc, env_profile=env_profile)
+    if not items:
+        print("No backups found.")
+        return 0
+    for it in items:
+        line = f"{it['last_modified'].isoformat()}\t{it['size']:>10}\t{it['key']}"
+        if it["key"].endswith(MANIFEST_SUFFIX):
+            # The manifest is tiny; show how much part data it references
+            manifest = load_manifest(s3, loc, env_profile, Path(it["key"]).name)
+            chunks = sum(len(part["chunks"]) for part in manifest["parts"])
+            line += f"\t(chunk store: {manifest.get('raw_bytes', 0)} bytes in {chunks} chunks)"
+        # Sizes from the small part summary, not the archive
+        summary = load_parts_summary(s3, loc, env_profile, backup_id_of(it["key"]))
+        if summary:
+            line += (
+                f"\t{len(summary['parts'])} parts, {summary.get('total_keys')} keys, "
+                f"{summary.get('raw_bytes')} raw / {summary['stored_bytes']} stored bytes"
+            )
+        print(line)
+    print("No backup catalog in S3 yet; list --rebuild-catalog builds one")
+    return 0
 
 
 def run_list(args) -> int:
@@ -10,10 +53,18 @@ def run_list(args) -> int:
     s3 = get_s3_client()
     # Filter listing by env profile for isolation
     env_profile = getattr(args, "env_profile", None)
-    items = list_backups(s3, loc, env_profile=env_profile)
+    if args.rebuild_catalog:
+        catalog = rebuild_catalog(s3, loc, env_profile)
+        print(f"Rebuilt the backup catalog: {len(catalog['backups'])} backups")
+    else:
+        # One small read (none when the cached copy is current) instead of
+        # a listing plus a summary per backup
+        catalog = load_catalog(s3, loc, env_profile) if env_profile else None
+        if catalog is None:
+            return _list_uncataloged(s3, loc, env_profile)
+    items = catalog_items(catalog)
     if not items:
         print("No backups found.")
-        return 0
     for it in items:
-        print(f"{it['last_modified'].isoformat()}\t{it['size']:>10}\t{it['key']}")
+        print(_describe(it))
     return 0
@@ -0,0 +1,165 @@
+from __future__ import annotations
+
+import bisect
+import io
+import itertools
+import tarfile
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
+
+from botocore.exceptions import ClientError
+
+from chunkstore import fetch_chunk, load_manifest, plain_name
+from compression import decompress_bytes
+from keyindex import KEY_INDEX_FILE, KEYS_SUFFIX, KeyEntry, KeyIndex
+from parts import read_dump_records, read_jsonl_rows
+from s3_utils import (
+    MANIFEST_SUFFIX,
+    S3Location,
+    read_object_range,
+    read_object_tail,
+)
+
+# read(entry) -> the entry's rows, uncompressed
+_RowReader = Callable[[KeyEntry], bytes]
+
+
+class KeySource:
+    """A backup opened for point lookups: its key index and a reader that
+    fetches only the compressed frame holding a key's rows."""
+
+    def __init__(self, name: str, index: KeyIndex | None, read: _RowReader):
+        self.name = name
+        self.index = index
+        self._read = read
+
+    def items(self, entries: Iterable[KeyEntry]) -> Iterator[Any]:
+        """Rows (or dump records) of ``entries``, read frame by frame."""
+        fmt = self.index.fmt if self.index else "jsonl"
+        for entry in entries:
+            data = io.BytesIO(self._read(entry))
+            if fmt == "dump":
+                records = read_dump_records(data, magic=False)
+                yield from (r for r in records if r[0] == entry.key)
+            else:
+                key = entry.key.decode("utf-8")
+                yield from (row for row in read_jsonl_rows(data) if row["key"] == key)
+
+
+def _frame_reader(read_frame: Callable[[KeyEntry], bytes]) -> _RowReader:
+    # Keys are looked up in index order, so neighbours often share a frame
+    cached: dict[tuple[str, int], bytes] = {}
+
+    def read(entry: KeyEntry) -> bytes:
+        frame_id = (entry.part, entry.frame_offset)
+        if frame_id not in cached:
+            cached.clear()
+            cached[frame_id] = decompress_bytes(read_frame(entry), entry.part)
+        return cached[frame_id][entry.row_offset : entry.row_offset + entry.row_length]
+
+    return read
+
+
+def _read_file_range(path: Path, offset: int, length: int) -> bytes:
+    with path.open("rb") as f:
+        f.seek(offset)
+        return f.read(length)
+
+
+def open_local_source(inp: Path) -> KeySource:
+    """Key source over a backup dir or an uncompressed ``.tar`` archive."""
+    if inp.is_dir():
+        index_path = inp / KEY_INDEX_FILE
+        index = KeyIndex.open_file(index_path) if index_path.exists() else None
+
+        def read_dir_frame(entry: KeyEntry) -> bytes:
+            return _read_file_range(inp / "keys" / entry.part, entry.frame_offset, entry.frame_length)
+
+        return KeySource(inp.resolve().name, index, _frame_reader(read_dir_frame))
+
+    name = inp.name[: -len(".tar")] if inp.name.endswith(".tar") else inp.name
+    try:
+        with tarfile.open(inp, "r:") as tar:
+            offsets = {Path(m.name).name: (m.offset_data, m.size) for m in tar.getmembers()}
+    except tarfile.ReadError:
+        # Legacy .tar.gz archives cannot be seeked (nor have an index)
+        return KeySource(name, None, lambda entry: b"")
+    index = None
+    if KEY_INDEX_FILE in offsets:
+        base, size = offsets[KEY_INDEX_FILE]
+        index = KeyIndex.open(
+            lambda offset, length: _read_file_range(inp, base + offset, length),
+            lambda length: _read_file_range(inp, base + max(0, size - length), min(length, size)),
+        )
+
+    def read_tar_frame(entry: KeyEntry) -> bytes:
+        base, _size = offsets[entry.part]
+        return _read_file_range(inp, base + entry.frame_offset, entry.frame_length)
+
+    return KeySource(name, index, _frame_reader(read_tar_frame))
+
+
+def _open_s3_index(s3: Any, loc: S3Location, env_profile: str, backup_id: str) -> KeyIndex | None:
+    keys_name = f"{backup_id}{KEYS_SUFFIX}"
+    try:
+        return KeyIndex.open(
+            lambda offset, length: read_object_range(s3, loc, env_profile, keys_name, offset, length),
+            lambda length: read_object_tail(s3, loc, env_profile, keys_name, length),
+        )
+    except ClientError:
+        return None
+
+
+def _manifest_reader(s3: Any, loc: S3Location, env_profile: str, manifest: dict[str, Any]) -> _RowReader:
+    # Chunks hold uncompressed part bytes: fetch the ones covering the rows
+    codec = manifest.get("chunk_codec", "none")
+    parts = {}
+    for part in manifest["parts"]:
+        starts = [0] + list(itertools.accumulate(part["chunk_bytes"]))
+        parts[part["name"]] = (part["chunks"], starts)
+
+    cached: dict[str, bytes] = {}
+
+    def chunk(chunk_id: str) -> bytes:
+        if chunk_id not in cached:
+            cached.clear()
+            cached[chunk_id] = fetch_chunk(s3, loc, env_profile, chunk_id, codec)
+        return cached[chunk_id]
+
+    def read(entry: KeyEntry) -> bytes:
+        chunks, starts = parts[plain_name(entry.part)]
+        start = entry.frame_raw_offset + entry.row_offset
+        end = start + entry.row_length
+        first = bisect.bisect_right(starts, start) - 1
+        data = bytearray()
+        i = first
+        while i < len(chunks) and starts[i] < end:
+            data += chunk(chunks[i])
+            i += 1
+        return bytes(data[start - starts[first] : end - starts[first]])
+
+    return read
+
+
+def open_s3_source(s3: Any, loc: S3Location, env_profile: str, object_name: str) -> KeySource:
+    """Key source over a backup in S3 (archive or chunk-store manifest),
+    read with HTTP range requests."""
+    if object_name.endswith(MANIFEST_SUFFIX):
+        backup_id = object_name[: -len(MANIFEST_SUFFIX)]
+        manifest = load_manifest(s3, loc, env_profile, object_name)
+        index = _open_s3_index(s3, loc, env_profile, backup_id)
+        return KeySource(backup_id, index, _manifest_reader(s3, loc, env_profile, manifest))
+
+    if not object_name.endswith(".tar"):
+        # Legacy .tar.gz archives cannot be range-read (nor have an index)
+        return KeySource(object_name, None, lambda entry: b"")
+    backup_id = object_name[: -len(".tar")]
+    index = _open_s3_index(s3, loc, env_profile, backup_id)
+
+    def read_s3_frame(entry: KeyEntry) -> bytes:
+        base = index.archive[entry.part]  # type: ignore[union-attr]
+        return read_object_range(
+            s3, loc, env_profile, object_name, base + entry.frame_offset, entry.frame_length
+        )
+
+    return KeySource(backup_id, index, _frame_reader(read_s3_frame))
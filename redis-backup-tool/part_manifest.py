@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import json
+import tarfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, BinaryIO, Callable
+
+from botocore.exceptions import ClientError
+
+from chunkstore import chunk_objects, read_chunk_object
+from digest import dump_type
+from parts import FORMATS, member_kind
+from s3_utils import MANIFEST_SUFFIX, S3Location, open_object_range, open_object_stream
+
+# Part manifest of a backup: one JSON line per finished part file (SHA-256
+# and size of the stored bytes, key and per-type counts, slot range, min/max
+# key), appended as each part closes. Uploaded to S3 as
+# <backup_id>.parts.json with the parts' archive offsets, so list can show
+# sizes and parts can be checked with range reads, without the archive.
+# Restore stops on a missing or damaged part; backups written before the
+# manifest existed are restored unchecked.
+PART_MANIFEST_FILE = "manifest.jsonl"
+PARTS_SUFFIX = ".parts.json"
+
+_HASH_READ = 1024 * 1024
+_VALIDATE_WORKERS = 8
+
+# open(entry) -> stream positioned at the start of the part's stored bytes
+PartOpener = Callable[[dict[str, Any]], BinaryIO]
+
+
+def _key_text(key: bytes) -> str:
+    return key.decode("utf-8", "backslashreplace")
+
+
+class PartStats:
+    """Keys, types, slots and key range of one part being written."""
+
+    def __init__(self, fmt: str):
+        self.fmt = fmt
+        self.keys = 0
+        self.raw_bytes = 0
+        self.types: dict[str, int] = {}
+        self.slots: list[int] | None = None
+        self.min_key: bytes | None = None
+        self.max_key: bytes | None = None
+
+    def add(self, item: Any, key: bytes, slot: int) -> None:
+        t = dump_type(item[2]) if self.fmt == "dump" else item["type"]
+        self.keys += 1
+        self.types[t] = self.types.get(t, 0) + 1
+        if self.slots is None:
+            self.slots = [slot, slot]
+            self.min_key = self.max_key = key
+            return
+        self.slots = [min(self.slots[0], slot), max(self.slots[1], slot)]
+        self.min_key = min(self.min_key, key)  # type: ignore[type-var]
+        self.max_key = max(self.max_key, key)  # type: ignore[type-var]
+
+
+def _hash_stream(f: BinaryIO, length: int | None = None) -> tuple[str, int]:
+    h = hashlib.sha256()
+    size = 0
+    while length is None or size < length:
+        chunk = f.read(_HASH_READ if length is None else min(_HASH_READ, length - size))
+        if not chunk:
+            break
+        h.update(chunk)
+        size += len(chunk)
+    return h.hexdigest(), size
+
+
+class PartManifestWriter:
+    """Appends an entry to ``manifest.jsonl`` whenever a part (or the
+    tombstones file) is finished. A resumed backup keeps only the entries
+    of the parts it kept."""
+
+    def __init__(self, out_dir: Path, fmt: str, keep: set[str] | None = None):
+        self.fmt = fmt
+        self.path = out_dir / PART_MANIFEST_FILE
+        entries = []
+        if keep is not None and self.path.exists():
+            entries = [e for e in read_manifest_lines(self.path.read_bytes()) if e["name"] in keep]
+        self.entries: list[dict[str, Any]] = entries
+        self._f = self.path.open("w", encoding="utf-8")
+        for entry in entries:
+            self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        self._f.flush()
+        self._lock = threading.Lock()
+
+    def stats(self) -> PartStats:
+        return PartStats(self.fmt)
+
+    def add(self, path: Path, stats: PartStats | None = None, keys: int | None = None) -> None:
+        # A streaming pass over the file just written (still in page cache)
+        with path.open("rb") as f:
+            sha256, size = _hash_stream(f)
+        entry: dict[str, Any] = {
+            "name": path.name,
+            "kind": member_kind(path.name),
+            "sha256": sha256,
+            "bytes": size,
+        }
+        if stats is not None:
+            entry.update(
+                raw_bytes=stats.raw_bytes,
+                keys=stats.keys,
+                types=stats.types,
+                slots=stats.slots,
+                min_key=_key_text(stats.min_key) if stats.min_key is not None else None,
+                max_key=_key_text(stats.max_key) if stats.max_key is not None else None,
+            )
+        elif keys is not None:
+            entry["keys"] = keys
+        with self._lock:
+            self.entries.append(entry)
+            self._f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._f.flush()
+
+    def close(self) -> Path:
+        with self._lock:
+            self._f.close()
+        return self.path
+
+    def write_summary(
+        self, dest: Path, meta: dict[str, Any], archive_offsets: dict[str, int]
+    ) -> Path:
+        """``<backup_id>.parts.json``: the entries, with the offset of each
+        part's data in the archive, plus totals for ``list``."""
+        parts = []
+        for entry in sorted(self.entries, key=lambda e: e["name"]):
+            offset = archive_offsets.get(entry["name"])
+            parts.append(entry if offset is None else {**entry, "offset": offset})
+        summary = {
+            "backup_id": meta["backup_id"],
+            "format": meta.get("format", "jsonl"),
+            "total_keys": meta.get("total_keys"),
+            "raw_bytes": meta.get("raw_bytes"),
+            "stored_bytes": sum(e["bytes"] for e in parts),
+            "parts": parts,
+        }
+        dest.write_text(json.dumps(summary, ensure_ascii=False, indent=2), encoding="utf-8")
+        return dest
+
+
+def read_manifest_lines(data: bytes) -> list[dict[str, Any]]:
+    # A crash may leave a torn last line; its part was not checkpointed
+    entries = []
+    for line in data.splitlines():
+        try:
+            entries.append(json.loads(line))
+        except ValueError:
+            break
+    return entries
+
+
+def validate_parts(
+    name: str, entries: list[dict[str, Any]], open_part: PartOpener
+) -> list[str]:
+    """Hashes the parts listed in a manifest in parallel and returns the
+    problems found (missing or corrupt parts)."""
+    started = time.perf_counter()
+
+    def check(entry: dict[str, Any]) -> str | None:
+        try:
+            f = open_part(entry)
+        except (OSError, KeyError, ClientError) as e:
+            return f"{entry['name']}: missing ({e})"
+        try:
+            sha256, size = _hash_stream(f, entry["bytes"])
+        finally:
+            f.close()
+        if size != entry["bytes"]:
+            return f"{entry['name']}: {size} bytes, expected {entry['bytes']}"
+        if sha256 != entry["sha256"]:
+            return f"{entry['name']}: SHA-256 mismatch"
+        return None
+
+    with ThreadPoolExecutor(max_workers=_VALIDATE_WORKERS) as pool:
+        problems = [p for p in pool.map(check, entries) if p]
+    total = sum(e["bytes"] for e in entries)
+    print(
+        f"Checked {len(entries)} parts of {name} ({total / (1024 * 1024):.1f} MiB) "
+        f"in {time.perf_counter() - started:.1f}s: "
+        + (f"{len(problems)} bad" if problems else "all match the manifest")
+    )
+    return problems
+
+
+def local_part_manifest(inp: Path) -> tuple[list[dict[str, Any]], PartOpener] | None:
+    """Manifest entries and part opener of a backup dir or uncompressed
+    ``.tar``; None for backups without a manifest (or ``.tar.gz``)."""
+    if inp.is_dir():
+        path = inp / PART_MANIFEST_FILE
+        if not path.exists():
+            return None
+
+        def open_dir_part(entry: dict[str, Any]) -> BinaryIO:
+            sub = inp / "keys" if entry["kind"] in FORMATS else inp
+            return (sub / entry["name"]).open("rb")
+
+        return read_manifest_lines(path.read_bytes()), open_dir_part
+    try:
+        with tarfile.open(inp, "r:") as tar:
+            members = {Path(m.name).name: m for m in tar.getmembers() if m.isfile()}
+            if PART_MANIFEST_FILE not in members:
+                return None
+            f = tar.extractfile(members[PART_MANIFEST_FILE])
+            entries = read_manifest_lines(f.read()) if f else []
+    except tarfile.ReadError:
+        return None
+
+    def open_tar_part(entry: dict[str, Any]) -> BinaryIO:
+        # Hashing stops after entry["bytes"], the end of the member
+        f = inp.open("rb")
+        f.seek(members[entry["name"]].offset_data)
+        return f
+
+    return entries, open_tar_part
+
+
+def load_parts_summary(
+    s3: Any, loc: S3Location, env_profile: str, backup_id: str
+) -> dict[str, Any] | None:
+    try:
+        body = open_object_stream(s3, loc, env_profile, f"{backup_id}{PARTS_SUFFIX}")
+    except ClientError:
+        return None
+    try:
+        return json.load(body)
+    finally:
+        body.close()
+
+
+def s3_part_manifest(
+    s3: Any, loc: S3Location, env_profile: str, object_name: str
+) -> tuple[list[dict[str, Any]], PartOpener] | None:
+    """Entries and opener for a backup in S3: archive parts are read with
+    range requests; for a chunk-store backup every chunk it references is
+    checked against its hash instead."""
+    if object_name.endswith(MANIFEST_SUFFIX):
+        entries = chunk_objects(s3, loc, env_profile, object_name)
+
+        def open_chunk(entry: dict[str, Any]) -> BinaryIO:
+            return io.BytesIO(read_chunk_object(s3, loc, env_profile, entry["name"]))
+
+        return entries, open_chunk
+    if not object_name.endswith(".tar"):
+        return None
+    summary = load_parts_summary(s3, loc, env_profile, object_name[: -len(".tar")])
+    if summary is None or any("offset" not in e for e in summary["parts"]):
+        return None
+
+    def open_s3_part(entry: dict[str, Any]) -> BinaryIO:
+        return open_object_range(s3, loc, env_profile, object_name, entry["offset"], entry["bytes"])
+
+    return summary["parts"], open_s3_part
@@ -0,0 +1,410 @@
+from __future__ import annotations
+
+import json
+import re
+import struct
+import tarfile
+import time
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, BinaryIO, Callable, Iterator, NamedTuple
+
+from redis.crc import key_slot
+
+from compression import SUFFIXES, FrameWriter, wrap_reader
+
+if TYPE_CHECKING:
+    from keyindex import KeyIndexWriter
+    from part_manifest import PartManifestWriter, PartStats
+
+FORMATS = ("jsonl", "dump")
+
+# Binary "dump" parts: magic, then one record per key:
+#   u32 key length | u64 absolute expiry in ms (0 = none) | u32 payload length
+#   key bytes | DUMP payload bytes
+DUMP_MAGIC = b"RCDUMP1\n"
+_DUMP_HEADER = struct.Struct(">IQI")
+
+DumpRecord = tuple[bytes, int, bytes]
+
+_READ_SIZE = 1024 * 1024
+
+# Parts are compressed as independent frames of about this many raw bytes,
+# cut between keys, so a single key can be read back without
+# decompressing its part from the start.
+_FRAME_BYTES = 256 * 1024
+
+
+# Parts are partitioned by hash slot: each one only holds keys of a range
+# of SLOT_RANGE slots, named in the file, so a restore of some slots skips
+# the other parts without decompressing them.
+SLOT_RANGE = 1024
+
+# keys-part-<shard>-<part>.s<first>-<last>.<fmt>[.gz|.zst]; older backups
+# have no slot range or shard index
+_PART_RE = re.compile(
+    r"^keys-part-(?:(\d+)-)?(\d+)(?:\.s(\d+)-(\d+))?\.(jsonl|dump)(\.gz|\.zst)?$"
+)
+
+# Incremental backups also carry the list of backups they build on (first
+# member of the archive) and the keys deleted since their base.
+CHAIN_FILE = "chain.json"
+TOMBSTONES_FILE = "tombstones.bin"
+_TOMBSTONES_RE = re.compile(r"^tombstones\.bin(\.gz|\.zst)?$")
+_KEY_LEN = struct.Struct(">I")
+
+# (file name, format, raw possibly-compressed stream) for each part; the
+# format is "chain" or "tombstones" for the incremental-only members
+PartStream = tuple[str, str, BinaryIO]
+
+
+class Tombstone(NamedTuple):
+    """A key deleted since the base of an incremental backup."""
+
+    key: bytes
+
+
+def part_format(name: str) -> str | None:
+    m = _PART_RE.match(name.rsplit("/", 1)[-1])
+    return m.group(5) if m else None
+
+
+def member_kind(name: str) -> str | None:
+    base = name.rsplit("/", 1)[-1]
+    fmt = part_format(base)
+    if fmt:
+        return fmt
+    if base == CHAIN_FILE:
+        return "chain"
+    if _TOMBSTONES_RE.match(base):
+        return "tombstones"
+    return None
+
+
+def part_index(name: str) -> tuple[int, int] | None:
+    """(shard index, part index) encoded in a part file name."""
+    m = _PART_RE.match(name.rsplit("/", 1)[-1])
+    return (int(m.group(1) or 0), int(m.group(2))) if m else None
+
+
+def part_slots(name: str) -> tuple[int, int] | None:
+    """(first, last) hash slot of a part; None when it is not partitioned."""
+    m = _PART_RE.match(name.rsplit("/", 1)[-1])
+    return (int(m.group(3)), int(m.group(4))) if m and m.group(3) else None
+
+
+def slot_range(slot: int) -> tuple[int, int]:
+    first = slot - slot % SLOT_RANGE
+    return first, first + SLOT_RANGE - 1
+
+
+def part_name(
+    shard_idx: int,
+    part_idx: int,
+    fmt: str,
+    codec: str = "none",
+    slots: tuple[int, int] | None = None,
+) -> str:
+    rng = f".s{slots[0]:05d}-{slots[1]:05d}" if slots else ""
+    return f"keys-part-{shard_idx:02d}-{part_idx:04d}{rng}.{fmt}{SUFFIXES[codec]}"
+
+
+def list_parts(dir_path: Path, fmt: str) -> list[Path]:
+    # Matches plain and compressed parts (.jsonl, .jsonl.gz, .dump.zst, ...)
+    return sorted((dir_path / "keys").glob(f"keys-part-*.{fmt}*"))
+
+
+def load_metadata(dir_path: Path) -> dict[str, Any]:
+    meta_path = dir_path / "metadata.json"
+    if not meta_path.exists():
+        return {}
+    with meta_path.open("r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def backup_format(dir_path: Path) -> str:
+    meta = load_metadata(dir_path)
+    if meta:
+        return meta.get("format", "jsonl")
+    return "dump" if list_parts(dir_path, "dump") else "jsonl"
+
+
+def iter_dir_part_streams(dir_path: Path, extras: bool = False) -> Iterator[PartStream]:
+    """Part streams of a backup dir; with ``extras`` the chain and tombstone
+    members of an incremental backup come first."""
+    paths = sorted((dir_path / "keys").glob("keys-part-*"))
+    if extras:
+        paths = [dir_path / CHAIN_FILE] + sorted(dir_path.glob(f"{TOMBSTONES_FILE}*")) + paths
+    for p in paths:
+        kind = member_kind(p.name) if p.is_file() else None
+        if kind:
+            with p.open("rb") as f:
+                yield p.name, kind, f
+
+
+def iter_tar_part_streams(fileobj: BinaryIO, extras: bool = False) -> Iterator[PartStream]:
+    """Walks a backup archive as a forward-only stream (e.g. an S3 body),
+    yielding part members without extracting anything to disk."""
+    with tarfile.open(fileobj=fileobj, mode="r|*") as tar:
+        for member in tar:
+            kind = member_kind(member.name) if member.isfile() else None
+            if not kind or (kind not in FORMATS and not extras):
+                continue
+            f = tar.extractfile(member)
+            if f is not None:
+                yield member.name.rsplit("/", 1)[-1], kind, f
+
+
+def iter_part_items(stream: PartStream) -> Iterator[Any]:
+    """Decompresses one part and yields its JSONL rows, dump records or
+    tombstones."""
+    name, fmt, raw = stream
+    with wrap_reader(raw, name) as f:
+        if fmt == "dump":
+            yield from read_dump_records(f)
+        elif fmt == "tombstones":
+            yield from read_tombstones(f)
+        else:
+            yield from read_jsonl_rows(f)
+
+
+def iter_part_lines(stream: PartStream) -> Iterator[bytearray]:
+    """Raw lines of one JSONL part, left undecoded."""
+    name, _fmt, raw = stream
+    with wrap_reader(raw, name) as f:
+        yield from read_jsonl_lines(f)
+
+
+def iter_part_records(stream: PartStream) -> Iterator[bytes]:
+    """Decompressed bytes of one part split on row/record boundaries; joined
+    back together they are the uncompressed part file."""
+    name, fmt, raw = stream
+    with wrap_reader(raw, name) as f:
+        if fmt == "dump":
+            if f.read(len(DUMP_MAGIC)) != DUMP_MAGIC:
+                raise ValueError("Not a dump part file (bad magic)")
+            yield DUMP_MAGIC
+            for record in read_dump_records(f, magic=False):
+                yield encode_dump_record(record)
+        elif fmt == "tombstones":
+            for tombstone in read_tombstones(f):
+                yield encode_tombstone(tombstone.key)
+        else:
+            for line in read_jsonl_lines(f):
+                yield bytes(line) + b"\n"
+
+
+def read_jsonl_lines(f: BinaryIO) -> Iterator[bytearray]:
+    # Split lines by hand: tar stream members and decompressors are not
+    # seekable, which io.TextIOWrapper insists on.
+    buf = bytearray()
+    scan_from = 0
+    while True:
+        chunk = f.read(_READ_SIZE)
+        buf += chunk
+        start = 0
+        while (nl := buf.find(b"\n", scan_from)) >= 0:
+            line = buf[start:nl]
+            start = scan_from = nl + 1
+            if line.strip():
+                yield line
+        del buf[:start]
+        scan_from = len(buf)
+        if not chunk:
+            break
+    if buf.strip():
+        yield buf
+
+
+def read_jsonl_rows(f: BinaryIO) -> Iterator[dict[str, Any]]:
+    for line in read_jsonl_lines(f):
+        yield json.loads(line)
+
+
+def is_continuation(row: dict[str, Any]) -> bool:
+    # Large collections are dumped page by page; pages after the first are
+    # continuation rows appended to the key created by the head row.
+    return bool(row.get("cont"))
+
+
+def encode_jsonl_row(row: dict[str, Any]) -> bytes:
+    return (json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+def encode_dump_record(record: DumpRecord) -> bytes:
+    key, expire_at, payload = record
+    return _DUMP_HEADER.pack(len(key), expire_at, len(payload)) + key + payload
+
+
+class _OpenPart:
+    """A part file being written and the position of its current frame."""
+
+    def __init__(self, path: Path, f: FrameWriter, stats: PartStats | None):
+        self.path = path
+        self.f = f
+        self.stats = stats
+        self.keys = 0
+        # Uncompressed offsets in the part, and the keys of the current
+        # frame as [key, type, row offset, rows length]
+        self.raw_offset = 0
+        self.frame_raw_offset = 0
+        self.frame_keys: list[list[Any]] = []
+
+
+class PartWriter:
+    """Streams one shard's rows into compressed keys-part files, one open
+    part per slot range the shard's keys fall in. Parts are rotated by the
+    caller through ``rotate`` once one holds ``chunk_keys`` keys; all open
+    parts close together, which keeps part boundaries on SCAN batch
+    boundaries (and a key's continuation rows in the same file).
+    ``on_part_closed`` is called with each finished part; ``key_index`` is
+    told where every key was written and ``manifest`` gets the checksum and
+    counts of each part."""
+
+    def __init__(
+        self,
+        keys_dir: Path,
+        shard_idx: int,
+        fmt: str,
+        chunk_keys: int,
+        codec: str = "none",
+        on_part_closed: Callable[[Path], None] | None = None,
+        first_part_idx: int = 0,
+        key_index: KeyIndexWriter | None = None,
+        manifest: PartManifestWriter | None = None,
+    ):
+        self.keys_dir = keys_dir
+        self.shard_idx = shard_idx
+        self.fmt = fmt
+        self.chunk_keys = chunk_keys
+        self.codec = codec
+        self.on_part_closed = on_part_closed
+        # Index of the next part to open; parts below it are closed once
+        # rotate() returned True
+        self.part_idx = first_part_idx
+        self.paths: list[Path] = []
+        # Throughput counters: bytes before/after compression and time spent
+        # encoding + compressing + writing
+        self.raw_bytes = 0
+        self.stored_bytes = 0
+        self.write_seconds = 0.0
+        self.key_index = key_index
+        self.manifest = manifest
+        self._parts: dict[int, _OpenPart] = {}
+        # Part of the last head row, where its continuation rows go
+        self._current: _OpenPart | None = None
+        self._encode = encode_dump_record if fmt == "dump" else encode_jsonl_row
+
+    def _open(self, slots: tuple[int, int]) -> _OpenPart:
+        self.keys_dir.mkdir(parents=True, exist_ok=True)
+        name = part_name(self.shard_idx, self.part_idx, self.fmt, self.codec, slots)
+        self.part_idx += 1
+        p = self.keys_dir / name
+        stats = self.manifest.stats() if self.manifest is not None else None
+        part = _OpenPart(p, FrameWriter(p, self.codec), stats)
+        if self.fmt == "dump":
+            part.f.write(DUMP_MAGIC)
+            self.raw_bytes += len(DUMP_MAGIC)
+            part.raw_offset = len(DUMP_MAGIC)
+        self.paths.append(p)
+        return part
+
+    def _part_for(self, slot: int) -> _OpenPart:
+        slots = slot_range(slot)
+        part = self._parts.get(slots[0])
+        if part is None:
+            part = self._parts[slots[0]] = self._open(slots)
+        return part
+
+    def _end_frame(self, part: _OpenPart) -> None:
+        offset, length = part.f.end_frame()
+        if self.key_index is not None and part.frame_keys:
+            self.key_index.add_frame(
+                part.path.name, offset, length, part.frame_raw_offset, part.frame_keys
+            )
+        part.frame_keys = []
+        part.frame_raw_offset = part.raw_offset
+
+    def write(self, item: Any, new_key: bool = True) -> None:
+        started = time.perf_counter()
+        part = self._current
+        if new_key or part is None:
+            key = item[0] if self.fmt == "dump" else item["key"].encode("utf-8")
+            slot = key_slot(key)
+            part = self._current = self._part_for(slot)
+            part.keys += 1
+            if part.stats is not None:
+                part.stats.add(item, key, slot)
+            if part.raw_offset - part.frame_raw_offset >= _FRAME_BYTES:
+                self._end_frame(part)
+        data = self._encode(item)
+        if self.key_index is not None:
+            if new_key:
+                key, t = self.key_index.describe(item)
+                part.frame_keys.append([key, t, part.raw_offset - part.frame_raw_offset, 0])
+            if part.frame_keys:
+                part.frame_keys[-1][3] += len(data)
+        part.f.write(data)
+        self.write_seconds += time.perf_counter() - started
+        self.raw_bytes += len(data)
+        part.raw_offset += len(data)
+
+    def rotate(self) -> bool:
+        """Closes the open parts once one is full; True when they were."""
+        if not any(part.keys >= self.chunk_keys for part in self._parts.values()):
+            return False
+        self._close_parts()
+        return True
+
+    def _close_parts(self) -> None:
+        parts = [self._parts[first] for first in sorted(self._parts)]
+        self._parts.clear()
+        self._current = None
+        for part in parts:
+            started = time.perf_counter()
+            self._end_frame(part)
+            part.f.close()
+            self.write_seconds += time.perf_counter() - started
+            self.stored_bytes += part.path.stat().st_size
+            if self.manifest is not None:
+                part.stats.raw_bytes = part.raw_offset  # type: ignore[union-attr]
+                self.manifest.add(part.path, part.stats)
+            if self.on_part_closed:
+                self.on_part_closed(part.path)
+
+    def close(self) -> None:
+        self._close_parts()
+
+
+def read_dump_records(f: BinaryIO, magic: bool = True) -> Iterator[DumpRecord]:
+    if magic and f.read(len(DUMP_MAGIC)) != DUMP_MAGIC:
+        raise ValueError("Not a dump part file (bad magic)")
+    while True:
+        header = f.read(_DUMP_HEADER.size)
+        if not header:
+            return
+        if len(header) < _DUMP_HEADER.size:
+            raise ValueError("Truncated dump record header")
+        key_len, expire_at, payload_len = _DUMP_HEADER.unpack(header)
+        key = f.read(key_len)
+        payload = f.read(payload_len)
+        if len(key) < key_len or len(payload) < payload_len:
+            raise ValueError("Truncated dump record")
+        yield key, expire_at, payload
+
+
+def encode_tombstone(key: bytes) -> bytes:
+    return _KEY_LEN.pack(len(key)) + key
+
+
+def read_tombstones(f: BinaryIO) -> Iterator[Tombstone]:
+    while True:
+        header = f.read(_KEY_LEN.size)
+        if not header:
+            return
+        if len(header) < _KEY_LEN.size:
+            raise ValueError("Truncated tombstone record header")
+        (key_len,) = _KEY_LEN.unpack(header)
+        key = f.read(key_len)
+        if len(key) < key_len:
+            raise ValueError("Truncated tombstone record")
+        yield Tombstone(key)
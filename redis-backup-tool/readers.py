@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any
+
+from redis_utils import normalize_type, normalize_pttl, now_millis
+
+
+@dataclass
+class DumpStats:
+    keys: int = 0
+    round_trips: int = 0
+    raw_bytes: int = 0
+    stored_bytes: int = 0
+    write_seconds: float = 0.0
+
+    def merge(self, other: "DumpStats") -> None:
+        self.keys += other.keys
+        self.round_trips += other.round_trips
+        self.raw_bytes += other.raw_bytes
+        self.stored_bytes += other.stored_bytes
+        self.write_seconds += other.write_seconds
+
+    @property
+    def round_trips_per_key(self) -> float:
+        return self.round_trips / self.keys if self.keys else 0.0
+
+
+def _queue_first_page(pipe, key: str, t: str, page_size: int) -> bool:
+    # Collections are read one page at a time so a huge key never has to be
+    # materialized (or block the shard) in a single reply.
+    if t == "string":
+        pipe.get(key)
+    elif t == "hash":
+        pipe.hscan(key, 0, count=page_size)
+    elif t == "list":
+        pipe.lrange(key, 0, page_size - 1)
+    elif t == "set":
+        pipe.sscan(key, 0, count=page_size)
+    elif t == "zset":
+        pipe.zscan(key, 0, count=page_size)
+    elif t == "stream":
+        pipe.xrange(key, min="-", max="+", count=page_size)
+        pipe.xinfo_groups(key)
+    else:
+        return False
+    return True
+
+
+def _split_page(t: str, reply: Any, page_size: int) -> tuple[Any, Any]:
+    """Returns (page value, resume position or None when the key is done)."""
+    if t in ("hash", "set", "zset"):
+        cursor, value = reply
+        return value, (cursor or None)
+    if t == "list":
+        return reply, (page_size if len(reply) == page_size else None)
+    if t == "stream":
+        return reply, (reply[-1][0] if len(reply) == page_size else None)
+    return reply, None
+
+
+def _fetch_page(r, key: str, t: str, pos: Any, page_size: int) -> Any:
+    if t == "hash":
+        return r.hscan(key, pos, count=page_size)
+    if t == "set":
+        return r.sscan(key, pos, count=page_size)
+    if t == "zset":
+        return r.zscan(key, pos, count=page_size)
+    if t == "list":
+        return r.lrange(key, pos, pos + page_size - 1)
+    # stream: exclusive start after the last id already dumped
+    return r.xrange(key, min=f"({pos}", max="+", count=page_size)
+
+
+def _iter_pages(r, key: str, t: str, pos: Any, page_size: int, stats: DumpStats):
+    while pos is not None:
+        reply = _fetch_page(r, key, t, pos, page_size)
+        stats.round_trips += 1
+        value, next_pos = _split_page(t, reply, page_size)
+        if t == "list" and next_pos is not None:
+            next_pos += pos
+        if value:
+            yield {
+                "type": t,
+                "key": key,
+                "value": sorted(value) if t == "set" else value,
+                "cont": True,
+            }
+        pos = next_pos
+
+
+def _dump_batch(r, keys: list[str], stats: DumpStats, page_size: int):
+    """Yields head rows (and continuation rows for large keys) in key order."""
+    # Round trip 1: TYPE + PTTL for the whole batch
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+        pipe.pttl(key)
+    meta = pipe.execute(raise_on_error=False)
+    stats.round_trips += 1
+
+    # Round trip 2: first page of every value
+    pending: list[tuple[str, str, int | None]] = []
+    pipe = r.pipeline(transaction=False)
+    for i, key in enumerate(keys):
+        t_raw, ttl_raw = meta[2 * i], meta[2 * i + 1]
+        if isinstance(t_raw, Exception):
+            print(f"WARN: failed dumping key {key}: {t_raw}")
+            continue
+        t = normalize_type(t_raw)
+        if _queue_first_page(pipe, key, t, page_size):
+            pending.append((key, t, normalize_pttl(ttl_raw)))
+    if not pending:
+        return
+    values = pipe.execute(raise_on_error=False)
+    stats.round_trips += 1
+
+    pos = 0
+    for key, t, ttl in pending:
+        reply = values[pos]
+        pos += 1
+        row: dict[str, Any] = {"type": t, "key": key}
+        if t == "stream":
+            groups = values[pos]
+            pos += 1
+            row["groups"] = [] if isinstance(groups, Exception) else groups
+        if isinstance(reply, Exception):
+            print(f"WARN: failed dumping key {key}: {reply}")
+            continue
+        value, resume = _split_page(t, reply, page_size)
+        row["value"] = sorted(value) if t == "set" else value
+        if ttl is not None:
+            row["pttl"] = ttl
+        stats.keys += 1
+        yield row
+        if resume is not None:
+            try:
+                yield from _iter_pages(r, key, t, resume, page_size, stats)
+            except Exception as e:
+                print(f"WARN: failed paging key {key}: {e}")
+
+
+def _dump_raw_batch(r, keys: list[bytes], stats: DumpStats, page_size: int):
+    # Single round trip: PTTL + DUMP per key; payloads stay opaque bytes
+    pipe = r.pipeline(transaction=False)
+    for key in keys:
+        pipe.pttl(key)
+        pipe.dump(key)
+    res = pipe.execute(raise_on_error=False)
+    stats.round_trips += 1
+
+    now = now_millis()
+    for i, key in enumerate(keys):
+        ttl_raw, payload = res[2 * i], res[2 * i + 1]
+        if isinstance(payload, Exception):
+            print(f"WARN: failed dumping key {key!r}: {payload}")
+            continue
+        if payload is None:
+            continue  # key vanished between SCAN and DUMP
+        ttl = normalize_pttl(ttl_raw)
+        stats.keys += 1
+        # Absolute expiry so RESTORE ... ABSTTL keeps the original deadline
+        yield (key, now + ttl if ttl is not None else 0, payload)
+
+
+_DUMPERS = {
+    "jsonl": _dump_batch,
+    "dump": _dump_raw_batch,
+}
+
+
+def read_keys(r, keys: list[Any], fmt: str, page_size: int, stats: DumpStats | None = None):
+    """Reads ``keys`` from one node exactly as backup writes them: rows
+    (with continuation pages) for jsonl, (key, expiry, payload) for dump."""
+    return _DUMPERS[fmt](r, keys, stats or DumpStats(), page_size)
+
+
+def primary_clients(rc) -> list[tuple[str, Any]]:
+    # Keys scanned on a primary are owned by it, so reads can go straight to
+    # the node client without cluster routing.
+    nodes = sorted(rc.get_primaries(), key=lambda n: n.name)
+    return [(n.name, rc.get_redis_connection(n)) for n in nodes]
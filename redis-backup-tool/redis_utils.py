@@ -3,6 +3,7 @@ from __future__ import annotations
 import os
 import time
 from dataclasses import dataclass
+from typing import Any
 
 import json
 from pathlib import Path
@@ -64,13 +65,14 @@ def build_cluster_config(
     return ClusterConfig(env_profile=profile, nodes=nodes)
 
 
-def make_cluster_client(cfg: ClusterConfig) -> RedisCluster:
+def make_cluster_client(
+    cfg: ClusterConfig, decode_responses: bool = True
+) -> RedisCluster:
     startup_nodes = [ClusterNode(host=h, port=p) for h, p in cfg.nodes]
-    return RedisCluster(startup_nodes=startup_nodes, decode_responses=True)
+    return RedisCluster(startup_nodes=startup_nodes, decode_responses=decode_responses)
 
 
-def key_type(r: Redis, key: str) -> str:
-    t = r.type(key)
+def normalize_type(t: Any) -> str:
     if isinstance(t, str):
         return t
     elif isinstance(t, bytes):
@@ -79,8 +81,7 @@ def key_type(r: Redis, key: str) -> str:
         return str(t)  # fallback for other types
 
 
-def pttl_safe(r: Redis, key: str) -> int | None:
-    ttl = r.pttl(key)
+def normalize_pttl(ttl: Any) -> int | None:
     if ttl is None:
         return None
     if isinstance(ttl, int):
@@ -96,5 +97,13 @@ def pttl_safe(r: Redis, key: str) -> int | None:
         return None
 
 
+def key_type(r: Redis, key: str) -> str:
+    return normalize_type(r.type(key))
+
+
+def pttl_safe(r: Redis, key: str) -> int | None:
+    return normalize_pttl(r.pttl(key))
+
+
 def now_millis() -> int:
     return int(time.time() * 1000)
@@ -1,138 +1,574 @@
 from __future__ import annotations
 
+import itertools
 import json
-import tarfile
+import queue
+import threading
+import time
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
 
+from catalog import find_backup
+from checkpoint import RestoreJournal
+from chunkstore import manifest_part_streams
+from keyindex import DELETED, KeyEntry
+from lookup import KeySource, open_local_source, open_s3_source
+from part_manifest import PartOpener, local_part_manifest, s3_part_manifest, validate_parts
 from redis_utils import build_cluster_config, make_cluster_client
-from s3_utils import parse_s3_uri, get_s3_client, list_backups, download_file
+from parts import (
+    FORMATS,
+    PartStream,
+    Tombstone,
+    is_continuation,
+    load_metadata,
+    iter_dir_part_streams,
+    iter_tar_part_streams,
+)
+from restore_engine import PipelinedRestorer
+from selection import KeySelection
+from s3_utils import (
+    ARCHIVE_SUFFIXES,
+    BACKUP_SUFFIXES,
+    MANIFEST_SUFFIX,
+    parse_s3_uri,
+    get_s3_client,
+    open_object_stream,
+)
 
 
-def _extract_tar(tar_path: Path, work_dir: Path) -> Path:
-    with tarfile.open(tar_path, "r:gz") as tar:
-        names = tar.getnames()
-        root = names[0].split("/")[0]
-        tar.extractall(path=work_dir)
-    return work_dir / root
+_QUEUE_BATCH = 256
+_QUEUE_DEPTH = 8
+_PROGRESS_INTERVAL = 5.0
+_JOURNAL_INTERVAL = 5.0
+_REPORT_LIMIT = 20
 
 
-def _apply_row(rc, row: dict[str, Any], overwrite: bool, recreate_groups: bool) -> None:
-    key = row["key"]
-    t = row["type"]
+class _Barrier:
+    """Journal position queued to every worker behind the items read before
+    it; it is saved once all workers have flushed up to it."""
 
-    # If overwrite is true, delete the key first.
-    # This is critical for streams and also ensures a clean slate for other types.
-    if overwrite and rc.exists(key):
-        rc.delete(key)
+    def __init__(self, seq: int, position: dict[str, Any], workers: int, journal: RestoreJournal):
+        self.seq = seq
+        self.position = position
+        self.journal = journal
+        self._left = workers
+        self._lock = threading.Lock()
 
-    # If not overwriting, skip if the key already exists.
-    if not overwrite and rc.exists(key):
+    def ack(self) -> None:
+        with self._lock:
+            self._left -= 1
+            if self._left:
+                return
+        self.journal.save(self.seq, self.position)
+
+
+def _restore_worker(restorer: PipelinedRestorer, q: queue.Queue, errors: list) -> None:
+    while True:
+        batch = q.get()
+        if batch is None:
+            break
+        if errors:
+            continue  # keep draining so the reader never blocks on a dead worker
+        try:
+            if isinstance(batch, _Barrier):
+                restorer.flush()
+                if restorer.key_log is not None:
+                    restorer.key_log.rotate(batch.seq)
+                batch.ack()
+                continue
+            for item in batch:
+                restorer.add(item)
+        except BaseException as e:
+            errors.append(e)
+    if not errors:
+        try:
+            restorer.flush()
+        except BaseException as e:
+            errors.append(e)
+    if restorer.key_log is not None:
+        restorer.key_log.close()
+
+
+def _print_progress(
+    restorers: list[PipelinedRestorer], total: int | None, started: float
+) -> None:
+    restored = sum(r.restored for r in restorers)
+    done = sum(r.restored + r.skipped + r.failed for r in restorers)
+    elapsed = time.perf_counter() - started
+    rate = done / elapsed if elapsed else 0.0
+    line = f"Restored {restored} keys... ({rate:.0f} keys/s"
+    if total and rate:
+        line += f", {done}/{total}, ETA {max(total - done, 0) / rate:.0f}s"
+    print(line + ")")
+
+
+def _report_progress(
+    restorers: list[PipelinedRestorer],
+    total: int | None,
+    started: float,
+    stop: threading.Event,
+) -> None:
+    while not stop.wait(_PROGRESS_INTERVAL):
+        _print_progress(restorers, total, started)
+
+
+def _item_key(item: Any) -> Any:
+    # JSONL rows are dicts; dump records and tombstones carry the key first
+    return item["key"] if isinstance(item, dict) else item[0]
+
+
+def _key_bytes(key: Any) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+def _is_head(item: Any) -> bool:
+    return not isinstance(item, dict) or not is_continuation(item)
+
+
+class _NewestKeys:
+    """Keys of the newer backups of a chain, applied first: an older backup
+    only restores keys none of them wrote or deleted."""
+
+    def __init__(self):
+        self.keys: set[bytes] = set()
+
+    def add(self, item: Any) -> None:
+        if _is_head(item):
+            self.keys.add(_key_bytes(_item_key(item)))
+
+    def items(self, items: Iterable[Any], remember: bool, overwrite: bool) -> Iterator[Any]:
+        """``remember`` the keys for the older backups still to come; a
+        tombstone only deletes a live key with ``overwrite``."""
+        keep = False
+        for item in items:
+            if _is_head(item):
+                key = _key_bytes(_item_key(item))
+                keep = key not in self.keys
+                if remember:
+                    self.keys.add(key)
+            if keep and (overwrite or not isinstance(item, Tombstone)):
+                yield item
+
+
+def _restore_items(
+    rc,
+    fmt: str,
+    items: Iterable[Any],
+    args,
+    total: int | None = None,
+    journal: RestoreJournal | None = None,
+) -> int:
+    """Routes items by hash slot to ``--workers`` threads through bounded
+    queues; a key's rows always land on the same worker, in order. With a
+    journal, the read position is recorded every few seconds."""
+    workers = max(1, args.workers)
+    # Without overwrite, a resumed restore must know which keys past the
+    # saved position it already (partly) wrote: paged keys would be skipped
+    logged = journal is not None and not args.overwrite and fmt != "dump"
+    restorers = [
+        PipelinedRestorer(
+            rc,
+            fmt,
+            overwrite=args.overwrite,
+            recreate_groups=args.recreate_stream_groups,
+            batch_size=args.batch_keys,
+            key_log=journal.key_log(w) if logged else None,  # type: ignore[union-attr]
+            replay=journal.replay if logged else None,  # type: ignore[union-attr]
+        )
+        for w in range(workers)
+    ]
+    queues: list[queue.Queue] = [queue.Queue(maxsize=_QUEUE_DEPTH) for _ in range(workers)]
+    errors: list[BaseException] = []
+    threads = [
+        threading.Thread(target=_restore_worker, args=(r, q, errors), daemon=True)
+        for r, q in zip(restorers, queues)
+    ]
+    for t in threads:
+        t.start()
+
+    started = time.perf_counter()
+    stop = threading.Event()
+    reporter = threading.Thread(
+        target=_report_progress, args=(restorers, total, started, stop), daemon=True
+    )
+    reporter.start()
+
+    pending: list[list[Any]] = [[] for _ in range(workers)]
+    last_mark = started
+    try:
+        for item in items:
+            # Barriers go in front of a key's head row only, so a resumed
+            # restore never starts in the middle of a paged key.
+            if (
+                journal is not None
+                and time.perf_counter() - last_mark >= _JOURNAL_INTERVAL
+                and _is_head(item)
+            ):
+                barrier = _Barrier(*journal.mark(), workers, journal)
+                for w, q in enumerate(queues):
+                    if pending[w]:
+                        q.put(pending[w])
+                        pending[w] = []
+                    q.put(barrier)
+                last_mark = time.perf_counter()
+            w = rc.keyslot(_item_key(item)) % workers if workers > 1 else 0
+            pending[w].append(item)
+            if len(pending[w]) >= _QUEUE_BATCH:
+                queues[w].put(pending[w])
+                pending[w] = []
+            if errors:
+                break
+        for w, q in enumerate(queues):
+            if pending[w]:
+                q.put(pending[w])
+    finally:
+        for q in queues:
+            q.put(None)
+        for t in threads:
+            t.join()
+        stop.set()
+        reporter.join()
+    if errors:
+        raise errors[0]
+
+    elapsed = time.perf_counter() - started
+    restored = sum(r.restored for r in restorers)
+    skipped = sum(r.skipped for r in restorers)
+    failed = sum(r.failed for r in restorers)
+    deleted = sum(r.deleted for r in restorers)
+    round_trips = sum(r.round_trips for r in restorers)
+    done = restored + skipped
+    print(
+        f"Restore complete. Restored {restored} keys "
+        f"(skipped {skipped} existing, {failed} failed"
+        + (f", {deleted} deleted" if deleted else "")
+        + ") "
+        f"in {round_trips} round trips with {workers} workers, "
+        f"{done / elapsed if elapsed else 0:.0f} keys/s."
+    )
+    return 0 if not failed else 1
+
+
+def _choose_s3_backup(s3, loc, env_profile: str, args) -> dict:
+    if args.from_s3 == "by-id" and not args.backup_id:
+        raise SystemExit("--backup-id is required when using --from-s3 by-id")
+    backup_id = args.backup_id if args.from_s3 == "by-id" else None
+    chosen = find_backup(s3, loc, env_profile, backup_id)
+    if not chosen:
+        raise SystemExit(f"Backup id not found: {backup_id}" if backup_id else "No backups found in S3")
+    return chosen
+
+
+def _backup_name(file_name: str) -> str:
+    for suffix in BACKUP_SUFFIXES + (".tgz",):
+        if file_name.endswith(suffix):
+            return file_name[: -len(suffix)]
+    return file_name
+
+
+def _check_parts(
+    name: str,
+    found: tuple[list[dict[str, Any]], PartOpener] | None,
+    selection: KeySelection | None = None,
+) -> None:
+    """Checks the parts against the backup's part manifest before anything
+    is applied; parts left out by ``--slots`` are not read."""
+    if found is None:
+        print(f"Backup {name} has no part manifest; its parts are not checked before restoring")
         return
+    entries, open_part = found
+    if selection:
+        entries = [e for e in entries if e["kind"] not in FORMATS or selection.wants_part(e["name"])]
+    problems = validate_parts(name, entries, open_part)
+    if problems:
+        for problem in problems[:_REPORT_LIMIT]:
+            print(f"  {problem}")
+        raise SystemExit(
+            f"{len(problems)} damaged parts in {name}; nothing was restored "
+            "(--no-validate restores the backup anyway)"
+        )
 
-    if t == "string":
-        rc.set(key, row["value"])  # type: ignore[arg-type]
-    elif t == "hash":
-        if row["value"]:
-            rc.hset(key, mapping=row["value"])  # type: ignore[arg-type]
-    elif t == "list":
-        vals = row["value"] or []
-        if vals:
-            rc.rpush(key, *vals)
-    elif t == "set":
-        vals = row["value"] or []
-        if vals:
-            rc.sadd(key, *vals)
-    elif t == "zset":
-        vals = row["value"] or []
-        if vals:
-            # redis-py 5 supports zadd with dict[name]=score
-            rc.zadd(key, {m: s for m, s in vals})
-    elif t == "stream":
-        entries = row.get("value", [])
-        for entry_id, fields in entries:
-            # Use explicit IDs to preserve ordering and IDs when possible
-            rc.xadd(key, fields, id=entry_id)
-        if recreate_groups:
-            for g in row.get("groups", []) or []:
-                try:
-                    rc.xgroup_create(
-                        name=key,
-                        groupname=g.get("name"),
-                        id=g.get("last-delivered-id", "$"),
-                        mkstream=True,
-                    )
-                except Exception:
-                    pass
-    else:
+
+def _local_archive_streams(path: Path, extras: bool = False) -> Iterator[PartStream]:
+    with path.open("rb") as f:
+        yield from iter_tar_part_streams(f, extras)
+
+
+def _s3_backup_streams(
+    s3, loc, env_profile: str, name: str, extras: bool = False
+) -> Iterator[PartStream]:
+    if name.endswith(MANIFEST_SUFFIX):
+        yield from manifest_part_streams(s3, loc, env_profile, name, extras)
         return
+    body = open_object_stream(s3, loc, env_profile, name)
+    try:
+        yield from iter_tar_part_streams(body, extras)
+    finally:
+        body.close()
 
-    pttl = row.get("pttl")
-    if isinstance(pttl, int):
-        rc.pexpire(key, pttl)
 
+def _local_part_streams(
+    inp: Path, extras: bool = False, check: bool = False, selection: KeySelection | None = None
+) -> tuple[str, Iterator[PartStream]]:
+    if inp.name.endswith(ARCHIVE_SUFFIXES) or inp.suffix == ".tgz":
+        name, streams = _backup_name(inp.name), _local_archive_streams(inp, extras)
+    else:
+        name, streams = inp.resolve().name, iter_dir_part_streams(inp, extras)
+    if check:
+        _check_parts(name, local_part_manifest(inp), selection)
+    return name, streams
 
-def _iter_jsonl_parts(dir_path: Path):
-    for p in sorted((dir_path / "keys").glob("keys-part-*.jsonl")):
-        with p.open("r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    yield json.loads(line)
 
+def open_part_streams(
+    source: str,
+    env_profile: str,
+    s3_uri: str | None,
+    extras: bool = False,
+    check: bool = False,
+    selection: KeySelection | None = None,
+) -> tuple[str, Iterator[PartStream]]:
+    """Backup name and part streams for ``source``: a local backup dir or
+    archive if that path exists, otherwise a backup id looked up in S3.
+    ``extras`` adds the chain and tombstone members of incrementals;
+    ``check`` validates the parts first (only those ``selection`` reads)."""
+    inp = Path(source)
+    if inp.exists():
+        return _local_part_streams(inp, extras, check, selection)
+    loc = parse_s3_uri(s3_uri)
+    if not loc:
+        raise SystemExit(f"No local backup at {source} and no S3_URI to look it up")
+    s3 = get_s3_client()
+    chosen = find_backup(s3, loc, env_profile, source)
+    if not chosen:
+        raise SystemExit(f"Backup id not found: {source}")
+    name = Path(chosen["key"]).name
+    if check:
+        _check_parts(_backup_name(name), s3_part_manifest(s3, loc, env_profile, name), selection)
+    print("Streaming backup from S3:", chosen["key"])
+    return _backup_name(name), _s3_backup_streams(s3, loc, env_profile, name, extras)
 
-def run_restore(args) -> int:
-    cfg = build_cluster_config(args.env_profile, args.redis_nodes)
-    rc = make_cluster_client(cfg)
 
-    input_dir: Path
+def _part_streams(
+    args, env_profile: str, selection: KeySelection | None
+) -> tuple[str, Iterator[PartStream]]:
+    """Returns the backup name and its part streams, from a local dir, a
+    local archive or S3. Archives are read as a stream, so nothing is
+    downloaded or extracted first; parts are validated unless
+    ``--no-validate``."""
+    check = not args.no_validate
+    if args.input:
+        return _local_part_streams(Path(args.input), True, check, selection)
+    elif args.from_s3:
+        loc = parse_s3_uri(args.s3_uri)
+        if not loc:
+            raise SystemExit("S3_URI is required for --from-s3")
+        s3 = get_s3_client()
+        chosen = _choose_s3_backup(s3, loc, env_profile, args)
+        name = Path(chosen["key"]).name
+        if check:
+            _check_parts(_backup_name(name), s3_part_manifest(s3, loc, env_profile, name), selection)
+        print("Streaming backup from S3:", chosen["key"])
+        return _backup_name(name), _s3_backup_streams(s3, loc, env_profile, name, extras=True)
+    else:
+        raise SystemExit("One of --input or --from-s3 is required")
+
+
+def _chain_link_streams(
+    link_id: str, args, env_profile: str, selection: KeySelection | None
+) -> Iterator[PartStream]:
+    """Part streams of an earlier backup of an incremental chain: next to
+    ``--input`` when restoring a local backup, otherwise from S3."""
+    source = chain_link_source(link_id, args.input)
+    return open_part_streams(source, env_profile, args.s3_uri, True, not args.no_validate, selection)[1]
+
+
+def chain_link_source(link_id: str, near: str | None) -> str:
+    """Where to open an earlier backup of a chain: a dir or archive named
+    after it next to the local backup ``near``, otherwise its id in S3."""
+    if near and Path(near).exists():
+        parent = Path(near).resolve().parent
+        for path in [parent / link_id] + [parent / f"{link_id}{s}" for s in ARCHIVE_SUFFIXES]:
+            if path.exists():
+                return str(path)
+    return link_id
+
 
+def _key_source(args, env_profile: str) -> KeySource:
     if args.input:
-        inp = Path(args.input)
-        if inp.suffixes[-2:] == [".tar", ".gz"] or inp.suffix == ".tgz":
-            input_dir = _extract_tar(inp, Path(args.work_dir))
-        else:
-            input_dir = inp
+        return open_local_source(Path(args.input))
     elif args.from_s3:
         loc = parse_s3_uri(args.s3_uri)
         if not loc:
             raise SystemExit("S3_URI is required for --from-s3")
         s3 = get_s3_client()
-        backups = list_backups(s3, loc, env_profile=cfg.env_profile)
-        if not backups:
-            raise SystemExit("No backups found in S3")
-        # Choose backup
-        chosen = backups[0] if args.from_s3 == "latest" else None
-        if args.from_s3 == "by-id":
-            if not args.backup_id:
-                raise SystemExit("--backup-id is required when using --from-s3 by-id")
-            for item in backups:
-                # Keys are under env subfolder; match by filename suffix
-                if item["key"].endswith(f"/{args.backup_id}.tar.gz") or item["key"].endswith(f"{args.backup_id}.tar.gz"):
-                    chosen = item
-                    break
-            if not chosen:
-                raise SystemExit(f"Backup id not found: {args.backup_id}")
-        if not chosen:
-            raise SystemExit("Could not determine which backup to download from S3")
-        # Download and extract
-        tar_local = Path(args.work_dir) / Path(chosen["key"]).name
-        print("Downloading backup from S3:", chosen["key"])
-        download_file(s3, loc, cfg.env_profile, Path(chosen["key"]).name, str(tar_local))
-        input_dir = _extract_tar(tar_local, Path(args.work_dir))
+        chosen = _choose_s3_backup(s3, loc, env_profile, args)
+        print("Looking up keys in S3 backup:", chosen["key"])
+        return open_s3_source(s3, loc, env_profile, Path(chosen["key"]).name)
     else:
         raise SystemExit("One of --input or --from-s3 is required")
 
-    # Restore
-    count = 0
-    for row in _iter_jsonl_parts(input_dir):
-        _apply_row(
-            rc,
-            row,
-            overwrite=args.overwrite,
-            recreate_groups=args.recreate_stream_groups,
+
+def _link_key_source(link_id: str, args, env_profile: str) -> KeySource:
+    source = chain_link_source(link_id, args.input)
+    if Path(source).exists():
+        return open_local_source(Path(source))
+    loc = parse_s3_uri(args.s3_uri)
+    if not loc:
+        raise SystemExit(f"Backup {link_id} of the chain is not next to --input and S3_URI is not set")
+    s3 = get_s3_client()
+    chosen = find_backup(s3, loc, env_profile, link_id)
+    if not chosen:
+        raise SystemExit(f"Backup id not found: {link_id}")
+    return open_s3_source(s3, loc, env_profile, Path(chosen["key"]).name)
+
+
+def _find_keys(args, sources: list[KeySource]) -> list[tuple[KeySource, KeyEntry]]:
+    """Entries of ``--keys``/``--match`` in ``sources``, newest backup first:
+    a key comes from the newest backup indexing it, and is gone if that
+    entry is a tombstone."""
+    found: list[tuple[KeySource, KeyEntry]] = []
+    seen: set[bytes] = set()
+
+    def add(source: KeySource, entry: KeyEntry) -> None:
+        seen.add(entry.key)
+        if entry.type != DELETED:
+            found.append((source, entry))
+
+    for key in args.keys or []:
+        k = key.encode("utf-8")
+        if k in seen:
+            continue
+        for source in sources:
+            entry = source.index.get(k)  # type: ignore[union-attr]
+            if entry is not None:
+                add(source, entry)
+                break
+        if not found or found[-1][1].key != k:
+            # Not indexed anywhere, or deleted by a later backup
+            print(f"WARN: key {key!r} is not in backup {sources[0].name}")
+    if args.match:
+        for source in sources:
+            for entry in source.index.match(args.match):  # type: ignore[union-attr]
+                if entry.key not in seen:
+                    add(source, entry)
+    return found
+
+
+def _restore_keys(args, cfg, selection: KeySelection) -> int | None:
+    """Restores only ``--keys``/``--match`` keys, found through the backup's
+    key index and read with seeks or S3 range requests. An incremental is
+    looked up together with the backups of its chain. None when a backup
+    has no index."""
+    started = time.perf_counter()
+    source = _key_source(args, cfg.env_profile)
+    index = source.index
+    if index is None:
+        print(f"Backup {source.name} has no key index; reading it in full to select keys")
+        return None
+    sources = [source]
+    for link in reversed(index.chain[:-1]):
+        link_source = _link_key_source(link, args, cfg.env_profile)
+        if link_source.index is None:
+            print(f"Backup {link} of the chain has no key index; reading the chain in full to select keys")
+            return None
+        sources.append(link_source)
+    # --slots/--types are answered from the index too
+    found = [(s, e) for s, e in _find_keys(args, sources) if selection.wants_entry(e)]
+    where = f"of {index.keys} keys in the index of {source.name}"
+    if len(sources) > 1:
+        where = f"keys in the indexes of {source.name} and the {len(sources) - 1} backups it builds on"
+    print(f"Found {len(found)} {where} ({time.perf_counter() - started:.1f}s)")
+    if not found:
+        return 1 if args.keys else 0
+    rc = make_cluster_client(cfg, decode_responses=index.fmt != "dump")
+    items = []
+    for link_source in sources:
+        entries = [e for s, e in found if s is link_source]
+        # Keys of the same frame are read together
+        entries.sort(key=lambda e: (e.part, e.frame_offset, e.row_offset))
+        items.append(link_source.items(entries))
+    return _restore_items(rc, index.fmt, itertools.chain.from_iterable(items), args)
+
+
+def run_restore(args) -> int:
+    cfg = build_cluster_config(args.env_profile, args.redis_nodes)
+    selection = KeySelection.from_args(args)
+    if args.keys or args.match:
+        found = _restore_keys(args, cfg, selection)
+        if found is not None:
+            return found
+
+    name, streams = _part_streams(args, cfg.env_profile, selection)
+    if selection:
+        streams = selection.streams(streams)
+    first = next(streams, None)
+    # An incremental backup starts with its chain: the full backup and the
+    # incrementals it builds on, applied after it, newest first
+    ancestors: list[str] = []
+    if first is not None and first[1] == "chain":
+        chain = json.load(first[2])
+        ancestors, fmt = chain["chain"][:-1], chain.get("format", "jsonl")
+        first = next(streams, None)
+    elif first is not None:
+        # The part name tells the format, so the client can be made before
+        # the (trailing) metadata.json of a streamed archive is reached.
+        fmt = first[1]
+    if first is None:
+        print("No keys found in backup.")
+        return 0
+    # Every link is opened (and validated) before anything is applied;
+    # their parts are only read when the link's turn comes
+    links = [_chain_link_streams(link, args, cfg.env_profile, selection) for link in ancestors]
+    rc = make_cluster_client(cfg, decode_responses=fmt != "dump")
+
+    work_dir = Path(args.work_dir).expanduser()
+    work_dir.mkdir(parents=True, exist_ok=True)
+    journal = RestoreJournal.open(work_dir, f"{cfg.env_profile}-{name}", args.resume)
+    if journal.resuming:
+        print(
+            f"Resuming restore of {name}: skipping {len(journal.completed)} completed parts"
+            + (f" and {journal.items} items of {journal.part}" if journal.part else "")
+        )
+    elif args.resume:
+        print(f"No restore journal for {name}; starting from the beginning")
+    if journal.replay:
+        print(f"Rewriting {len(journal.replay)} keys the interrupted restore had started")
+    # Only an extracted directory knows its key count up front (a streamed
+    # archive carries metadata.json as its last member)
+    total = None
+    if args.input and Path(args.input).is_dir() and not selection:
+        total = load_metadata(Path(args.input)).get("total_keys")
+    # Newest backup first: a key comes from the last backup that wrote it
+    # and older backups only fill in the others, so every key is written
+    # once and --overwrite means the same as for a full backup
+    backups = [(name, itertools.chain([first], streams))]
+    backups += [(link, links[i]) for i, link in reversed(list(enumerate(ancestors)))]
+    newest = _NewestKeys() if ancestors else None
+    result = 0
+    try:
+        for n, (backup, backup_streams) in enumerate(backups):
+            older = n < len(backups) - 1
+            if ancestors:
+                print(f"Applying {backup} ({n + 1}/{len(backups)} of the backup chain, newest first)")
+            if n and selection:
+                backup_streams = selection.streams(backup_streams)
+            items = journal.track(
+                (s for s in backup_streams if s[1] != "chain"),
+                f"{backup}/" if ancestors else "",
+                skipped=newest.add if newest and older else None,
+            )
+            if selection:
+                items = selection.items(items)
+            if newest:
+                items = newest.items(items, older, args.overwrite)
+            result |= _restore_items(rc, fmt, items, args, total=None if n else total, journal=journal)
+    except BaseException:
+        print(f"Restore interrupted; progress is kept in {journal.path}, continue with --resume")
+        raise
+    journal.remove()
+    if selection:
+        print(
+            f"Selected keys from {selection.parts_read} parts; "
+            f"{selection.parts_skipped} parts outside --slots were skipped unread"
         )
-        count += 1
-        if count % 1000 == 0:
-            print(f"Restored {count} keys...")
-    print(f"Restore complete. Restored {count} keys.")
-    return 0
+    return result
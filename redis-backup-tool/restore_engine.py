@@ -0,0 +1,316 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from redis.exceptions import AskError, ClusterDownError, MovedError, TryAgainError
+
+from parts import Tombstone, is_continuation
+
+if TYPE_CHECKING:
+    from checkpoint import KeyLog
+
+# Replies meaning the slot is not (or not yet) served by the node we sent to;
+# those rows are replayed through the cluster client, which follows redirects.
+_REDIRECT_ERRORS = (MovedError, AskError, TryAgainError, ClusterDownError)
+
+_TYPES = ("string", "hash", "list", "set", "zset", "stream")
+
+
+def _queue_row(pipe, row: dict[str, Any], recreate_groups: bool) -> list[bool]:
+    """Queues the writes for one row on ``pipe``. Returns one flag per queued
+    command telling whether an error reply for it may be ignored."""
+    key = row["key"]
+    t = row["type"]
+    ignorable: list[bool] = []
+
+    if t == "string":
+        pipe.set(key, row["value"])  # type: ignore[arg-type]
+        ignorable.append(False)
+    elif t == "hash":
+        if row["value"]:
+            pipe.hset(key, mapping=row["value"])  # type: ignore[arg-type]
+            ignorable.append(False)
+    elif t == "list":
+        vals = row["value"] or []
+        if vals:
+            pipe.rpush(key, *vals)
+            ignorable.append(False)
+    elif t == "set":
+        vals = row["value"] or []
+        if vals:
+            pipe.sadd(key, *vals)
+            ignorable.append(False)
+    elif t == "zset":
+        vals = row["value"] or []
+        if vals:
+            # redis-py 5 supports zadd with dict[name]=score
+            pipe.zadd(key, {m: s for m, s in vals})
+            ignorable.append(False)
+    elif t == "stream":
+        for entry_id, fields in row.get("value", []):
+            # Use explicit IDs to preserve ordering and IDs when possible
+            pipe.xadd(key, fields, id=entry_id)
+            ignorable.append(False)
+        if recreate_groups:
+            for g in row.get("groups", []) or []:
+                pipe.xgroup_create(
+                    name=key,
+                    groupname=g.get("name"),
+                    id=g.get("last-delivered-id", "$"),
+                    mkstream=True,
+                )
+                # BUSYGROUP and friends are not fatal for a restore
+                ignorable.append(True)
+    else:
+        return ignorable
+
+    pttl = row.get("pttl")
+    if isinstance(pttl, int):
+        pipe.pexpire(key, pttl)
+        ignorable.append(False)
+    return ignorable
+
+
+def apply_row(rc, row: dict[str, Any], overwrite: bool, recreate_groups: bool) -> bool:
+    """Applies a single row through the cluster client (slow path)."""
+    key = row["key"]
+    if row["type"] not in _TYPES:
+        return False
+
+    # Continuation rows append another page to the key their head row created
+    if not is_continuation(row):
+        # If overwrite is true, delete the key first.
+        # This is critical for streams and also ensures a clean slate for other types.
+        if overwrite and rc.exists(key):
+            rc.delete(key)
+
+        # If not overwriting, skip if the key already exists.
+        if not overwrite and rc.exists(key):
+            return False
+
+    pipe = rc.pipeline()
+    ignorable = _queue_row(pipe, row, recreate_groups)
+    if not ignorable:
+        return True
+    for res, ok_to_ignore in zip(pipe.execute(raise_on_error=False), ignorable):
+        if isinstance(res, Exception) and not ok_to_ignore:
+            raise res
+    return True
+
+
+class PipelinedRestorer:
+    """Buffers rows (or dump records), groups each batch by the primary that
+    owns the key's hash slot and applies it with one pipeline per node:
+    one round trip of EXISTS checks (skipped with --overwrite) and one of
+    writes. Rows hitting a redirect are replayed through ``apply_row``.
+    Tombstones of incremental backups are applied as DELs.
+
+    ``key_log`` is told every key before it is written; keys in ``replay``
+    (written by an interrupted run) are rewritten from their head row even
+    without ``overwrite``."""
+
+    def __init__(
+        self,
+        rc,
+        fmt: str,
+        overwrite: bool,
+        recreate_groups: bool = False,
+        batch_size: int = 1000,
+        key_log: KeyLog | None = None,
+        replay: set[str] | None = None,
+    ):
+        self.rc = rc
+        self.fmt = fmt
+        self.overwrite = overwrite
+        self.recreate_groups = recreate_groups
+        self.batch_size = batch_size
+        self.restored = 0
+        self.skipped = 0
+        self.failed = 0
+        self.deleted = 0
+        self.round_trips = 0
+        self.key_log = key_log
+        self.replay = replay or set()
+        self._buf: list[Any] = []
+        # Head row of the key currently being continued was skipped
+        self._skipped_key: Any = None
+
+    def add(self, item: Any) -> None:
+        self._buf.append(item)
+        if len(self._buf) >= self.batch_size:
+            self.flush()
+
+    def _group_by_node(self, keys: list[Any]) -> dict[str, tuple[Any, list[int]]]:
+        groups: dict[str, tuple[Any, list[int]]] = {}
+        for i, key in enumerate(keys):
+            node = self.rc.nodes_manager.get_node_from_slot(self.rc.keyslot(key))
+            groups.setdefault(node.name, (node, []))[1].append(i)
+        return groups
+
+    def _pipeline(self, node):
+        return self.rc.get_redis_connection(node).pipeline(transaction=False)
+
+    def flush(self) -> None:
+        if not self._buf:
+            return
+        items, self._buf = self._buf, []
+        if any(isinstance(item, Tombstone) for item in items):
+            self._flush_deletes([item.key for item in items if isinstance(item, Tombstone)])
+            items = [item for item in items if not isinstance(item, Tombstone)]
+            if not items:
+                return
+        if self.fmt == "dump":
+            self._flush_dump(items)
+        else:
+            self._flush_rows(items)
+
+    def _flush_deletes(self, keys: list[bytes]) -> None:
+        retry: list[bytes] = []
+        for node, idxs in self._group_by_node(keys).values():
+            pipe = self._pipeline(node)
+            for i in idxs:
+                pipe.delete(keys[i])
+            results = pipe.execute(raise_on_error=False)
+            self.round_trips += 1
+            for i, res in zip(idxs, results):
+                if isinstance(res, _REDIRECT_ERRORS):
+                    retry.append(keys[i])
+                elif isinstance(res, Exception):
+                    print(f"WARN: failed deleting key {keys[i]!r}: {res}")
+                else:
+                    self.deleted += 1
+        for key in retry:
+            try:
+                self.rc.delete(key)
+                self.deleted += 1
+            except Exception as e:
+                print(f"WARN: failed deleting key {key!r}: {e}")
+
+    def _flush_dump(self, records: list[Any]) -> None:
+        retry: list[Any] = []
+        for node, idxs in self._group_by_node([r[0] for r in records]).values():
+            pipe = self._pipeline(node)
+            for i in idxs:
+                key, expire_at, payload = records[i]
+                pipe.restore(key, expire_at, payload, replace=self.overwrite, absttl=True)
+            results = pipe.execute(raise_on_error=False)
+            self.round_trips += 1
+            for i, res in zip(idxs, results):
+                if isinstance(res, _REDIRECT_ERRORS):
+                    retry.append(records[i])
+                elif isinstance(res, Exception):
+                    # Without --overwrite an existing key answers BUSYKEY; skip it
+                    if "BUSYKEY" in str(res):
+                        self.skipped += 1
+                    else:
+                        self.failed += 1
+                        print(f"WARN: failed restoring key {records[i][0]!r}: {res}")
+                else:
+                    self.restored += 1
+        for key, expire_at, payload in retry:
+            try:
+                self.rc.restore(key, expire_at, payload, replace=self.overwrite, absttl=True)
+                self.restored += 1
+            except Exception as e:
+                if "BUSYKEY" in str(e):
+                    self.skipped += 1
+                else:
+                    self.failed += 1
+                    print(f"WARN: failed restoring key {key!r}: {e}")
+
+    def _flush_rows(self, rows: list[dict[str, Any]]) -> None:
+        groups = self._group_by_node([row["key"] for row in rows])
+
+        # Round trip 1: existence of every new key (not needed when overwriting)
+        exists: dict[int, bool] = {}
+        if not self.overwrite:
+            for node, idxs in groups.values():
+                heads = [
+                    i
+                    for i in idxs
+                    if not is_continuation(rows[i]) and rows[i]["key"] not in self.replay
+                ]
+                if not heads:
+                    continue
+                pipe = self._pipeline(node)
+                for i in heads:
+                    pipe.exists(rows[i]["key"])
+                results = pipe.execute(raise_on_error=False)
+                self.round_trips += 1
+                for i, res in zip(heads, results):
+                    # On errors fall through to the write, which reports them
+                    exists[i] = not isinstance(res, Exception) and bool(res)
+
+        skip: set[int] = set()
+        for i, row in enumerate(rows):
+            if row["type"] not in _TYPES:
+                skip.add(i)
+            elif is_continuation(row):
+                # Pages of a key that was skipped as already existing are skipped too
+                if row["key"] == self._skipped_key:
+                    skip.add(i)
+            elif exists.get(i):
+                skip.add(i)
+                self._skipped_key = row["key"]
+                self.skipped += 1
+            else:
+                self._skipped_key = None
+
+        if self.key_log is not None:
+            self.key_log.write(
+                row["key"]
+                for i, row in enumerate(rows)
+                if i not in skip and not is_continuation(row)
+            )
+
+        # Round trip 2: the writes, in row order within each node
+        retry_keys: set[Any] = set()
+        written: set[int] = set()
+        failed: set[int] = set()
+        for node, idxs in groups.values():
+            pipe = self._pipeline(node)
+            cmds: list[tuple[int, bool]] = []
+            for i in idxs:
+                if i in skip:
+                    continue
+                row = rows[i]
+                if (self.overwrite or row["key"] in self.replay) and not is_continuation(row):
+                    pipe.delete(row["key"])
+                    cmds.append((i, False))
+                cmds.extend((i, ign) for ign in _queue_row(pipe, row, self.recreate_groups))
+                written.add(i)
+            if not cmds:
+                continue
+            results = pipe.execute(raise_on_error=False)
+            self.round_trips += 1
+            for (i, ok_to_ignore), res in zip(cmds, results):
+                if not isinstance(res, Exception) or ok_to_ignore:
+                    continue
+                if isinstance(res, _REDIRECT_ERRORS):
+                    retry_keys.add(rows[i]["key"])
+                elif i not in failed:
+                    failed.add(i)
+                    print(f"WARN: failed restoring key {rows[i]['key']}: {res}")
+
+        for i, row in enumerate(rows):
+            if i not in written:
+                continue
+            head = not is_continuation(row)
+            if i in failed:
+                self.failed += int(head)
+            elif row["key"] in retry_keys:
+                # Topology changed under us; let the cluster client route it
+                try:
+                    overwrite = self.overwrite or row["key"] in self.replay
+                    applied = apply_row(self.rc, row, overwrite, self.recreate_groups)
+                except Exception as e:
+                    print(f"WARN: failed restoring key {row['key']}: {e}")
+                    self.failed += int(head)
+                    continue
+                if head:
+                    if applied:
+                        self.restored += 1
+                    else:
+                        self.skipped += 1
+            elif head:
+                self.restored += 1
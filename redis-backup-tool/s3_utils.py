@@ -1,9 +1,22 @@
 from __future__ import annotations
 
+import os
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass
-from typing import Any
+from typing import Any, Iterator
 
 import boto3
+from botocore.exceptions import ClientError
+
+
+# Archives are plain .tar of compressed parts; .tar.gz is the legacy layout
+ARCHIVE_SUFFIXES = (".tar", ".tar.gz")
+# Chunk-store backups are a manifest referencing shared content chunks
+MANIFEST_SUFFIX = ".manifest.json"
+BACKUP_SUFFIXES = ARCHIVE_SUFFIXES + (MANIFEST_SUFFIX,)
+
+# S3 rejects multipart parts below 5 MiB (except the last one)
+MIN_PART_SIZE = 5 * 1024 * 1024
 
 
 @dataclass
@@ -28,8 +41,9 @@ def parse_s3_uri(uri: str | None) -> S3Location | None:
 
 
 def get_s3_client():
-    # boto3 respects env vars, shared credentials, and role providers
-    return boto3.client("s3")
+    # boto3 respects env vars, shared credentials, and role providers.
+    # S3_ENDPOINT_URL points at an S3 stand-in (minio, moto server) for tests.
+    return boto3.client("s3", endpoint_url=os.environ.get("S3_ENDPOINT_URL") or None)
 
 def _env_subprefix(loc: S3Location, env_profile: str) -> str:
     env = (env_profile or "").strip().lower()
@@ -39,6 +53,11 @@ def _env_subprefix(loc: S3Location, env_profile: str) -> str:
     return env
 
 
+def object_key(loc: S3Location, env_profile: str, name: str) -> str:
+    base = _env_subprefix(loc, env_profile)
+    return f"{base}/{name}" if base else name
+
+
 def list_backups(s3: Any, loc: S3Location, env_profile: str | None = None) -> list[dict]:
     # Restrict listing to env-specific path for isolation
     if env_profile:
@@ -48,10 +67,13 @@ def list_backups(s3: Any, loc: S3Location, env_profile: str | None = None) -> li
     prefix = base_prefix + "/" if base_prefix else ""
     paginator = s3.get_paginator("list_objects_v2")
     items: list[dict] = []
-    for page in paginator.paginate(Bucket=loc.bucket, Prefix=prefix):
+    # Backups sit directly under the env prefix; the delimiter keeps the
+    # listing from paging through the chunk store below it
+    opts = {"Delimiter": "/"} if env_profile else {}
+    for page in paginator.paginate(Bucket=loc.bucket, Prefix=prefix, **opts):
         for obj in page.get("Contents", []):
             key = obj["Key"]
-            if key.endswith(".tar.gz"):
+            if key.endswith(BACKUP_SUFFIXES):
                 items.append(
                     {
                         "key": key,
@@ -71,17 +93,206 @@ def upload_file(
     dest_name: str,
 ) -> str:
     # Store under env-specific subpath
-    base = _env_subprefix(loc, env_profile)
-    key = f"{base}/{dest_name}" if base else dest_name
+    key = object_key(loc, env_profile, dest_name)
     s3.upload_file(local_path, loc.bucket, key)
     return f"s3://{loc.bucket}/{key}"
 
 
+def put_object_bytes(s3: Any, loc: S3Location, env_profile: str, name: str, data: bytes) -> str:
+    key = object_key(loc, env_profile, name)
+    s3.put_object(Bucket=loc.bucket, Key=key, Body=data)
+    return f"s3://{loc.bucket}/{key}"
+
+
+def list_object_names(s3: Any, loc: S3Location, env_profile: str, subprefix: str) -> Iterator[str]:
+    """Names (relative to the env prefix) of the objects under ``subprefix``."""
+    base = object_key(loc, env_profile, "")
+    paginator = s3.get_paginator("list_objects_v2")
+    for page in paginator.paginate(Bucket=loc.bucket, Prefix=base + subprefix):
+        for obj in page.get("Contents", []):
+            yield obj["Key"][len(base) :]
+
+
+def open_object_range(
+    s3: Any, loc: S3Location, env_profile: str, name: str, offset: int, length: int
+):
+    """Streaming body of ``length`` bytes of an object from ``offset``."""
+    key = object_key(loc, env_profile, name)
+    resp = s3.get_object(Bucket=loc.bucket, Key=key, Range=f"bytes={offset}-{offset + length - 1}")
+    return resp["Body"]
+
+
+def read_object_range(
+    s3: Any, loc: S3Location, env_profile: str, name: str, offset: int, length: int
+) -> bytes:
+    body = open_object_range(s3, loc, env_profile, name, offset, length)
+    try:
+        return body.read()
+    finally:
+        body.close()
+
+
+def read_object_tail(s3: Any, loc: S3Location, env_profile: str, name: str, length: int) -> bytes:
+    key = object_key(loc, env_profile, name)
+    return s3.get_object(Bucket=loc.bucket, Key=key, Range=f"bytes=-{length}")["Body"].read()
+
+
+def get_object_if_changed(
+    s3: Any, loc: S3Location, env_profile: str, name: str, etag: str | None
+) -> tuple[bytes, str] | None:
+    """Body and ETag of an object; None when its ETag is still ``etag``.
+    A missing object raises ClientError (NoSuchKey)."""
+    opts = {"IfNoneMatch": etag} if etag else {}
+    try:
+        resp = s3.get_object(Bucket=loc.bucket, Key=object_key(loc, env_profile, name), **opts)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("304", "NotModified"):
+            return None
+        raise
+    body = resp["Body"]
+    try:
+        return body.read(), resp["ETag"]
+    finally:
+        body.close()
+
+
+def put_object_if_match(
+    s3: Any, loc: S3Location, env_profile: str, name: str, data: bytes, etag: str | None
+) -> str | None:
+    """Writes an object only if it still has ``etag`` (or, with None, does
+    not exist yet). Returns the new ETag, or None when another writer got
+    there first."""
+    opts = {"IfMatch": etag} if etag else {"IfNoneMatch": "*"}
+    try:
+        resp = s3.put_object(
+            Bucket=loc.bucket, Key=object_key(loc, env_profile, name), Body=data, **opts
+        )
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("PreconditionFailed", "ConditionalRequestConflict"):
+            return None
+        raise
+    return resp["ETag"]
+
+
+def open_object_stream(s3: Any, loc: S3Location, env_profile: str, key_name: str):
+    # Streaming body; read sequentially without touching local disk
+    key = object_key(loc, env_profile, key_name)
+    return s3.get_object(Bucket=loc.bucket, Key=key)["Body"]
+
+
 def download_file(
     s3: Any, loc: S3Location, env_profile: str, key_name: str, local_path: str
 ) -> str:
     # Read from env-specific subpath
-    base = _env_subprefix(loc, env_profile)
-    key = f"{base}/{key_name}" if base else key_name
+    key = object_key(loc, env_profile, key_name)
     s3.download_file(loc.bucket, key, local_path)
     return local_path
+
+
+class MultipartUploader:
+    """Uploads a byte stream as an S3 multipart upload while it is still
+    being produced. Every ``part_size`` bytes written become one part,
+    uploaded by a pool of ``concurrency`` threads; ``write`` blocks once
+    twice that many parts are in flight, which bounds memory and slows the
+    producer down to the upload rate. The upload is only created with its
+    first part: a stream smaller than one part is sent with a single PUT."""
+
+    def __init__(
+        self,
+        s3: Any,
+        bucket: str,
+        key: str,
+        part_size: int,
+        concurrency: int,
+    ):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.part_size = max(part_size, MIN_PART_SIZE)
+        self.bytes_written = 0
+        self.upload_id: str | None = None
+        self._buf = bytearray()
+        self._futures: list[Future] = []
+        self._max_pending = max(1, concurrency) * 2
+        self._pool = ThreadPoolExecutor(max_workers=max(1, concurrency))
+        self._put = False
+
+    @property
+    def uri(self) -> str:
+        return f"s3://{self.bucket}/{self.key}"
+
+    @property
+    def parts(self) -> int:
+        return len(self._futures) or int(self._put)
+
+    def write(self, data: bytes) -> int:
+        self._buf += data
+        self.bytes_written += len(data)
+        while len(self._buf) >= self.part_size:
+            chunk = bytes(self._buf[: self.part_size])
+            del self._buf[: self.part_size]
+            self._submit(chunk)
+        return len(data)
+
+    def _submit(self, chunk: bytes) -> None:
+        if self.upload_id is None:
+            resp = self.s3.create_multipart_upload(Bucket=self.bucket, Key=self.key)
+            self.upload_id = resp["UploadId"]
+        pending = [f for f in self._futures if not f.done()]
+        if len(pending) >= self._max_pending:
+            pending[0].result()
+        part_number = len(self._futures) + 1
+        self._futures.append(self._pool.submit(self._upload_part, part_number, chunk))
+
+    def _upload_part(self, part_number: int, chunk: bytes) -> dict:
+        resp = self.s3.upload_part(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=chunk,
+        )
+        return {"PartNumber": part_number, "ETag": resp["ETag"]}
+
+    def complete(self) -> str:
+        if self.upload_id is None:
+            self._pool.shutdown()
+            self.s3.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self._buf))
+            self._buf.clear()
+            self._put = True
+            return self.uri
+        if self._buf:
+            self._submit(bytes(self._buf))
+            self._buf.clear()
+        parts = [f.result() for f in self._futures]
+        self._pool.shutdown()
+        self.s3.complete_multipart_upload(
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+        return self.uri
+
+    def abort(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+        if self.upload_id is None:
+            return
+        try:
+            self.s3.abort_multipart_upload(
+                Bucket=self.bucket, Key=self.key, UploadId=self.upload_id
+            )
+        except Exception as e:
+            print(f"WARN: failed aborting multipart upload {self.uri}: {e}")
+
+
+def start_multipart_upload(
+    s3: Any,
+    loc: S3Location,
+    env_profile: str,
+    dest_name: str,
+    part_size: int,
+    concurrency: int,
+) -> MultipartUploader:
+    key = object_key(loc, env_profile, dest_name)
+    return MultipartUploader(s3, loc.bucket, key, part_size, concurrency)
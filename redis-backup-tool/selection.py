@@ -0,0 +1,117 @@
+from __future__ import annotations
+
+import fnmatch
+from typing import Any, Iterable, Iterator
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+from digest import dump_type
+from keyindex import TYPES, KeyEntry
+from parts import FORMATS, PartStream, Tombstone, is_continuation, part_slots
+
+
+def parse_slots(text: str) -> list[tuple[int, int]]:
+    """``"0-5460,10923"`` -> ``[(0, 5460), (10923, 10923)]``."""
+    ranges = []
+    for piece in text.split(","):
+        first, _, last = piece.strip().partition("-")
+        try:
+            lo, hi = int(first), int(last or first)
+        except ValueError:
+            raise SystemExit(f"Invalid slot range {piece!r}; expected e.g. 0-5460")
+        if not 0 <= lo <= hi < REDIS_CLUSTER_HASH_SLOTS:
+            raise SystemExit(f"Invalid slot range {piece!r}; slots are 0-{REDIS_CLUSTER_HASH_SLOTS - 1}")
+        ranges.append((lo, hi))
+    return ranges
+
+
+def _key_bytes(key: Any) -> bytes:
+    return key if isinstance(key, bytes) else str(key).encode("utf-8")
+
+
+class KeySelection:
+    """Keys picked by the restore filters: named ``--keys`` or ``--match``
+    (either one), within ``--slots`` and of ``--types``. Parts of other
+    slot ranges are dropped before they are read."""
+
+    def __init__(
+        self,
+        keys: list[str] | None = None,
+        match: str | None = None,
+        slots: list[tuple[int, int]] | None = None,
+        types: list[str] | None = None,
+    ):
+        self.keys = {k.encode("utf-8") for k in keys} if keys else None
+        # Redis globs negate classes with [^...], fnmatch with [!...]
+        self.match = match.replace("[^", "[!").encode("utf-8") if match else None
+        self.slots = slots
+        self.types = set(types) if types else None
+        self.parts_read = 0
+        self.parts_skipped = 0
+
+    @classmethod
+    def from_args(cls, args) -> "KeySelection | None":
+        if not (args.keys or args.match or args.slots or args.types):
+            return None
+        types = None
+        if args.types:
+            types = [t.strip() for t in args.types.split(",") if t.strip()]
+            unknown = [t for t in types if t not in TYPES[:-1]]
+            if unknown:
+                raise SystemExit(f"Unknown types: {', '.join(unknown)}")
+        slots = parse_slots(args.slots) if args.slots else None
+        return cls(args.keys, args.match, slots, types)
+
+    def _in_slots(self, first: int, last: int) -> bool:
+        return self.slots is None or any(lo <= last and first <= hi for lo, hi in self.slots)
+
+    def wants_key(self, key: bytes, slot: int | None = None) -> bool:
+        if self.keys is not None or self.match is not None:
+            named = self.keys is not None and key in self.keys
+            if not named and not (self.match and fnmatch.fnmatchcase(key, self.match)):
+                return False
+        if self.slots is None:
+            return True
+        slot = key_slot(key) if slot is None else slot
+        return self._in_slots(slot, slot)
+
+    def wants_entry(self, entry: KeyEntry) -> bool:
+        return self.wants_key(entry.key, entry.slot) and (
+            self.types is None or entry.type in self.types
+        )
+
+    def wants_part(self, name: str) -> bool:
+        slots = part_slots(name)
+        return not slots or self._in_slots(*slots)
+
+    def streams(self, streams: Iterable[PartStream]) -> Iterator[PartStream]:
+        """Drops the parts whose slot range is outside ``--slots``."""
+        for stream in streams:
+            if stream[1] in FORMATS:
+                if not self.wants_part(stream[0]):
+                    self.parts_skipped += 1
+                    continue
+                self.parts_read += 1
+            yield stream
+
+    def items(self, items: Iterable[Any]) -> Iterator[Any]:
+        """Selected rows, dump records and tombstones; continuation rows
+        follow their head row."""
+        keep = False
+        for item in items:
+            if isinstance(item, Tombstone):
+                # Deleted keys have no type left to filter on
+                if self.wants_key(item.key):
+                    yield item
+                continue
+            if isinstance(item, dict):
+                if not is_continuation(item):
+                    keep = self.wants_key(_key_bytes(item["key"])) and (
+                        self.types is None or item["type"] in self.types
+                    )
+            else:
+                keep = self.wants_key(item[0]) and (
+                    self.types is None or dump_type(item[2]) in self.types
+                )
+            if keep:
+                yield item
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from itertools import islice
+from pathlib import Path
+
+from checkpoint import RestoreJournal
+from parts import encode_jsonl_row, iter_dir_part_streams, part_name
+
+
+def _backup(tmp_path: Path, parts: int = 3, rows: int = 4) -> Path:
+    keys_dir = tmp_path / "backup" / "keys"
+    keys_dir.mkdir(parents=True)
+    for p in range(parts):
+        with (keys_dir / part_name(0, p, "jsonl")).open("wb") as f:
+            for i in range(rows):
+                f.write(encode_jsonl_row({"key": f"k{p}-{i}", "type": "string", "value": "v"}))
+    return tmp_path / "backup"
+
+
+def _keys(items) -> list[str]:
+    return [row["key"] for row in items]
+
+
+def test_journal_save_and_resume(tmp_path: Path) -> None:
+    backup = _backup(tmp_path)
+    work = tmp_path / "work"
+    work.mkdir()
+    journal = RestoreJournal.open(work, "b1", resume=False)
+    assert not journal.resuming
+    read = _keys(islice(journal.track(iter_dir_part_streams(backup)), 6))
+    assert read[-1] == "k1-1"
+    journal.save(*journal.mark())
+
+    resumed = RestoreJournal.open(work, "b1", resume=True)
+    assert resumed.resuming
+    assert resumed.completed == [part_name(0, 0, "jsonl")]
+    assert (resumed.part, resumed.items) == (part_name(0, 1, "jsonl"), 1)
+    # The item last yielded is sent again: it may not have been applied
+    rest = _keys(resumed.track(iter_dir_part_streams(backup)))
+    assert rest == ["k1-1", "k1-2", "k1-3", "k2-0", "k2-1", "k2-2", "k2-3"]
+
+
+def test_journal_keeps_newest_save(tmp_path: Path) -> None:
+    backup = _backup(tmp_path)
+    journal = RestoreJournal.open(tmp_path, "b1", resume=False)
+    items = journal.track(iter_dir_part_streams(backup))
+    next(items)
+    older = journal.mark()
+    list(islice(items, 5))
+    newer = journal.mark()
+    journal.save(*newer)
+    journal.save(*older)
+
+    resumed = RestoreJournal.open(tmp_path, "b1", resume=True)
+    assert (resumed.part, resumed.items) == (newer[1]["part"], newer[1]["items"])
+
+
+def test_journal_prefix_tells_chain_links_apart(tmp_path: Path) -> None:
+    backup = _backup(tmp_path, parts=1)
+    journal = RestoreJournal.open(tmp_path, "chain", resume=False)
+    list(journal.track(iter_dir_part_streams(backup), prefix="base/"))
+    journal.save(*journal.mark())
+
+    resumed = RestoreJournal.open(tmp_path, "chain", resume=True)
+    assert resumed.completed == ["base/" + part_name(0, 0, "jsonl")]
+    assert list(resumed.track(iter_dir_part_streams(backup), prefix="base/")) == []
+    assert len(list(resumed.track(iter_dir_part_streams(backup), prefix="inc/"))) == 4
+
+
+def test_journal_replays_logged_keys(tmp_path: Path) -> None:
+    journal = RestoreJournal.open(tmp_path, "b1", resume=False)
+    log = journal.key_log(0)
+    log.write(["a", "b"])
+    log.close()
+
+    resumed = RestoreJournal.open(tmp_path, "b1", resume=True)
+    assert resumed.replay == {"a", "b"}
+    # Kept across a second interruption, until the restore starts over
+    assert RestoreJournal.open(tmp_path, "b1", resume=True).replay == {"a", "b"}
+    assert RestoreJournal.open(tmp_path, "b1", resume=False).replay == set()
+    assert RestoreJournal.open(tmp_path, "b1", resume=True).replay == set()
+
+
+def test_journal_remove(tmp_path: Path) -> None:
+    journal = RestoreJournal.open(tmp_path, "b1", resume=False)
+    journal.save(*journal.mark())
+    assert journal.path.exists()
+    journal.remove()
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_journal_reports_skipped_items(tmp_path: Path) -> None:
+    backup = _backup(tmp_path, parts=2)
+    journal = RestoreJournal.open(tmp_path, "b1", resume=False)
+    list(islice(journal.track(iter_dir_part_streams(backup)), 7))
+    journal.save(*journal.mark())
+
+    skipped: list[str] = []
+    resumed = RestoreJournal.open(tmp_path, "b1", resume=True)
+    rest = _keys(resumed.track(iter_dir_part_streams(backup), skipped=lambda row: skipped.append(row["key"])))
+    assert skipped == ["k0-0", "k0-1", "k0-2", "k0-3", "k1-0", "k1-1"]
+    assert rest == ["k1-2", "k1-3"]
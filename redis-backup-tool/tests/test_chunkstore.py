@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import hashlib
+import random
+
+from chunkstore import _MAX_CHUNK, _MIN_CHUNK, split_chunks
+
+
+def _records(n: int, seed: int = 0) -> list[bytes]:
+    rng = random.Random(seed)
+    return [f"key:{i}|".encode() + rng.randbytes(rng.randrange(50, 2000)) for i in range(n)]
+
+
+def _boundaries(records: list[bytes]) -> set[int]:
+    ends, pos = set(), 0
+    for rec in records:
+        pos += len(rec)
+        ends.add(pos)
+    return ends
+
+
+def test_empty_and_small_inputs() -> None:
+    assert list(split_chunks(iter([]))) == []
+    assert list(split_chunks(iter([b"a", b"b"]))) == [b"ab"]
+
+
+def test_chunks_cut_on_record_boundaries() -> None:
+    records = _records(3000)
+    chunks = list(split_chunks(iter(records)))
+    assert len(chunks) > 1
+    assert b"".join(chunks) == b"".join(records)
+
+    ends, pos = _boundaries(records), 0
+    for chunk in chunks[:-1]:
+        pos += len(chunk)
+        assert pos in ends
+        assert _MIN_CHUNK <= len(chunk) <= _MAX_CHUNK + 2000
+
+
+def test_large_records_are_cut_at_max_chunk() -> None:
+    # Records whose hash never ends a chunk still end one past _MAX_CHUNK
+    records = [bytes([i % 256]) * 100_000 for i in range(40)]
+    chunks = list(split_chunks(iter(records)))
+    assert b"".join(chunks) == b"".join(records)
+    assert all(len(c) < _MAX_CHUNK + 100_000 for c in chunks)
+
+
+def test_cut_points_follow_content() -> None:
+    records = _records(3000)
+    changed = records[:1500] + [b"key:new|" + b"n" * 500] + records[1500:]
+    before = {hashlib.sha256(c).digest() for c in split_chunks(iter(records))}
+    after = [hashlib.sha256(c).digest() for c in split_chunks(iter(changed))]
+    # Only the chunks around the new record differ
+    assert sum(h not in before for h in after) <= 2
@@ -0,0 +1,93 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+from redis.crc import key_slot
+
+from compression import decompress_bytes
+from keyindex import DELETED, KEY_INDEX_FILE, KeyIndex, KeyIndexWriter
+from parts import PartWriter, encode_jsonl_row, part_index
+
+
+def _row(key: str, value: str = "v") -> dict:
+    return {"key": key, "type": "string", "ttl": -1, "value": value}
+
+
+def _write(tmp_path: Path, keys: list[str], codec: str = "none", **kwargs) -> KeyIndexWriter:
+    index = KeyIndexWriter(tmp_path, "jsonl", codec, **kwargs)
+    writer = PartWriter(tmp_path / "keys", 0, "jsonl", 500, codec, key_index=index)
+    for key in keys:
+        writer.write(_row(key))
+        writer.rotate()
+    writer.close()
+    return index
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+def test_build_and_lookup(tmp_path: Path, codec: str) -> None:
+    keys = [f"user:{i:05d}" for i in range(5000)]
+    _write(tmp_path, keys, codec).close({})
+    index = KeyIndex.open_file(tmp_path / KEY_INDEX_FILE)
+
+    assert index.keys == len(keys)
+    assert len(index.footer["blocks"]) > 1
+    assert index.get(b"user:99999") is None
+    assert index.get(b"aaa") is None
+    for key in (keys[0], keys[2500], keys[-1]):
+        entry = index.get(key.encode())
+        assert entry is not None
+        assert entry.type == "string"
+        assert entry.slot == key_slot(key.encode())
+        # The entry locates the key's row inside its compressed frame
+        with (tmp_path / "keys" / entry.part).open("rb") as f:
+            f.seek(entry.frame_offset)
+            frame = decompress_bytes(f.read(entry.frame_length), entry.part)
+        row = frame[entry.row_offset : entry.row_offset + entry.row_length]
+        assert row == encode_jsonl_row(_row(key))
+
+
+def test_match_reads_only_prefix_blocks(tmp_path: Path) -> None:
+    keys = [f"a:{i:05d}" for i in range(3000)] + [f"b:{i:05d}" for i in range(3000)]
+    _write(tmp_path, keys).close({})
+    reads = []
+    path = tmp_path / KEY_INDEX_FILE
+    data = path.read_bytes()
+
+    def read_range(offset: int, length: int) -> bytes:
+        reads.append(offset)
+        return data[offset : offset + length]
+
+    index = KeyIndex.open(read_range, lambda n: data[-n:])
+    found = [e.key for e in index.match("b:0001?")]
+    assert found == [f"b:0001{i}".encode() for i in range(10)]
+    assert len(reads) < len(index.footer["blocks"])
+    assert [e.key for e in index.match("a:0000[^0-8]")] == [b"a:00009"]
+
+
+def test_resumed_writer_drops_uncommitted_parts(tmp_path: Path) -> None:
+    first = _write(tmp_path, [f"k{i}" for i in range(1200)])
+    first.flush()
+    written_parts = {part_index(p.name)[1] for p in (tmp_path / "keys").iterdir()}
+    # A resume that only kept part 0 of shard 0
+    second = KeyIndexWriter(tmp_path, "jsonl", "none", committed={0: 1})
+    second.close({})
+    index = KeyIndex.open_file(tmp_path / KEY_INDEX_FILE)
+    assert len(written_parts) > 1
+    assert 0 < index.keys < 1200
+    assert {part_index(e.part)[1] for e in index.match("*")} == {0}
+
+
+def test_later_generation_wins_and_tombstones(tmp_path: Path) -> None:
+    first = _write(tmp_path, ["kept", "moved"])
+    first.flush()
+    second = KeyIndexWriter(tmp_path, "jsonl", "none", committed={0: 10}, chain=["base", "inc"])
+    second.add_tombstone(b"moved")
+    second.close({})
+    second.remove_spills()
+
+    index = KeyIndex.open_file(tmp_path / KEY_INDEX_FILE)
+    assert index.chain == ["base", "inc"]
+    assert index.get(b"kept").type == "string"
+    assert index.get(b"moved").type == DELETED
+    assert not list((tmp_path / "index").glob("keys-*.spill"))
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import threading
+import time
+
+import boto3
+import pytest
+from moto import mock_aws
+
+from s3_utils import MIN_PART_SIZE, MultipartUploader, S3Location, start_multipart_upload
+
+BUCKET = "backups"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    with mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def _body(s3, key: str) -> bytes:
+    return s3.get_object(Bucket=BUCKET, Key=key)["Body"].read()
+
+
+def _open_uploads(s3) -> list:
+    return s3.list_multipart_uploads(Bucket=BUCKET).get("Uploads", [])
+
+
+def test_parts_are_cut_at_part_size(s3) -> None:
+    sizes = []
+    upload_part = s3.upload_part
+
+    def record(**kwargs):
+        sizes.append((kwargs["PartNumber"], len(kwargs["Body"])))
+        return upload_part(**kwargs)
+
+    s3.upload_part = record
+    loc = S3Location(bucket=BUCKET, prefix="pre")
+    # Below the S3 minimum: raised to MIN_PART_SIZE
+    uploader = start_multipart_upload(s3, loc, "dev", "b1.tar", part_size=1, concurrency=3)
+    data = bytes(range(256)) * (MIN_PART_SIZE * 5 // 2 // 256 + 7)
+    for i in range(0, len(data), 300_001):
+        uploader.write(data[i : i + 300_001])
+    assert uploader.complete() == f"s3://{BUCKET}/pre/dev/b1.tar"
+
+    assert uploader.parts == 3
+    assert sorted(sizes) == [
+        (1, MIN_PART_SIZE),
+        (2, MIN_PART_SIZE),
+        (3, len(data) - 2 * MIN_PART_SIZE),
+    ]
+    assert uploader.bytes_written == len(data)
+    assert _body(s3, "pre/dev/b1.tar") == data
+
+
+def test_small_archive_is_a_single_put(s3) -> None:
+    uploader = MultipartUploader(s3, BUCKET, "small.tar", MIN_PART_SIZE, 2)
+    uploader.write(b"tar bytes")
+    uploader.complete()
+    assert uploader.upload_id is None
+    assert uploader.parts == 1
+    assert _body(s3, "small.tar") == b"tar bytes"
+    assert _open_uploads(s3) == []
+
+
+def test_empty_archive(s3) -> None:
+    uploader = MultipartUploader(s3, BUCKET, "empty.tar", MIN_PART_SIZE, 2)
+    uploader.complete()
+    assert _body(s3, "empty.tar") == b""
+
+
+def test_write_blocks_while_parts_are_in_flight(s3) -> None:
+    release = threading.Event()
+    upload_part = s3.upload_part
+
+    def slow(**kwargs):
+        release.wait(10)
+        return upload_part(**kwargs)
+
+    s3.upload_part = slow
+    # One upload thread: at most two parts in flight
+    uploader = MultipartUploader(s3, BUCKET, "slow.tar", MIN_PART_SIZE, 1)
+    writer = threading.Thread(target=lambda: uploader.write(b"x" * (MIN_PART_SIZE * 3)))
+    writer.start()
+    time.sleep(0.3)
+    assert writer.is_alive()
+    assert uploader.parts == 2
+    release.set()
+    writer.join(10)
+    assert not writer.is_alive()
+    uploader.complete()
+    assert uploader.parts == 3
+    assert len(_body(s3, "slow.tar")) == MIN_PART_SIZE * 3
+
+
+def test_failed_upload_is_aborted(s3) -> None:
+    def fail(**kwargs):
+        raise RuntimeError("connection reset")
+
+    uploader = MultipartUploader(s3, BUCKET, "failed.tar", MIN_PART_SIZE, 2)
+    uploader.write(b"x" * MIN_PART_SIZE)
+    uploader._futures[0].result()
+    s3.upload_part = fail
+    uploader.write(b"y" * (MIN_PART_SIZE + 10))
+    assert len(_open_uploads(s3)) == 1
+    with pytest.raises(RuntimeError):
+        uploader.complete()
+    uploader.abort()
+    assert _open_uploads(s3) == []
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
+
+
+def test_abort_before_first_part(s3) -> None:
+    uploader = MultipartUploader(s3, BUCKET, "never.tar", MIN_PART_SIZE, 2)
+    uploader.write(b"partial")
+    uploader.abort()
+    assert _open_uploads(s3) == []
+    assert "Contents" not in s3.list_objects_v2(Bucket=BUCKET)
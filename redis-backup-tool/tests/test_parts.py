@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import pytest
+from redis.crc import key_slot
+
+from parts import (
+    PartWriter,
+    iter_dir_part_streams,
+    iter_part_items,
+    part_format,
+    part_index,
+    part_name,
+    part_slots,
+    slot_range,
+)
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+@pytest.mark.parametrize("fmt", ["jsonl", "dump"])
+def test_part_name_round_trip(fmt: str, codec: str) -> None:
+    name = part_name(3, 17, fmt, codec, (1024, 2047))
+    assert part_format(name) == fmt
+    assert part_index(name) == (3, 17)
+    assert part_slots(name) == (1024, 2047)
+    assert part_index(f"backup/keys/{name}") == (3, 17)
+
+
+def test_part_name_without_slot_range() -> None:
+    name = part_name(0, 5, "jsonl")
+    assert name == "keys-part-00-0005.jsonl"
+    assert part_slots(name) is None
+    # Names of backups from before shard indexes
+    assert part_index("keys-part-0005.jsonl") == (0, 5)
+    assert part_format("keys-part-00-0005.txt") is None
+
+
+def _row(key: str, cont: bool = False) -> dict:
+    row = {"key": key, "type": "string", "ttl": -1, "value": key}
+    if cont:
+        row["cont"] = True
+    return row
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+def test_part_writer_splits_by_slot_range_and_rotates(tmp_path, codec: str) -> None:
+    closed = []
+    writer = PartWriter(tmp_path / "keys", 1, "jsonl", 3, codec, on_part_closed=closed.append)
+    keys = [f"k{i}" for i in range(20)]
+    rotations = 0
+    for key in keys:
+        writer.write(_row(key))
+        rotations += writer.rotate()
+    writer.close()
+
+    assert rotations > 0
+    assert sorted(closed) == sorted(writer.paths)
+    written = {}
+    for name, fmt, raw in iter_dir_part_streams(tmp_path):
+        shard, _idx = part_index(name)
+        first, last = part_slots(name)
+        assert shard == 1
+        for row in iter_part_items((name, fmt, raw)):
+            assert first <= key_slot(row["key"].encode()) <= last
+            assert slot_range(key_slot(row["key"].encode())) == (first, last)
+            written[row["key"]] = name
+    assert sorted(written) == sorted(keys)
+
+
+def test_part_writer_keeps_continuation_rows_with_their_key(tmp_path) -> None:
+    writer = PartWriter(tmp_path / "keys", 0, "jsonl", 1, first_part_idx=7)
+    writer.write(_row("a"))
+    writer.write(_row("b"))
+    writer.write(_row("b", cont=True), new_key=False)
+    writer.close()
+
+    assert min(part_index(p.name)[1] for p in writer.paths) == 7
+    rows = {}
+    for stream in iter_dir_part_streams(tmp_path):
+        rows[stream[0]] = [(r["key"], bool(r.get("cont"))) for r in iter_part_items(stream)]
+    b_part = next(name for name, items in rows.items() if ("b", False) in items)
+    assert rows[b_part][-2:] == [("b", False), ("b", True)]
+
+
+def test_dump_part_round_trip(tmp_path) -> None:
+    writer = PartWriter(tmp_path / "keys", 0, "dump", 100)
+    records = [(f"key:{i}".encode(), i * 1000, bytes([i]) * 10) for i in range(50)]
+    for record in records:
+        writer.write(record)
+    writer.close()
+
+    read = []
+    for stream in iter_dir_part_streams(tmp_path):
+        read.extend(iter_part_items(stream))
+    assert sorted(read) == sorted(records)
@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from parts import Tombstone
+from restore import _NewestKeys
+
+
+def _row(key: str, cont: bool = False) -> dict:
+    row = {"key": key, "type": "hash", "value": {}}
+    if cont:
+        row["cont"] = True
+    return row
+
+
+def test_older_backups_only_fill_in_other_keys() -> None:
+    newest = _NewestKeys()
+    inc = [_row("a"), _row("a", cont=True), Tombstone(b"gone")]
+    assert list(newest.items(inc, remember=True, overwrite=False)) == inc[:2]
+
+    base = [_row("a"), _row("a", cont=True), _row("gone"), _row("b"), _row("b", cont=True)]
+    assert list(newest.items(base, remember=False, overwrite=False)) == [_row("b"), _row("b", cont=True)]
+    assert newest.keys == {b"a", b"gone"}
+
+
+def test_tombstones_only_delete_with_overwrite() -> None:
+    newest = _NewestKeys()
+    newest.add(_row("a"))
+    newest.add(_row("a", cont=True))
+    items = [Tombstone(b"a"), Tombstone(b"b")]
+    assert list(newest.items(items, remember=True, overwrite=True)) == [Tombstone(b"b")]
@@ -0,0 +1,78 @@
+from __future__ import annotations
+
+from argparse import Namespace
+
+import pytest
+from redis.crc import key_slot
+
+from keyindex import KeyEntry
+from parts import Tombstone, part_name
+from selection import KeySelection, parse_slots
+
+
+def test_parse_slots() -> None:
+    assert parse_slots("0-5460,10923") == [(0, 5460), (10923, 10923)]
+    assert parse_slots(" 100 - 200 , 16383") == [(100, 200), (16383, 16383)]
+
+
+@pytest.mark.parametrize("text", ["", "a-b", "5-1", "0-16384", "-1"])
+def test_parse_slots_rejects(text: str) -> None:
+    with pytest.raises(SystemExit):
+        parse_slots(text)
+
+
+def _args(**kwargs) -> Namespace:
+    return Namespace(**{"keys": None, "match": None, "slots": None, "types": None, **kwargs})
+
+
+def test_from_args() -> None:
+    assert KeySelection.from_args(_args()) is None
+    sel = KeySelection.from_args(_args(slots="0-99", types="hash, zset"))
+    assert sel.slots == [(0, 99)]
+    assert sel.types == {"hash", "zset"}
+    with pytest.raises(SystemExit):
+        KeySelection.from_args(_args(types="string,bogus"))
+
+
+def test_wants_key() -> None:
+    slot = key_slot(b"user:1")
+    sel = KeySelection(keys=["user:1", "user:2"], slots=[(slot, slot)])
+    assert sel.wants_key(b"user:1")
+    assert not sel.wants_key(b"user:3")
+    # Named but outside the slot range
+    assert key_slot(b"user:2") != slot and not sel.wants_key(b"user:2")
+
+    glob = KeySelection(match="user:[^2]*")
+    assert glob.wants_key(b"user:1")
+    assert not glob.wants_key(b"user:2")
+    assert not glob.wants_key(b"order:1")
+
+
+def test_parts_outside_slots_are_skipped() -> None:
+    sel = KeySelection(slots=[(1100, 1200)])
+    names = [part_name(0, i, "jsonl", "none", (s, s + 1023)) for i, s in enumerate((0, 1024, 2048))]
+    streams = [(n, "jsonl", None) for n in names] + [("chain.json", "chain", None)]
+    kept = [s[0] for s in sel.streams(streams)]
+    assert kept == [names[1], "chain.json"]
+    assert (sel.parts_read, sel.parts_skipped) == (1, 2)
+    # Parts of older backups carry no slot range and are always read
+    assert sel.wants_part("keys-part-00-0000.jsonl")
+
+
+def test_items_keep_continuation_rows_with_their_head() -> None:
+    sel = KeySelection(keys=["a"], types=["hash"])
+    rows = [
+        {"key": "a", "type": "hash", "value": {}},
+        {"key": "a", "type": "hash", "value": {}, "cont": True},
+        {"key": "b", "type": "hash", "value": {}},
+        {"key": "b", "type": "hash", "value": {}, "cont": True},
+        Tombstone(b"a"),
+        Tombstone(b"b"),
+    ]
+    assert list(sel.items(rows)) == [rows[0], rows[1], rows[4]]
+
+
+def test_wants_entry_filters_types() -> None:
+    entry = KeyEntry(b"k", "p", 0, 0, 0, 0, 0, "set", key_slot(b"k"))
+    assert KeySelection(types=["set"]).wants_entry(entry)
+    assert not KeySelection(types=["hash"]).wants_entry(entry)
@@ -0,0 +1,51 @@
+from __future__ import annotations
+
+import io
+from pathlib import Path
+
+import pytest
+
+from incremental import _TombstoneWriter
+from keyindex import KeyIndexWriter
+from parts import (
+    Tombstone,
+    encode_tombstone,
+    iter_dir_part_streams,
+    iter_part_items,
+    iter_part_records,
+    read_tombstones,
+)
+
+
+def test_tombstone_round_trip() -> None:
+    keys = [b"a", b"", b"user:\xff\x00", b"x" * 70000]
+    data = b"".join(encode_tombstone(k) for k in keys)
+    assert list(read_tombstones(io.BytesIO(data))) == [Tombstone(k) for k in keys]
+
+
+@pytest.mark.parametrize("cut", [2, 6])
+def test_truncated_tombstone(cut: int) -> None:
+    data = encode_tombstone(b"abcdef")[:cut]
+    with pytest.raises(ValueError):
+        list(read_tombstones(io.BytesIO(data)))
+
+
+@pytest.mark.parametrize("codec", ["none", "gzip"])
+def test_tombstone_writer(tmp_path: Path, codec: str) -> None:
+    key_index = KeyIndexWriter(tmp_path, "dump", codec)
+    writer = _TombstoneWriter(tmp_path, codec, key_index)
+    for key in (b"gone:1", b"gone:2"):
+        writer.add(key)
+    path = writer.close()
+    assert writer.keys == 2
+
+    # Streams are only open while iterated
+    found = {
+        s[0]: list(iter_part_items(s))
+        for s in iter_dir_part_streams(tmp_path, extras=True)
+        if s[1] == "tombstones"
+    }
+    assert found == {path.name: [Tombstone(b"gone:1"), Tombstone(b"gone:2")]}
+    with path.open("rb") as raw:
+        records = list(iter_part_records((path.name, "tombstones", raw)))
+    assert records == [encode_tombstone(b"gone:1"), encode_tombstone(b"gone:2")]
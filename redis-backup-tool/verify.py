@@ -1,35 +1,301 @@
 from __future__ import annotations
 
+import fnmatch
 import json
 import random
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
 from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator
 
-from redis_utils import build_cluster_config, make_cluster_client, pttl_safe
+from botocore.exceptions import ClientError
+from redis.crc import key_slot
 
+from catalog import find_backup
+from chunkstore import load_manifest, manifest_part_streams
+from part_manifest import PartOpener, local_part_manifest, s3_part_manifest, validate_parts
+from readers import primary_clients, read_keys
+from digest import SlotDigests, item_digests
+from redis_utils import build_cluster_config, make_cluster_client, now_millis, pttl_safe
+from parts import (
+    PartStream,
+    backup_format,
+    iter_dir_part_streams,
+    iter_part_items,
+    iter_part_lines,
+    load_metadata,
+)
+from s3_utils import MANIFEST_SUFFIX, get_s3_client, parse_s3_uri
 
-def _iter_rows(dir_path: Path):
-    for p in sorted((dir_path / "keys").glob("keys-part-*.jsonl")):
-        with p.open("r", encoding="utf-8") as f:
-            for line in f:
-                if line.strip():
-                    yield json.loads(line)
+# Rows are written as {"type": ..., "key": ..., ..., "pttl": N} and
+# continuation rows end with "cont": true, so the fields verify needs sit at
+# both ends of the line and the (possibly huge) value never has to be parsed.
+_ROW_PREFIX = '{"type": '
+_KEY_SEP = ', "key": '
+_CONT_TAIL = b', "cont": true}'
+_PTTL_TAIL_RE = re.compile(r', "pttl": (-?\d+)\}\s*$')
+_TAIL_WINDOW = 64
+_DECODER = json.JSONDecoder()
+
+# Full verify: key-level details are only gathered for the first slots that
+# differ, and only the first keys of each kind are printed.
+_DETAIL_SLOTS = 64
+_REPORT_LIMIT = 20
+
+
+def _is_continuation_line(line: bytearray) -> bool:
+    return line.rstrip().endswith(_CONT_TAIL)
+
+
+def _head_fields(line: bytearray) -> dict[str, Any]:
+    """type/key/pttl of a JSONL head row, without decoding its value."""
+    text = line.decode("utf-8")
+    if text.startswith(_ROW_PREFIX):
+        try:
+            t, end = _DECODER.raw_decode(text, len(_ROW_PREFIX))
+            if text.startswith(_KEY_SEP, end):
+                key, _ = _DECODER.raw_decode(text, end + len(_KEY_SEP))
+                row: dict[str, Any] = {"type": t, "key": key}
+                m = _PTTL_TAIL_RE.search(text, max(0, len(text) - _TAIL_WINDOW))
+                if m:
+                    row["pttl"] = int(m.group(1))
+                return row
+        except ValueError:
+            pass
+    # Rows laid out differently (e.g. older backups): parse the whole line
+    full = json.loads(text)
+    return {k: full[k] for k in ("type", "key", "pttl") if k in full}
+
+
+def _reservoir(
+    items: Iterable[Any], k: int, parse: Callable[[Any], dict[str, Any]]
+) -> tuple[list[dict[str, Any]], int]:
+    """Uniform sample of ``k`` items (algorithm R) in O(k) memory; ``parse``
+    only runs for items that enter the reservoir."""
+    sample: list[dict[str, Any]] = []
+    seen = 0
+    for item in items:
+        seen += 1
+        if len(sample) < k:
+            sample.append(parse(item))
+        else:
+            j = int(random.random() * seen)
+            if j < k:
+                sample[j] = parse(item)
+    return sample, seen
+
+
+def _sample_rows(
+    open_streams: Callable[[], Iterator[PartStream]], fmt: str, k: int
+) -> tuple[list[dict[str, Any]], int]:
+    if fmt != "dump":
+        lines = chain.from_iterable(iter_part_lines(s) for s in open_streams())
+        heads = (line for line in lines if not _is_continuation_line(line))
+        return _reservoir(heads, k, _head_fields)
+
+    now = now_millis()
+
+    def dump_fields(record) -> dict[str, Any]:
+        key, expire_at, _payload = record
+        row: dict[str, Any] = {"key": key}
+        if expire_at:
+            row["pttl"] = expire_at - now
+        return row
+
+    return _reservoir(_backup_items(open_streams), k, dump_fields)
+
+
+def _glob_matcher(pattern: str | None) -> Callable[[Any], bool]:
+    if not pattern or pattern == "*":
+        return lambda key: True
+    # Redis globs negate classes with [^...], fnmatch with [!...]
+    pat = pattern.replace("[^", "[!")
+    bpat = pat.encode("utf-8")
+    return lambda key: fnmatch.fnmatchcase(key, bpat if isinstance(key, bytes) else pat)
+
+
+def _backup_items(open_streams: Callable[[], Iterator[PartStream]]) -> Iterable[Any]:
+    return chain.from_iterable(iter_part_items(s) for s in open_streams())
+
+
+def _open_backup(args, env_profile: str) -> tuple[dict[str, Any], str, Callable[[], Iterator[PartStream]]]:
+    """Metadata, format and a part stream opener for ``--input``: a local
+    backup dir, or else the id of a chunk-store backup in S3."""
+    in_dir = Path(args.input)
+    if in_dir.is_dir():
+        return load_metadata(in_dir), backup_format(in_dir), lambda: iter_dir_part_streams(in_dir)
+    loc = parse_s3_uri(args.s3_uri)
+    if not loc:
+        raise SystemExit(f"No backup directory at {args.input} and no S3_URI to look it up")
+    s3 = get_s3_client()
+    name = in_dir.name if in_dir.name.endswith(MANIFEST_SUFFIX) else f"{in_dir.name}{MANIFEST_SUFFIX}"
+    try:
+        manifest = load_manifest(s3, loc, env_profile, name)
+    except ClientError as e:
+        raise SystemExit(f"No chunk-store manifest for {args.input} in S3: {e}")
+    print(f"Verifying chunk-store backup {manifest['backup_id']}")
+    return (
+        manifest["metadata"],
+        manifest["format"],
+        lambda: manifest_part_streams(s3, loc, env_profile, name),
+    )
+
+
+def _backup_slot_digests(open_streams: Callable[[], Iterator[PartStream]], fmt: str) -> SlotDigests:
+    slots = SlotDigests()
+    for key, _t, digest in item_digests(_backup_items(open_streams), fmt):
+        slots.add(key, digest)
+    return slots
+
+
+def _live_shard_digests(r, fmt: str, pattern: str, batch_keys: int, page_size: int) -> SlotDigests:
+    # Same SCAN + pipelined batch reads as backup, digested instead of written
+    slots = SlotDigests()
+    cursor = 0
+    while True:
+        cursor, keys = r.scan(cursor=cursor, match=pattern, count=batch_keys)
+        for i in range(0, len(keys), batch_keys):
+            batch = keys[i : i + batch_keys]
+            for key, _t, digest in item_digests(read_keys(r, batch, fmt, page_size), fmt):
+                slots.add(key, digest)
+        if cursor == 0:
+            break
+    return slots
+
+
+def _live_slot_keys(rc, slot: int, fmt: str, matches, page_size: int) -> dict[bytes, int]:
+    node = rc.nodes_manager.get_node_from_slot(slot)
+    r = rc.get_redis_connection(node)
+    n = r.execute_command("CLUSTER COUNTKEYSINSLOT", slot)
+    keys = r.execute_command("CLUSTER GETKEYSINSLOT", slot, n) if n else []
+    keys = [k for k in keys if matches(k)]
+    return {key: digest for key, _t, digest in item_digests(read_keys(r, keys, fmt, page_size), fmt)}
+
+
+def _print_keys(label: str, keys: list[bytes]) -> None:
+    if not keys:
+        return
+    shown = ", ".join(k.decode("utf-8", "backslashreplace") for k in keys[:_REPORT_LIMIT])
+    more = f" (+{len(keys) - _REPORT_LIMIT} more)" if len(keys) > _REPORT_LIMIT else ""
+    print(f"  {label}: {shown}{more}")
+
+
+def _run_full_verify(
+    rc, meta: dict[str, Any], fmt: str, open_streams: Callable[[], Iterator[PartStream]], args
+) -> int:
+    """Compares a content digest of every key, aggregated per hash slot,
+    between the backup and the live cluster; slots that differ are then
+    compared key by key."""
+    pattern = meta.get("match") or "*"
+    batch_keys = meta.get("batch_keys") or 500
+    page_size = meta.get("page_size") or 1000
+    primaries = primary_clients(rc)
+    workers = max(1, min(args.workers or len(primaries), len(primaries)))
+
+    started = time.perf_counter()
+    live = SlotDigests()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_live_shard_digests, r, fmt, pattern, batch_keys, page_size)
+            for _, r in primaries
+        ]
+        # The backup is digested here while the workers read the cluster
+        backup = _backup_slot_digests(open_streams, fmt)
+        for fut in futures:
+            live.merge(fut.result())
+
+    bad = backup.mismatching(live)
+    elapsed = time.perf_counter() - started
+    print(
+        f"Full verify: backup {backup.keys} keys, live {live.keys} keys, "
+        f"{len(bad)}/{len(backup.sums)} slots differ ({elapsed:.1f}s)"
+    )
+    if not bad:
+        return 0
+
+    print(
+        "Differing slots: "
+        + ", ".join(
+            f"{s} (backup {backup.counts[s]}, live {live.counts[s]})" for s in bad[:_REPORT_LIMIT]
+        )
+        + (f" (+{len(bad) - _REPORT_LIMIT} more)" if len(bad) > _REPORT_LIMIT else "")
+    )
+
+    detail = set(bad[:_DETAIL_SLOTS])
+    expected = {
+        key: digest
+        for key, _t, digest in item_digests(_backup_items(open_streams), fmt)
+        if key_slot(key) in detail
+    }
+    actual: dict[bytes, int] = {}
+    matches = _glob_matcher(pattern)
+    for slot in sorted(detail):
+        actual.update(_live_slot_keys(rc, slot, fmt, matches, page_size))
+
+    missing = sorted(k for k in expected if k not in actual)
+    extra = sorted(k for k in actual if k not in expected)
+    changed = sorted(k for k in expected if k in actual and expected[k] != actual[k])
+    scope = f"in {len(detail)} of {len(bad)} differing slots" if len(bad) > len(detail) else "in differing slots"
+    print(f"Keys {scope}: missing={len(missing)}, extra={len(extra)}, changed={len(changed)}")
+    _print_keys("missing", missing)
+    _print_keys("extra", extra)
+    _print_keys("changed", changed)
+    return 1
+
+
+def _part_manifest(
+    source: str, env_profile: str, s3_uri: str | None
+) -> tuple[str, tuple[list[dict[str, Any]], PartOpener] | None]:
+    inp = Path(source)
+    if inp.exists():
+        return inp.resolve().name, local_part_manifest(inp)
+    loc = parse_s3_uri(s3_uri)
+    if not loc:
+        raise SystemExit(f"No local backup at {source} and no S3_URI to look it up")
+    s3 = get_s3_client()
+    chosen = find_backup(s3, loc, env_profile, source)
+    if not chosen:
+        raise SystemExit(f"Backup id not found: {source}")
+    name = Path(chosen["key"]).name
+    return name, s3_part_manifest(s3, loc, env_profile, name)
+
+
+def _run_checksums(args, env_profile: str) -> int | None:
+    """Checks every part of the backup (every chunk, for a chunk-store
+    backup) against its manifest with a parallel streaming hash pass; None
+    when the backup has no part manifest."""
+    name, found = _part_manifest(args.input, env_profile, args.s3_uri)
+    if found is None:
+        print(f"Backup {name} has no part manifest to check against")
+        return None
+    problems = validate_parts(name, *found)
+    for problem in problems[:_REPORT_LIMIT]:
+        print(f"  {problem}")
+    return 1 if problems else 0
 
 
 def run_verify(args) -> int:
     cfg = build_cluster_config(args.env_profile, args.redis_nodes)
-    rc = make_cluster_client(cfg)
-    in_dir = Path(args.input)
+    if args.checksums:
+        result = _run_checksums(args, cfg.env_profile)
+        return 1 if result is None else result
+    # Local parts are cheap to check first; a damaged one would otherwise
+    # fail the verify halfway through
+    if Path(args.input).is_dir() and _run_checksums(args, cfg.env_profile):
+        return 1
+    meta, fmt, open_streams = _open_backup(args, cfg.env_profile)
+    rc = make_cluster_client(cfg, decode_responses=fmt != "dump")
 
-    # Load up to N rows uniformly sampled across files
-    all_rows = list(_iter_rows(in_dir))
-    if not all_rows:
+    if args.full:
+        return _run_full_verify(rc, meta, fmt, open_streams, args)
+
+    # Keep up to N rows uniformly sampled across files, streaming the parts
+    sample, total = _sample_rows(open_streams, fmt, args.sample)
+    if not sample:
         print("No keys found in backup.")
         return 1
-    sample = (
-        all_rows
-        if len(all_rows) <= args.sample
-        else random.sample(all_rows, args.sample)
-    )
 
     missing = 0
     ttl_mismatch = 0
@@ -46,6 +312,6 @@ def run_verify(args) -> int:
                 ttl_mismatch += 1
 
     print(
-        f"Verify sample={len(sample)} -> missing={missing}, ttl_mismatch={ttl_mismatch}"
+        f"Verify sample={len(sample)} of {total} keys -> missing={missing}, ttl_mismatch={ttl_mismatch}"
     )
     return 0 if missing == 0 else 1
@@ -0,0 +1,476 @@
+"""
+슬롯별 가용성 타임라인 (페일오버/롤링 업그레이드 추적)
+
+슬롯마다 카나리 키 하나를 두고, 클러스터 토폴로지(CLUSTER SLOTS)에서 슬롯을
+담당하는 primary에 직접 SET을 보내 밀리초 단위 타임스탬프로 슬롯별 불가용 구간을
+기록합니다. 클라이언트가 리다이렉트를 대신 따라가지 않으므로 MOVED/ASK를 그대로
+셀 수 있고, 슬롯 담당 노드가 바뀌면 토폴로지 변경 이벤트로 남깁니다.
+"""
+
+import time
+import asyncio
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS
+from redis.exceptions import AskError, MovedError
+
+from canary import canary_keys
+from redis_common import Environment, get_cluster_nodes
+
+# 기본값은 라운드마다 모든 슬롯 (500ms마다 16384개, 약 33k SET/s를 노드별 파이프라인으로)
+DEFAULT_PROBE_INTERVAL_MS = 500
+# 라운드마다 프로브할 슬롯 수: 줄이면 슬롯을 고르게 건너뛰며 돌아가므로 모든 노드가
+# 매 라운드 프로브되지만, 슬롯 하나는 16384 / 이 값 라운드마다 한 번씩만 프로브됨
+DEFAULT_PROBE_SLOTS = REDIS_CLUSTER_HASH_SLOTS
+DEFAULT_PROBE_TIMEOUT_MS = 500
+# 주기적으로 CLUSTER SLOTS를 다시 읽는 간격(초), 에러/MOVED 직후에는 바로 읽음
+DEFAULT_TOPOLOGY_INTERVAL = 1.0
+# 결과에 남길 최대 불가용 구간 수 (합친 뒤 기준)
+MAX_WINDOWS = 500
+# 담당 노드가 없는 슬롯
+UNCOVERED = "uncovered"
+
+
+def _iso(t: float) -> str:
+    return datetime.fromtimestamp(t, timezone.utc).isoformat(timespec="milliseconds")
+
+
+def slot_ranges(slots: List[int]) -> str:
+    """[0, 1, 2, 5] -> "0-2,5" """
+    ranges = []
+    for slot in sorted(slots):
+        if ranges and ranges[-1][1] == slot - 1:
+            ranges[-1][1] = slot
+        else:
+            ranges.append([slot, slot])
+    return ",".join(f"{lo}-{hi}" if lo != hi else str(lo) for lo, hi in ranges)
+
+
+def _error_text(error: BaseException) -> str:
+    return f"{type(error).__name__}: {error}"[:200]
+
+
+class SlotTimeline:
+    """
+    슬롯별 불가용 구간, 리다이렉트 횟수, 토폴로지 변경 이벤트 기록
+
+    구간의 시작/끝은 프로브로 관측한 시각(첫 실패, 복구 후 첫 성공)이고, 실제
+    불가용 시간은 그 앞뒤 프로브 사이 어딘가에서 시작/끝나므로 범위도 함께 남김
+    """
+
+    def __init__(self, resolution: float = 0.0):
+        """
+        Args:
+            resolution: 같은 슬롯을 다시 프로브하기까지의 간격(초)
+        """
+        self.started_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.resolution = resolution
+        # slot -> 마지막 성공 시각
+        self.last_ok: Dict[int, float] = {}
+        # slot -> (첫 실패 시각, 노드, 에러, 직전 성공 시각, 마지막 실패 시각)
+        self.down_since: Dict[int, Tuple[float, str, str, float, float]] = {}
+        # (slot, 노드, 시작, 끝, 에러, 진행 중 여부, 직전 성공 시각, 마지막 실패 시각)
+        self.windows: List[Tuple[int, str, float, float, str, bool, float, float]] = []
+        self.redirects: Dict[str, Dict[str, int]] = {}
+        self.events: List[Dict[str, Any]] = []
+
+    def record_ok(self, slots: List[int], t: float) -> Tuple[int, float]:
+        """
+        프로브 성공 기록, 열린 불가용 구간을 닫음
+
+        Returns:
+            Tuple[int, float]: (복구된 슬롯 수, 그중 가장 긴 구간 ms)
+        """
+        recovered = 0
+        longest = 0.0
+        for slot in slots:
+            self.last_ok[slot] = t
+            down = self.down_since.pop(slot, None)
+            if down:
+                start, node, error, ok_before, last_failed = down
+                self.windows.append(
+                    (slot, node, start, t, error, False, ok_before, last_failed)
+                )
+                recovered += 1
+                longest = max(longest, (t - start) * 1000)
+        return recovered, longest
+
+    def record_failure(self, slots: List[int], node: str, t: float, error: str) -> int:
+        """
+        프로브 실패 기록
+
+        Returns:
+            int: 새로 불가용이 된 슬롯 수
+        """
+        new = 0
+        for slot in slots:
+            down = self.down_since.get(slot)
+            if down:
+                self.down_since[slot] = down[:4] + (t,)
+            else:
+                ok_before = self.last_ok.get(slot, self.started_at)
+                self.down_since[slot] = (t, node, error, ok_before, t)
+                new += 1
+        return new
+
+    def record_redirect(self, node: str, kind: str, count: int = 1):
+        """MOVED/ASK 리다이렉트 기록 ('moved' 또는 'ask')"""
+        counts = self.redirects.setdefault(node, {"moved": 0, "ask": 0})
+        counts[kind] += count
+
+    def record_event(self, t: float, event_type: str, **details):
+        """토폴로지 변경 이벤트 기록"""
+        self.events.append({"time": _iso(t), "type": event_type, **details})
+
+    def finish(self, t: float):
+        """프로브 종료: 아직 열린 구간은 진행 중으로 닫음"""
+        self.finished_at = t
+        for slot, (start, node, error, ok_before, last_failed) in sorted(
+            self.down_since.items()
+        ):
+            self.windows.append(
+                (slot, node, start, t, error, True, ok_before, last_failed)
+            )
+        self.down_since.clear()
+
+    def summary(self) -> Dict[str, Any]:
+        """불가용 슬롯-초, 가장 긴 공백, 노드별 통계, 합친 구간 목록"""
+        # 같은 노드/시각/에러의 연속 슬롯은 하나의 구간으로 합침
+        grouped: Dict[Tuple[str, float, float, str, bool], List[int]] = {}
+        # 실제 불가용 시간의 범위(초): 마지막 실패까지 ~ 직전 성공부터 복구 확인까지
+        bounds: Dict[Tuple[str, float, float, str, bool], List[float]] = {}
+        nodes: Dict[str, Dict[str, Any]] = {}
+        total = 0.0
+        for (
+            slot,
+            node,
+            start,
+            end,
+            error,
+            ongoing,
+            ok_before,
+            last_failed,
+        ) in self.windows:
+            key = (node, start, end, error, ongoing)
+            grouped.setdefault(key, []).append(slot)
+            low, high = bounds.setdefault(key, [last_failed - start, end - ok_before])
+            bounds[key] = [min(low, last_failed - start), max(high, end - ok_before)]
+            duration = end - start
+            total += duration
+            stats = nodes.setdefault(
+                node,
+                {
+                    "slots": set(),
+                    "unavailable_slot_seconds": 0.0,
+                    "longest_gap_ms": 0.0,
+                    "first_start": start,
+                    "last_end": end,
+                },
+            )
+            stats["slots"].add(slot)
+            stats["unavailable_slot_seconds"] += duration
+            stats["longest_gap_ms"] = max(stats["longest_gap_ms"], duration * 1000)
+            stats["first_start"] = min(stats["first_start"], start)
+            stats["last_end"] = max(stats["last_end"], end)
+
+        windows = [
+            {
+                "slots": slot_ranges(slots),
+                "slot_count": len(slots),
+                "node": node,
+                "start": _iso(start),
+                "end": _iso(end),
+                "duration_ms": round((end - start) * 1000, 1),
+                "duration_bounds_ms": [round(b * 1000, 1) for b in bounds[key]],
+                "error": error,
+                "ongoing": ongoing,
+            }
+            for key, slots in sorted(grouped.items(), key=lambda item: item[0][1])
+            for node, start, end, error, ongoing in [key]
+        ]
+        longest = max(windows, key=lambda w: w["duration_ms"], default=None)
+
+        return {
+            "probe_started": _iso(self.started_at),
+            "probe_ended": _iso(self.finished_at or time.time()),
+            # 같은 슬롯을 다시 프로브하기까지의 간격: 구간 경계의 오차 한도
+            "probe_resolution_ms": round(self.resolution * 1000, 1),
+            "unavailable_slot_seconds": round(total, 3),
+            "slots_affected": len({w[0] for w in self.windows}),
+            "longest_gap_ms": longest["duration_ms"] if longest else 0.0,
+            "longest_gap": longest,
+            "redirects": {
+                "moved": sum(c["moved"] for c in self.redirects.values()),
+                "ask": sum(c["ask"] for c in self.redirects.values()),
+                "by_node": self.redirects,
+            },
+            "nodes": {
+                node: {
+                    "slots_affected": len(stats["slots"]),
+                    "unavailable_slot_seconds": round(
+                        stats["unavailable_slot_seconds"], 3
+                    ),
+                    "longest_gap_ms": round(stats["longest_gap_ms"], 1),
+                    "first_start": _iso(stats["first_start"]),
+                    "last_end": _iso(stats["last_end"]),
+                }
+                for node, stats in sorted(nodes.items())
+            },
+            "windows": windows[:MAX_WINDOWS],
+            "windows_truncated": len(windows) > MAX_WINDOWS,
+            "topology_events": self.events,
+        }
+
+
+class SlotAvailabilityProber:
+    """슬롯별 카나리 키를 담당 primary에 직접 보내는 프로버"""
+
+    def __init__(
+        self,
+        env: Environment,
+        interval_ms: int = DEFAULT_PROBE_INTERVAL_MS,
+        slots_per_round: int = DEFAULT_PROBE_SLOTS,
+        timeout_ms: int = DEFAULT_PROBE_TIMEOUT_MS,
+        topology_interval: float = DEFAULT_TOPOLOGY_INTERVAL,
+    ):
+        """
+        Args:
+            env: 실행 환경 ('local', 'dev', 'prd')
+            interval_ms: 프로브 라운드 간격
+            slots_per_round: 라운드마다 프로브할 슬롯 수 (최대 16384, 모든 슬롯)
+            timeout_ms: 노드 응답 제한 시간, 넘으면 그 노드의 슬롯은 불가용
+            topology_interval: CLUSTER SLOTS 재조회 간격(초)
+        """
+        self.env = env
+        self.interval = interval_ms / 1000
+        # 라운드 r은 r % stride 슬롯부터 stride 간격으로 프로브
+        self.stride = -(-REDIS_CLUSTER_HASH_SLOTS // max(1, slots_per_round))
+        self._round = 0
+        self.timeout = timeout_ms / 1000
+        self.topology_interval = topology_interval
+        self.keys = canary_keys()
+        self.timeline = SlotTimeline(self.sweep_seconds)
+        self.slot_owner: List[str] = [""] * REDIS_CLUSTER_HASH_SLOTS
+        self.clients: Dict[str, Redis] = {}
+        self.running = False
+        self._topology_at = 0.0
+        self._refresh_needed = True
+
+    @property
+    def slots_per_round(self) -> int:
+        return -(-REDIS_CLUSTER_HASH_SLOTS // self.stride)
+
+    @property
+    def probe_rate(self) -> float:
+        """초당 프로브 SET 수 (응답 시간은 빼고 계산한 상한)"""
+        return self.slots_per_round / self.interval if self.interval else 0.0
+
+    @property
+    def sweep_seconds(self) -> float:
+        """모든 슬롯을 한 번씩 프로브하는 데 걸리는 시간(초)"""
+        return self.stride * self.interval
+
+    def _client(self, node: str) -> Redis:
+        if node not in self.clients:
+            host, port = node.rsplit(":", 1)
+            self.clients[node] = Redis(
+                host=host,
+                port=int(port),
+                decode_responses=True,
+                socket_connect_timeout=self.timeout,
+                socket_timeout=self.timeout,
+            )
+        return self.clients[node]
+
+    async def refresh_topology(self) -> bool:
+        """
+        CLUSTER SLOTS로 슬롯 담당 primary를 갱신하고 바뀐 부분을 이벤트로 기록
+
+        Returns:
+            bool: 응답한 노드가 있었는지 여부
+        """
+        self._topology_at = time.time()
+        startup = [f"{n.host}:{n.port}" for n in get_cluster_nodes(self.env)]
+        for node in dict.fromkeys(list(self.clients) + startup):
+            try:
+                reply = await asyncio.wait_for(
+                    self._client(node).execute_command("CLUSTER SLOTS"), self.timeout
+                )
+            except Exception:
+                continue
+            owner = [""] * REDIS_CLUSTER_HASH_SLOTS
+            for entry in reply:
+                start, end, primary = int(entry[0]), int(entry[1]), entry[2]
+                # 빈 host는 질의한 노드 자신
+                host = primary[0] or node.rsplit(":", 1)[0]
+                owner[start : end + 1] = [f"{host}:{primary[1]}"] * (end - start + 1)
+            self._apply_topology(owner, time.time())
+            self._refresh_needed = False
+            return True
+        return False
+
+    def _apply_topology(self, owner: List[str], t: float):
+        old = self.slot_owner
+        self.slot_owner = owner
+        if not any(old):
+            primaries = sorted(set(owner) - {""})
+            self.timeline.record_event(t, "topology_loaded", primaries=primaries)
+            return
+
+        moves: Dict[Tuple[str, str], List[int]] = {}
+        for slot in range(REDIS_CLUSTER_HASH_SLOTS):
+            if owner[slot] != old[slot]:
+                moves.setdefault((old[slot], owner[slot]), []).append(slot)
+        for (src, dst), slots in moves.items():
+            ranges = slot_ranges(slots)
+            self.timeline.record_event(
+                t,
+                "slot_owner_changed",
+                slots=ranges,
+                slot_count=len(slots),
+                from_node=src or UNCOVERED,
+                to_node=dst or UNCOVERED,
+            )
+            print(
+                f"🔀 Topology: slots {ranges} {src or UNCOVERED} → {dst or UNCOVERED}"
+            )
+
+        old_nodes, new_nodes = set(old) - {""}, set(owner) - {""}
+        for node in sorted(new_nodes - old_nodes):
+            self.timeline.record_event(t, "primary_added", node=node)
+        for node in sorted(old_nodes - new_nodes):
+            self.timeline.record_event(t, "primary_removed", node=node)
+
+    async def _send(
+        self, node: str, slots: List[int], asking: bool = False
+    ) -> List[Any]:
+        pipe = self._client(node).pipeline(transaction=False)
+        value = str(int(time.time() * 1000))
+        for slot in slots:
+            if asking:
+                pipe.execute_command("ASKING")
+            pipe.set(self.keys[slot], value, px=60000)
+        try:
+            replies = await asyncio.wait_for(
+                pipe.execute(raise_on_error=False), self.timeout
+            )
+        except Exception as e:
+            return [e] * len(slots)
+        # ASKING 응답은 버리고 SET 응답만
+        return replies[1::2] if asking else replies
+
+    def _report(self, node: str, slots: List[int], replies: List[Any], t: float):
+        ok: List[int] = []
+        failed: Dict[str, List[int]] = {}
+        for slot, reply in zip(slots, replies):
+            if isinstance(reply, Exception):
+                failed.setdefault(_error_text(reply), []).append(slot)
+            else:
+                ok.append(slot)
+
+        recovered, longest = self.timeline.record_ok(ok, t)
+        if recovered:
+            print(
+                f"✅ {recovered} slots available again on {node} "
+                f"(longest gap {longest:.0f}ms)"
+            )
+        for error, error_slots in failed.items():
+            new = self.timeline.record_failure(error_slots, node, t, error)
+            if new:
+                print(f"🚨 {new} slots unavailable on {node}: {error}")
+        if failed:
+            self._refresh_needed = True
+
+    async def _probe_node(self, node: str, slots: List[int]):
+        if node == UNCOVERED:
+            error = RuntimeError("slot not covered")
+            self._report(node, slots, [error] * len(slots), time.time())
+            return
+
+        replies = await self._send(node, slots)
+        t = time.time()
+        moved: List[int] = []
+        asks: Dict[str, List[int]] = {}
+        for slot, reply in zip(slots, replies):
+            if isinstance(reply, MovedError):
+                moved.append(slot)
+            elif isinstance(reply, AskError):
+                asks.setdefault(f"{reply.host}:{reply.port}", []).append(slot)
+
+        # MOVED: 다른 노드가 담당하게 됨, 토폴로지를 다시 읽고 다음 라운드에 확인
+        if moved:
+            self.timeline.record_redirect(node, "moved", len(moved))
+            self._refresh_needed = True
+        redirected = set(moved)
+        # ASK: 이전 중인 슬롯, 대상 노드에 ASKING과 함께 다시 보냄
+        for target, ask_slots in asks.items():
+            self.timeline.record_redirect(node, "ask", len(ask_slots))
+            redirected.update(ask_slots)
+            ask_replies = await self._send(target, ask_slots, asking=True)
+            self._report(target, ask_slots, ask_replies, time.time())
+
+        if redirected:
+            kept = [(s, r) for s, r in zip(slots, replies) if s not in redirected]
+            slots, replies = [s for s, _ in kept], [r for _, r in kept]
+        self._report(node, slots, replies, t)
+
+    async def probe_round(self):
+        """이번 라운드의 슬롯들을 담당 노드별 파이프라인으로 한 번씩 프로브"""
+        stale = time.time() - self._topology_at >= self.topology_interval
+        if self._refresh_needed or stale:
+            await self.refresh_topology()
+        offset = self._round % self.stride
+        self._round += 1
+        by_node: Dict[str, List[int]] = {}
+        for slot in range(offset, REDIS_CLUSTER_HASH_SLOTS, self.stride):
+            node = self.slot_owner[slot]
+            by_node.setdefault(node or UNCOVERED, []).append(slot)
+        await asyncio.gather(
+            *(self._probe_node(node, slots) for node, slots in by_node.items())
+        )
+
+    async def run(self):
+        """running이 False가 될 때까지 interval마다 프로브"""
+        self.running = True
+        next_at = time.perf_counter()
+        while self.running:
+            await self.probe_round()
+            next_at = max(next_at + self.interval, time.perf_counter())
+            await asyncio.sleep(next_at - time.perf_counter())
+        self.timeline.finish(time.time())
+
+    async def close(self):
+        for client in self.clients.values():
+            await client.aclose()
+
+
+def print_timeline_summary(summary: Dict[str, Any]):
+    """가용성 타임라인 요약 출력"""
+    print("\n🧭 Availability timeline:")
+    print(f"   Unavailable slot-seconds: {summary['unavailable_slot_seconds']}")
+    print(f"   Slots affected: {summary['slots_affected']}")
+    print(
+        f"   Per-slot resolution: {summary['probe_resolution_ms']}ms "
+        "(window edges are the probes that saw each change)"
+    )
+    longest = summary["longest_gap"]
+    if longest:
+        print(
+            f"   Longest gap: {longest['duration_ms']}ms on {longest['node']} "
+            f"(slots {longest['slots']}, {longest['start']} → {longest['end']})"
+        )
+    redirects = summary["redirects"]
+    print(f"   Redirects: MOVED {redirects['moved']}, ASK {redirects['ask']}")
+    changes = [e for e in summary["topology_events"] if e["type"] != "topology_loaded"]
+    print(f"   Topology changes: {len(changes)}")
+    for window in summary["windows"][:10]:
+        state = " (ongoing)" if window["ongoing"] else ""
+        low, high = window["duration_bounds_ms"]
+        print(
+            f"   - {window['start']} slots {window['slots']} on {window['node']}: "
+            f"{window['duration_ms']}ms{state} (actual {low}-{high}ms) "
+            f"[{window['error']}]"
+        )
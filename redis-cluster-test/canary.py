@@ -0,0 +1,113 @@
+"""
+Redis 클러스터 슬롯별 카나리 키
+
+슬롯마다 키 하나를 해시 태그로 만들어 16384개 슬롯을 빠짐없이 덮습니다.
+해시 태그 안의 문자열만 CRC16으로 해시되므로(rc.keyslot과 같은 계산),
+태그를 바꿔 가며 아직 비어 있는 슬롯에 떨어지는 태그를 고릅니다.
+태그 표는 접두사와 무관하므로 한 번 만들어 디스크에 캐시합니다.
+"""
+
+import os
+import json
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+CANARY_PREFIX = "canary"
+# 슬롯별 해시 태그 캐시 (REDIS_CANARY_CACHE로 경로 변경 가능)
+CANARY_CACHE_ENV = "REDIS_CANARY_CACHE"
+DEFAULT_CANARY_CACHE = Path.home() / ".cache" / "redis-cluster-test" / "slot-tags.json"
+
+_slot_tags: Optional[List[str]] = None
+
+
+def _cache_path() -> Path:
+    return Path(os.environ.get(CANARY_CACHE_ENV) or DEFAULT_CANARY_CACHE)
+
+
+def _build_slot_tags() -> List[str]:
+    tags: List[str] = [""] * REDIS_CLUSTER_HASH_SLOTS
+    missing = REDIS_CLUSTER_HASH_SLOTS
+    n = 0
+    while missing:
+        tag = str(n)
+        slot = key_slot(tag.encode())
+        if not tags[slot]:
+            tags[slot] = tag
+            missing -= 1
+        n += 1
+    return tags
+
+
+def _load_cached_tags(path: Path) -> Optional[List[str]]:
+    """캐시된 태그 표, 슬롯이 하나라도 맞지 않으면 None"""
+    try:
+        tags = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return None
+    if not isinstance(tags, list) or len(tags) != REDIS_CLUSTER_HASH_SLOTS:
+        return None
+    for slot, tag in enumerate(tags):
+        if not isinstance(tag, str) or key_slot(tag.encode()) != slot:
+            return None
+    return tags
+
+
+def _save_cached_tags(path: Path, tags: List[str]):
+    # 캐시는 다음 시작을 빠르게 할 뿐이므로 쓰기 실패는 무시
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        tmp.write_text(json.dumps(tags), encoding="utf-8")
+        os.replace(tmp, path)
+    except OSError:
+        pass
+
+
+def slot_tags() -> List[str]:
+    """
+    슬롯별 해시 태그 (프로세스당 한 번, 디스크 캐시 우선)
+
+    Returns:
+        List[str]: 인덱스가 슬롯 번호인 태그 목록 (예: "3560"은 슬롯 0)
+    """
+    global _slot_tags
+    if _slot_tags is None:
+        path = _cache_path()
+        _slot_tags = _load_cached_tags(path)
+        if _slot_tags is None:
+            _slot_tags = _build_slot_tags()
+            _save_cached_tags(path, _slot_tags)
+    return _slot_tags
+
+
+def canary_keys(prefix: str = CANARY_PREFIX) -> List[str]:
+    """
+    슬롯별 카나리 키 목록
+
+    Args:
+        prefix: 키 접두사
+
+    Returns:
+        List[str]: 인덱스가 슬롯 번호인 키 목록 (예: "canary:{3560}"은 슬롯 0)
+    """
+    return [f"{prefix}:{{{tag}}}" for tag in slot_tags()]
+
+
+def coverage_keys(step: int = 1, prefix: str = CANARY_PREFIX) -> List[Tuple[str, int]]:
+    """
+    N개 슬롯마다 키 하나 (step=1이면 모든 슬롯)
+
+    Args:
+        step: 슬롯 간격 (슬롯 0, step, 2*step, ...)
+        prefix: 키 접두사
+
+    Returns:
+        List[Tuple[str, int]]: (키, 슬롯) 목록
+    """
+    tags = slot_tags()
+    return [
+        (f"{prefix}:{{{tags[slot]}}}", slot)
+        for slot in range(0, REDIS_CLUSTER_HASH_SLOTS, max(1, step))
+    ]
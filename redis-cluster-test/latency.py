@@ -0,0 +1,155 @@
+"""
+지연 시간 히스토그램 (HDR 방식 로그 버킷)
+
+응답 시간을 마이크로초 단위로 2의 거듭제곱 구간마다 128개의 선형 하위 버킷에
+기록합니다. 상대 오차는 1% 미만이고, 메모리는 기록한 값의 개수가 아니라
+사용된 버킷 개수에 비례하므로 사이클/노드별 히스토그램을 그대로 합칠 수 있습니다.
+"""
+
+import math
+from typing import Dict, Iterable, Optional
+
+# 하위 버킷 비트 수: 2^(SUB_BUCKET_BITS-1)개의 선형 버킷이 각 2배 구간을 나눔
+SUB_BUCKET_BITS = 8
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+_EXACT = 1 << SUB_BUCKET_BITS
+
+# 결과에 기록할 백분위수 (이름, 값)
+PERCENTILES = (("p50", 50.0), ("p90", 90.0), ("p99", 99.0), ("p99_9", 99.9))
+
+
+def _bucket_index(value_us: int) -> int:
+    if value_us < _EXACT:
+        return value_us
+    shift = value_us.bit_length() - SUB_BUCKET_BITS
+    return shift * _HALF + (value_us >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    """버킷에 속하는 가장 큰 값 (마이크로초)"""
+    if index < _EXACT:
+        return index
+    shift = index // _HALF - 1
+    mantissa = index - shift * _HALF
+    return ((mantissa + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """로그 버킷 지연 시간 히스토그램 (병합 가능)"""
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.total_us = 0
+        self.min_us: Optional[int] = None
+        self.max_us = 0
+
+    def record(self, ms: float, count: int = 1):
+        """
+        응답 시간 기록
+
+        Args:
+            ms: 응답 시간 (밀리초)
+            count: 같은 값으로 기록할 횟수 (파이프라인의 명령 수 등)
+        """
+        value_us = max(0, int(ms * 1000))
+        index = _bucket_index(value_us)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.count += count
+        self.total_us += value_us * count
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def merge(self, other: "LatencyHistogram"):
+        """다른 히스토그램을 합침 (버킷 개수에 비례하는 비용)"""
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.count += other.count
+        self.total_us += other.total_us
+        if other.min_us is not None and (
+            self.min_us is None or other.min_us < self.min_us
+        ):
+            self.min_us = other.min_us
+        self.max_us = max(self.max_us, other.max_us)
+
+    def mean_ms(self) -> float:
+        return self.total_us / self.count / 1000 if self.count else 0.0
+
+    def percentile_ms(self, percentile: float) -> float:
+        """
+        백분위수 (버킷 상한값, 최댓값을 넘지 않음)
+
+        Args:
+            percentile: 0~100
+
+        Returns:
+            float: 밀리초
+        """
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(self.count * percentile / 100))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(_bucket_upper(index), self.max_us) / 1000
+        return self.max_us / 1000
+
+    def summary(self) -> Dict[str, float]:
+        """count/min/mean/백분위수/max 요약 (밀리초)"""
+        result: Dict[str, float] = {
+            "count": self.count,
+            "min": round((self.min_us or 0) / 1000, 3),
+            "mean": round(self.mean_ms(), 3),
+        }
+        for name, percentile in PERCENTILES:
+            result[name] = round(self.percentile_ms(percentile), 3)
+        result["max"] = round(self.max_us / 1000, 3)
+        return result
+
+
+class LatencyRecorder:
+    """전체/명령 종류별/노드별 히스토그램 묶음"""
+
+    def __init__(self):
+        self.overall = LatencyHistogram()
+        self.by_op: Dict[str, LatencyHistogram] = {}
+        self.by_node: Dict[str, LatencyHistogram] = {}
+
+    def record(self, op: str, node: str, ms: float, count: int = 1):
+        """
+        응답 시간 기록
+
+        Args:
+            op: 명령 종류 ('SET', 'GET')
+            node: 담당 노드 ("host:port")
+            ms: 응답 시간 (밀리초)
+            count: 같은 값으로 기록할 횟수
+        """
+        self.overall.record(ms, count)
+        self.by_op.setdefault(op, LatencyHistogram()).record(ms, count)
+        self.by_node.setdefault(node, LatencyHistogram()).record(ms, count)
+
+    def merge(self, other: "LatencyRecorder"):
+        """다른 묶음을 합침"""
+        self.overall.merge(other.overall)
+        for name, hist in other.by_op.items():
+            self.by_op.setdefault(name, LatencyHistogram()).merge(hist)
+        for name, hist in other.by_node.items():
+            self.by_node.setdefault(name, LatencyHistogram()).merge(hist)
+
+    def op_summaries(self) -> Dict[str, Dict[str, float]]:
+        """{'all': 요약, 'SET': 요약, 'GET': 요약}"""
+        summaries = {"all": self.overall.summary()}
+        summaries.update(_summaries(self.by_op.items()))
+        return summaries
+
+    def node_summaries(self) -> Dict[str, Dict[str, float]]:
+        """{노드: 요약}"""
+        return _summaries(self.by_node.items())
+
+
+def _summaries(items: Iterable) -> Dict[str, Dict[str, float]]:
+    return {name: hist.summary() for name, hist in sorted(items)}
@@ -0,0 +1,536 @@
+#!/usr/bin/env python3
+"""
+Redis 클러스터 개방 루프(open-loop) 부하 생성기
+
+폴러(polling_app.py)는 사이클을 마친 뒤 다음 사이클을 시작하는 폐쇄 루프라서
+클러스터가 느려지면 부하도 같이 줄고 지연이 가려집니다(coordinated omission).
+여기서는 목표 ops/s에 맞춰 요청 시각을 미리 정하고(고정 간격 또는 포아송 도착),
+응답이 늦어져도 일정대로 보내며, 지연 시간을 실제 전송 시각이 아닌
+예정 시각부터 측정합니다. 여러 워커 프로세스가 목표 부하를 나눠 맡습니다.
+"""
+
+import time
+import json
+import random
+import signal
+import asyncio
+import argparse
+import multiprocessing
+from queue import Empty
+from datetime import datetime, timezone
+from dataclasses import asdict
+from typing import Any, Dict, List, Tuple
+
+from redis.crc import key_slot
+
+from latency import LatencyHistogram, LatencyRecorder
+from polling_app import (
+    PollingResult,
+    DEFAULT_PIPELINE_SIZE,
+    MAX_PRINTED_ERRORS,
+    polling_key,
+)
+from redis_common import (
+    Environment,
+    create_async_redis_cluster,
+    save_json_results,
+)
+
+ARRIVALS = ("poisson", "fixed")
+# 워커별 동시 실행 파이프라인 최대 개수 기본값
+DEFAULT_MAX_IN_FLIGHT = 256
+# 워커가 연결을 마칠 때까지 기다린 뒤 모두 같은 시각에 시작
+_START_DELAY = 2.0
+# 통계 보고 간격(초)
+_REPORT_INTERVAL = 1.0
+# 워커 프로세스 생존 확인 간격(초)
+_WORKER_CHECK_INTERVAL = 2.0
+
+
+class _IntervalStats:
+    """워커의 보고 간격 하나 동안의 통계 (프로세스 간 전달용)"""
+
+    def __init__(self):
+        self.latency = LatencyRecorder()
+        # 실패한 요청의 지연 (예정 시각부터 실패 응답까지), 성공 지연과 따로 집계
+        self.error_latency = LatencyHistogram()
+        self.sent = 0
+        self.success = 0
+        self.errors = 0
+        self.misses = 0
+        self.error_samples: List[str] = []
+        self.node_counts: Dict[str, Dict[str, int]] = {}
+        self.backlog = 0
+
+    def merge(self, other: "_IntervalStats"):
+        self.latency.merge(other.latency)
+        self.error_latency.merge(other.error_latency)
+        self.sent += other.sent
+        self.success += other.success
+        self.errors += other.errors
+        self.misses += other.misses
+        room = MAX_PRINTED_ERRORS - len(self.error_samples)
+        self.error_samples.extend(other.error_samples[: max(0, room)])
+        for node, counts in other.node_counts.items():
+            mine = self.node_counts.setdefault(
+                node, {"set_count": 0, "get_count": 0, "errors": 0}
+            )
+            for name, value in counts.items():
+                mine[name] += value
+        self.backlog += other.backlog
+
+
+class _Worker:
+    """
+    워커 프로세스 하나의 개방 루프 스케줄러
+
+    예정 시각이 지난 요청을 노드별로 묶어 파이프라인으로 보내고, 파이프라인의
+    응답 시각과 각 요청의 예정 시각 차이를 지연 시간으로 기록합니다.
+    """
+
+    def __init__(self, worker_id: int, args: argparse.Namespace, queue, stop_event):
+        self.worker_id = worker_id
+        self.args = args
+        self.queue = queue
+        self.stop_event = stop_event
+        self.rate = args.rate / args.workers
+        self.rng = random.Random()
+        self.value = json.dumps({"worker": worker_id, "pad": "x" * args.value_size})
+        self.stats = _IntervalStats()
+        self.outstanding = 0
+        self.arc = None
+        self.keys = [polling_key(i) for i in range(args.keys)]
+        self.key_slots = [key_slot(key.encode()) for key in self.keys]
+        # 키 -> 담당 노드, 토폴로지가 바뀌었을 때만 다시 계산
+        self.key_nodes: List[str] = []
+        self._mapped_table: Tuple[int, int] = (0, 0)
+        self._stale_nodes = True
+
+    def _gap(self) -> float:
+        if self.args.arrival == "poisson":
+            return self.rng.expovariate(self.rate)
+        return 1.0 / self.rate
+
+    def _slot_table(self) -> Tuple[int, int]:
+        # 클라이언트가 슬롯 표를 다시 읽으면 slots_cache가 새 객체가 되고,
+        # MOVED를 받을 때마다 reinitialize_counter가 바뀜
+        arc = self.arc
+        return (
+            id(getattr(arc.nodes_manager, "slots_cache", None)),  # type: ignore
+            getattr(arc, "reinitialize_counter", 0),
+        )
+
+    def _topology_changed(self) -> bool:
+        """에러 응답이나 MOVED가 있었거나 클라이언트가 슬롯 표를 새로 읽었는지"""
+        return self._stale_nodes or self._slot_table() != self._mapped_table
+
+    def _refresh_nodes(self):
+        # 요청마다 노드를 찾지 않도록 미리 매핑 (리다이렉트는 클라이언트가 처리)
+        nodes_manager = self.arc.nodes_manager  # type: ignore
+        self._mapped_table = self._slot_table()
+        self._stale_nodes = False
+        slot_nodes: Dict[int, str] = {}
+        for slot in self.key_slots:
+            if slot not in slot_nodes:
+                try:
+                    slot_nodes[slot] = nodes_manager.get_node_from_slot(slot).name
+                except Exception:
+                    slot_nodes[slot] = "unknown"
+        self.key_nodes = [slot_nodes[slot] for slot in self.key_slots]
+
+    async def _send(
+        self,
+        semaphore: asyncio.Semaphore,
+        node: str,
+        ops: List[Tuple[str, str, float]],
+    ):
+        """파이프라인 하나 전송 (세마포어 대기도 지연 시간에 포함)"""
+        async with semaphore:
+            try:
+                pipe = self.arc.pipeline()  # type: ignore
+                for op, key, _ in ops:
+                    if op == "SET":
+                        pipe.set(key, self.value, ex=300)
+                    else:
+                        pipe.get(key)
+                replies = await pipe.execute(raise_on_error=False)
+            except Exception as e:
+                replies = [e] * len(ops)
+        done = time.perf_counter()
+
+        stats = self.stats
+        counts = stats.node_counts.setdefault(
+            node, {"set_count": 0, "get_count": 0, "errors": 0}
+        )
+        for (op, key, intended), reply in zip(ops, replies):
+            if isinstance(reply, Exception):
+                stats.errors += 1
+                counts["errors"] += 1
+                stats.error_latency.record((done - intended) * 1000)
+                # 페일오버/리샤딩 중일 수 있으므로 다음 보고 때 노드 매핑을 다시 계산
+                self._stale_nodes = True
+                if len(stats.error_samples) < MAX_PRINTED_ERRORS:
+                    stats.error_samples.append(f"{op} {key}: {reply}")
+                continue
+            stats.success += 1
+            counts["set_count" if op == "SET" else "get_count"] += 1
+            if op == "GET" and reply is None:
+                stats.misses += 1
+            stats.latency.record(op, node, (done - intended) * 1000)
+        self.outstanding -= len(ops)
+
+    def _dispatch(self, semaphore: asyncio.Semaphore, due: List[float], tasks: set):
+        by_node: Dict[str, List[Tuple[str, str, float]]] = {}
+        read_ratio = self.args.read_ratio
+        for intended in due:
+            i = self.rng.randrange(len(self.keys))
+            op = "GET" if self.rng.random() < read_ratio else "SET"
+            by_node.setdefault(self.key_nodes[i], []).append(
+                (op, self.keys[i], intended)
+            )
+
+        for node, ops in by_node.items():
+            for i in range(0, len(ops), self.args.pipeline):
+                task = asyncio.ensure_future(
+                    self._send(semaphore, node, ops[i : i + self.args.pipeline])
+                )
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        self.stats.sent += len(due)
+        self.outstanding += len(due)
+
+    def _flush(self):
+        stats, self.stats = self.stats, _IntervalStats()
+        stats.backlog = self.outstanding
+        self.queue.put(("interval", self.worker_id, stats))
+
+    async def _report(self):
+        while True:
+            await asyncio.sleep(_REPORT_INTERVAL)
+            self._flush()
+            if self._topology_changed():
+                self._refresh_nodes()
+
+    async def run(self, start_at: float):
+        self.arc = create_async_redis_cluster(
+            self.args.env, socket_connect_timeout=2, socket_timeout=2
+        )
+        try:
+            await self.arc.initialize()
+            self._refresh_nodes()
+            # 벽시계 기준 공통 시작 시각을 이 프로세스의 단조 시계로 변환
+            start = time.perf_counter() + max(0.0, start_at - time.time())
+            end = start + self.args.duration
+            await asyncio.sleep(max(0.0, start - time.perf_counter()))
+
+            semaphore = asyncio.Semaphore(self.args.max_in_flight)
+            tasks: set = set()
+            reporter = asyncio.ensure_future(self._report())
+            # 고정 간격이면 워커끼리 시작 위치를 엇갈려 요청을 고르게 분산
+            next_at = start + (
+                self.worker_id / self.args.rate if self.args.arrival == "fixed" else 0.0
+            )
+
+            while not self.stop_event.is_set():
+                now = time.perf_counter()
+                if now >= end:
+                    break
+                due = []
+                while next_at <= now:
+                    due.append(next_at)
+                    next_at += self._gap()
+                if due:
+                    self._dispatch(semaphore, due, tasks)
+                await asyncio.sleep(max(0.0, min(next_at, end) - time.perf_counter()))
+
+            if tasks:
+                await asyncio.wait(tasks)
+            reporter.cancel()
+            self._flush()
+        finally:
+            await self.arc.aclose()
+
+
+def _worker_main(
+    worker_id: int, args: argparse.Namespace, queue, stop_event, start_at: float
+):
+    # 중지는 부모 프로세스가 stop_event로 알림
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    try:
+        asyncio.run(_Worker(worker_id, args, queue, stop_event).run(start_at))
+    except Exception as e:
+        queue.put(("failed", worker_id, str(e)))
+    finally:
+        queue.put(("done", worker_id, None))
+
+
+class OpenLoopLoadGenerator:
+    """개방 루프 부하 생성기 (워커 프로세스 관리와 결과 집계)"""
+
+    def __init__(self, args: argparse.Namespace):
+        """
+        Args:
+            args: main()의 명령행 인자 (env, rate, duration, workers, arrival 등)
+        """
+        self.args = args
+        self.env: Environment = args.env
+        self.results: List[PollingResult] = []
+        self.total = _IntervalStats()
+
+    def _add_interval(self, index: int, stats: _IntervalStats):
+        """보고 간격 하나를 폴러와 같은 PollingResult로 기록하고 상태 출력"""
+        self.total.merge(stats)
+        latency_ms = stats.latency.op_summaries()
+        overall = latency_ms["all"]
+        total_operations = stats.success + stats.errors
+        success_rate = (
+            stats.success / total_operations * 100 if total_operations else 0.0
+        )
+        print(
+            f"⏱️  [{index + 1:>4}s] {total_operations / _REPORT_INTERVAL:,.0f} ops/s "
+            f"(target {self.args.rate:,}) | ✅ {success_rate:.1f}% | "
+            f"p50 {overall['p50']}ms | p99 {overall['p99']}ms | "
+            f"p99.9 {overall['p99_9']}ms | max {overall['max']}ms | "
+            f"backlog {stats.backlog}"
+        )
+        if stats.errors:
+            errors = stats.error_latency.summary()
+            print(
+                f"  ❌ {stats.errors} errors | p50 {errors['p50']}ms | "
+                f"p99 {errors['p99']}ms | max {errors['max']}ms"
+            )
+        for error in stats.error_samples:
+            print(f"  ⚠️  {error}")
+
+        result = PollingResult(
+            timestamp=datetime.now(timezone.utc).isoformat(),
+            cycle=index + 1,
+            success_count=stats.success,
+            error_count=stats.errors,
+            total_operations=total_operations,
+            avg_response_time_ms=round(stats.latency.overall.mean_ms(), 2),
+            latency_ms=latency_ms,
+            node_latency_ms=stats.latency.node_summaries(),
+            errors=stats.error_samples,
+            shard_results=stats.node_counts,
+        )
+        self.results.append(result)
+
+    def run(self) -> int:
+        """워커를 띄워 부하를 생성하고 간격별 결과를 집계"""
+        args = self.args
+        start_time = datetime.now(timezone.utc).isoformat()
+        ctx = multiprocessing.get_context("spawn")
+        queue = ctx.Queue()
+        stop_event = ctx.Event()
+        start_at = time.time() + _START_DELAY
+
+        print(
+            f"🚀 Open-loop load: {args.rate:,} ops/s ({args.arrival} arrivals) for "
+            f"{args.duration}s with {args.workers} worker processes, "
+            f"{args.read_ratio:.0%} GET over {args.keys} keys"
+        )
+        print("💡 Latency is measured from each request's intended send time")
+        workers = [
+            ctx.Process(
+                target=_worker_main,
+                args=(i, args, queue, stop_event, start_at),
+                daemon=True,
+            )
+            for i in range(args.workers)
+        ]
+        for worker in workers:
+            worker.start()
+
+        def stop(signum, frame):
+            print(f"\n🛑 Received signal {signum}, stopping...")
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        # 워커들은 같은 시각에 시작해 같은 간격으로 보고하므로, 보고할 워커의
+        # n번째 보고가 모두 모이면 n번째 간격을 출력 (멈춘 워커가 있으면 끝에 출력)
+        pending: Dict[int, Tuple[int, _IntervalStats]] = {}
+        reports = [0] * args.workers
+        printed = 0
+        alive = set(range(args.workers))
+        exited_at: Dict[int, float] = {}
+        failed = 0
+
+        def expected(index: int) -> int:
+            return sum(
+                1 for i in range(args.workers) if i in alive or reports[i] > index
+            )
+
+        while alive:
+            try:
+                kind, worker_id, payload = queue.get(timeout=_WORKER_CHECK_INTERVAL)
+            except Empty:
+                kind = None
+            if kind == "done":
+                alive.discard(worker_id)
+            elif kind == "failed":
+                failed += 1
+                print(f"❌ Worker {worker_id} failed: {payload}")
+            elif kind == "interval":
+                index = reports[worker_id]
+                reports[worker_id] += 1
+                seen, merged = pending.get(index, (0, _IntervalStats()))
+                merged.merge(payload)
+                pending[index] = (seen + 1, merged)
+
+            # "done" 없이 끝난 워커(크래시, OOM, spawn 시 import 실패)는 기다리지
+            # 않음, 종료 직전에 보낸 메시지가 도착할 만큼 기다린 뒤 에러로 처리
+            now = time.monotonic()
+            for worker_id in sorted(alive):
+                if workers[worker_id].is_alive():
+                    continue
+                if now - exited_at.setdefault(worker_id, now) >= _WORKER_CHECK_INTERVAL:
+                    alive.discard(worker_id)
+                    failed += 1
+                    print(
+                        f"❌ Worker {worker_id} exited without reporting "
+                        f"(exit code {workers[worker_id].exitcode})"
+                    )
+
+            while printed in pending and pending[printed][0] >= expected(printed):
+                self._add_interval(printed, pending.pop(printed)[1])
+                printed += 1
+        for index in sorted(pending):
+            self._add_interval(index, pending[index][1])
+
+        for worker in workers:
+            worker.join()
+
+        self._print_summary()
+        self.save_results(start_time)
+        return 1 if failed else 0
+
+    def _print_summary(self):
+        total = self.total
+        overall = total.latency.overall.summary()
+        operations = total.success + total.errors
+        print("\n📈 Final Statistics:")
+        print(f"   Scheduled operations: {total.sent}")
+        print(f"   Successful operations: {total.success}")
+        print(f"   Failed operations: {total.errors}")
+        print(f"   GET misses: {total.misses}")
+        if operations:
+            print(f"   Success rate: {total.success / operations * 100:.2f}%")
+            print(
+                f"   Latency (ms, from intended send time): p50 {overall['p50']} | "
+                f"p90 {overall['p90']} | p99 {overall['p99']} | "
+                f"p99.9 {overall['p99_9']} | max {overall['max']}"
+            )
+        if total.errors:
+            errors = total.error_latency.summary()
+            print(
+                f"   Failed request latency (ms): p50 {errors['p50']} | "
+                f"p99 {errors['p99']} | max {errors['max']}"
+            )
+
+    def save_results(self, start_time: str):
+        """결과를 JSON 파일로 저장"""
+        args = self.args
+        total = self.total
+        operations = total.success + total.errors
+        output_data: Dict[str, Any] = {
+            "test_info": {
+                "environment": self.env,
+                "mode": "open-loop",
+                "target_ops_per_sec": args.rate,
+                "arrival": args.arrival,
+                "workers": args.workers,
+                "key_count": args.keys,
+                "read_ratio": args.read_ratio,
+                "duration_seconds": args.duration,
+                "start_time": start_time,
+                "end_time": datetime.now(timezone.utc).isoformat(),
+            },
+            "summary": {
+                "scheduled_operations": total.sent,
+                "total_operations": operations,
+                "total_successes": total.success,
+                "total_errors": total.errors,
+                "get_misses": total.misses,
+                "overall_success_rate": (
+                    round(total.success / operations * 100, 2) if operations else 0
+                ),
+                "achieved_ops_per_sec": round(
+                    operations / max(len(self.results), 1) / _REPORT_INTERVAL, 1
+                ),
+                "avg_response_time_ms": round(total.latency.overall.mean_ms(), 2),
+                "latency_ms": total.latency.op_summaries(),
+                "node_latency_ms": total.latency.node_summaries(),
+                "error_latency_ms": total.error_latency.summary(),
+            },
+            "intervals": [asdict(result) for result in self.results],
+        }
+
+        try:
+            save_json_results(output_data, f"load-results-{self.env}")
+        except Exception as e:
+            print(f"❌ Failed to save results: {e}")
+
+
+def main():
+    """메인 함수"""
+    parser = argparse.ArgumentParser(description="Redis 클러스터 개방 루프 부하 생성기")
+    parser.add_argument(
+        "--rate", type=int, required=True, help="목표 초당 요청 수 (전체 워커 합계)"
+    )
+    parser.add_argument(
+        "--duration", type=int, default=60, help="부하 지속시간(초) (기본값: 60)"
+    )
+    parser.add_argument(
+        "--workers", type=int, default=1, help="워커 프로세스 수 (기본값: 1)"
+    )
+    parser.add_argument(
+        "--arrival",
+        choices=ARRIVALS,
+        default="poisson",
+        help="요청 간격: poisson(지수 분포) 또는 fixed(고정) (기본값: poisson)",
+    )
+    parser.add_argument(
+        "--keys", type=int, default=10000, help="요청할 키 개수 (기본값: 10000)"
+    )
+    parser.add_argument(
+        "--read-ratio",
+        type=float,
+        default=0.5,
+        help="GET 비율 0~1, 나머지는 SET (기본값: 0.5)",
+    )
+    parser.add_argument(
+        "--value-size", type=int, default=64, help="SET 값 크기(바이트) (기본값: 64)"
+    )
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=DEFAULT_PIPELINE_SIZE,
+        help=f"파이프라인당 최대 요청 수 (기본값: {DEFAULT_PIPELINE_SIZE})",
+    )
+    parser.add_argument(
+        "--max-in-flight",
+        type=int,
+        default=DEFAULT_MAX_IN_FLIGHT,
+        help=f"워커별 동시 실행 파이프라인 최대 개수 (기본값: {DEFAULT_MAX_IN_FLIGHT})",
+    )
+    parser.add_argument(
+        "--env",
+        choices=["local", "dev", "prd"],
+        default="local",
+        help="환경 선택 (기본값: local)",
+    )
+
+    args = parser.parse_args()
+    if args.rate < 1 or args.workers < 1 or args.keys < 1:
+        parser.error("--rate, --workers and --keys must be positive")
+    if not 0.0 <= args.read_ratio <= 1.0:
+        parser.error("--read-ratio must be between 0 and 1")
+
+    raise SystemExit(OpenLoopLoadGenerator(args).run())
+
+
+if __name__ == "__main__":
+    main()
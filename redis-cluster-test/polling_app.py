@@ -9,21 +9,57 @@ Redis 클러스터 무중단 업데이트 테스트를 위한 폴링 애플리
 import time
 import json
 import signal
+import asyncio
 import argparse
 from datetime import datetime, timezone
-from typing import Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass, asdict
+from redis.crc import key_slot
 from redis.cluster import RedisCluster
+from redis.asyncio.cluster import RedisCluster as AsyncRedisCluster
 
 # 공통 모듈 import
+from availability import (
+    SlotAvailabilityProber,
+    print_timeline_summary,
+    DEFAULT_PROBE_INTERVAL_MS,
+    DEFAULT_PROBE_SLOTS,
+    DEFAULT_PROBE_TIMEOUT_MS,
+)
+from canary import coverage_keys
+from latency import LatencyRecorder
 from redis_common import (
     Environment,
     create_redis_cluster,
+    create_async_redis_cluster,
     print_cluster_nodes,
     save_json_results,
     POLLING_KEY_PATTERNS,
 )
 
+# 비동기 폴러 기본값: 동시 실행 파이프라인 수, 파이프라인당 키 수
+DEFAULT_CONCURRENCY = 64
+DEFAULT_PIPELINE_SIZE = 50
+# 사이클마다 출력할 최대 에러 수 (나머지는 errors에만 기록)
+MAX_PRINTED_ERRORS = 10
+# --slot-coverage 키 접두사 (--timeline 프로버의 카나리 키와 겹치지 않도록)
+COVERAGE_PREFIX = "polling:canary"
+
+
+def polling_key(i: int) -> str:
+    """i번째 테스트 키 (POLLING_KEY_PATTERNS를 돌아가며 사용해 여러 샤드에 분산)"""
+    pattern = POLLING_KEY_PATTERNS[i % len(POLLING_KEY_PATTERNS)]
+    return pattern.format(
+        user_id=f"u{i:04d}",
+        session_id=f"s{i:04d}",
+        cache_id=f"c{i:04d}",
+        counter_id=f"cnt{i:04d}",
+        config_id=f"cfg{i:04d}",
+        log_id=f"log{i:04d}",
+        metric_id=f"m{i:04d}",
+        temp_id=f"tmp{i:04d}",
+    )
+
 
 @dataclass
 class PollingResult:
@@ -35,6 +71,8 @@ class PollingResult:
     error_count: int
     total_operations: int
     avg_response_time_ms: float
+    latency_ms: Dict[str, Dict]
+    node_latency_ms: Dict[str, Dict]
     errors: List[str]
     shard_results: Dict[str, Dict]
 
@@ -42,14 +80,29 @@ class PollingResult:
 class RedisClusterPoller:
     """Redis 클러스터 폴링 테스트 관리자"""
 
-    def __init__(self, env: Environment, test_key_count: int = 50):
+    def __init__(
+        self,
+        env: Environment,
+        test_key_count: int = 50,
+        slot_step: Optional[int] = None,
+    ):
         """
         Args:
             env: 실행 환경 ('local', 'dev', 'prd')
             test_key_count: 테스트할 키의 개수 (여러 샤드에 분산됨)
+            slot_step: 지정하면 test_key_count 대신 N개 슬롯마다 카나리 키 하나
         """
         self.env = env
-        self.test_key_count = test_key_count
+        self.slot_step = slot_step
+        # 테스트 키와 슬롯은 시작할 때 한 번만 계산 (rc.keyslot과 같은 CRC16)
+        if slot_step:
+            coverage = coverage_keys(slot_step, COVERAGE_PREFIX)
+            self.test_keys = [key for key, _ in coverage]
+            self.key_slots = dict(coverage)
+        else:
+            self.test_keys = [polling_key(i) for i in range(test_key_count)]
+            self.key_slots = {k: key_slot(k.encode()) for k in self.test_keys}
+        self.test_key_count = len(self.test_keys)
         self.rc: Optional[RedisCluster] = None
         self.running = False
         self.cycle_count = 0
@@ -60,6 +113,10 @@ class RedisClusterPoller:
             "start_time": None,
             "errors_log": [],
         }
+        # 전체 실행의 지연 시간 히스토그램 (사이클마다 병합)
+        self.run_latency = LatencyRecorder()
+        # 슬롯별 가용성 타임라인 요약 (--timeline)
+        self.availability: Optional[Dict] = None
 
     def connect(self) -> bool:
         """Redis 클러스터에 연결"""
@@ -90,19 +147,7 @@ class RedisClusterPoller:
         data = {}
         timestamp = datetime.now(timezone.utc).isoformat()
 
-        for i in range(self.test_key_count):
-            pattern = POLLING_KEY_PATTERNS[i % len(POLLING_KEY_PATTERNS)]
-            key = pattern.format(
-                user_id=f"u{i:04d}",
-                session_id=f"s{i:04d}",
-                cache_id=f"c{i:04d}",
-                counter_id=f"cnt{i:04d}",
-                config_id=f"cfg{i:04d}",
-                log_id=f"log{i:04d}",
-                metric_id=f"m{i:04d}",
-                temp_id=f"tmp{i:04d}",
-            )
-
+        for i, key in enumerate(self.test_keys):
             value = json.dumps(
                 {
                     "cycle": cycle,
@@ -125,10 +170,11 @@ class RedisClusterPoller:
         error_count = 0
         errors = []
         shard_results = {}
-        response_times = []
+        latency = LatencyRecorder()
 
         # 테스트 데이터 생성
         test_data = self.generate_test_data(cycle)
+        key_nodes = self._key_nodes(self.rc)
 
         print(f"\n🔄 Cycle #{cycle} - Testing {len(test_data)} keys across shards...")
 
@@ -138,11 +184,11 @@ class RedisClusterPoller:
                 op_start = time.time()
                 self.rc.set(key, value, ex=300)  # 5분 TTL
                 op_time = (time.time() - op_start) * 1000
-                response_times.append(op_time)
+                latency.record("SET", key_nodes[key], op_time)
                 success_count += 1
 
                 # 샤드별 통계 수집
-                slot = self.rc.keyslot(key)
+                slot = self.key_slots[key]
                 node_info = f"slot_{slot}"
                 if node_info not in shard_results:
                     shard_results[node_info] = {
@@ -164,31 +210,21 @@ class RedisClusterPoller:
                 op_start = time.time()
                 retrieved_value = self.rc.get(key)
                 op_time = (time.time() - op_start) * 1000
-                response_times.append(op_time)
+                latency.record("GET", key_nodes[key], op_time)
 
                 if retrieved_value:
                     success_count += 1
                     # 데이터 무결성 검증
-                    try:
-                        # Handle different response types
-                        if hasattr(retrieved_value, "__await__"):
-                            # If it's awaitable, we can't process it synchronously
-                            error_count += 1
-                            errors.append(f"GET {key}: got awaitable response")
-                        else:
-                            data = json.loads(str(retrieved_value))  # type: ignore
-                            if data.get("cycle") != cycle:
-                                error_count += 1
-                                errors.append(f"GET {key}: cycle mismatch")
-                    except (json.JSONDecodeError, AttributeError, TypeError):
+                    error_msg = self._check_value(key, retrieved_value, cycle)
+                    if error_msg:
                         error_count += 1
-                        errors.append(f"GET {key}: invalid JSON")
+                        errors.append(error_msg)
                 else:
                     error_count += 1
                     errors.append(f"GET {key}: key not found")
 
                 # 샤드별 통계 수집
-                slot = self.rc.keyslot(key)
+                slot = self.key_slots[key]
                 node_info = f"slot_{slot}"
                 if node_info in shard_results:
                     shard_results[node_info]["get_count"] += 1
@@ -200,20 +236,74 @@ class RedisClusterPoller:
                 print(f"  ⚠️  {error_msg}")
 
                 # 샤드별 에러 통계
-                try:
-                    slot = self.rc.keyslot(key)
-                    node_info = f"slot_{slot}"
-                    if node_info in shard_results:
-                        shard_results[node_info]["errors"] += 1
-                except Exception:
-                    pass
+                node_info = f"slot_{self.key_slots[key]}"
+                if node_info in shard_results:
+                    shard_results[node_info]["errors"] += 1
 
         # 결과 계산
         total_operations = len(test_data) * 2  # SET + GET
-        avg_response_time = (
-            sum(response_times) / len(response_times) if response_times else 0
+        return self._build_result(
+            cycle,
+            success_count,
+            error_count,
+            total_operations,
+            latency,
+            errors,
+            shard_results,
         )
 
+    def _key_nodes(self, client) -> Dict[str, str]:
+        """
+        키별 담당 노드 ("host:port"), 사이클마다 슬롯 표에서 한 번 계산
+
+        Args:
+            client: 동기 또는 asyncio 클러스터 클라이언트
+
+        Returns:
+            Dict[str, str]: 키 -> 노드 (담당 노드가 없는 슬롯은 "unknown")
+        """
+        slot_nodes: Dict[int, str] = {}
+        key_nodes = {}
+        for key, slot in self.key_slots.items():
+            if slot not in slot_nodes:
+                try:
+                    node = client.nodes_manager.get_node_from_slot(slot)
+                    slot_nodes[slot] = node.name
+                except Exception:
+                    slot_nodes[slot] = "unknown"
+            key_nodes[key] = slot_nodes[slot]
+        return key_nodes
+
+    @staticmethod
+    def _check_value(key: str, retrieved_value, cycle: int) -> Optional[str]:
+        """GET으로 읽은 값의 무결성 검증, 문제가 있으면 에러 메시지 반환"""
+        try:
+            # Handle different response types
+            if hasattr(retrieved_value, "__await__"):
+                # If it's awaitable, we can't process it synchronously
+                return f"GET {key}: got awaitable response"
+            data = json.loads(str(retrieved_value))  # type: ignore
+            if data.get("cycle") != cycle:
+                return f"GET {key}: cycle mismatch"
+        except (json.JSONDecodeError, AttributeError, TypeError):
+            return f"GET {key}: invalid JSON"
+        return None
+
+    def _build_result(
+        self,
+        cycle: int,
+        success_count: int,
+        error_count: int,
+        total_operations: int,
+        latency: LatencyRecorder,
+        errors: List[str],
+        shard_results: Dict[str, Dict],
+    ) -> PollingResult:
+        """사이클 결과 생성 및 상태 출력"""
+        self.run_latency.merge(latency)
+        avg_response_time = latency.overall.mean_ms()
+        latency_ms = latency.op_summaries()
+
         result = PollingResult(
             timestamp=datetime.now(timezone.utc).isoformat(),
             cycle=cycle,
@@ -221,6 +311,8 @@ class RedisClusterPoller:
             error_count=error_count,
             total_operations=total_operations,
             avg_response_time_ms=round(avg_response_time, 2),
+            latency_ms=latency_ms,
+            node_latency_ms=latency.node_summaries(),
             errors=errors,
             shard_results=shard_results,
         )
@@ -232,6 +324,8 @@ class RedisClusterPoller:
         print(
             f"✅ Success: {success_count}/{total_operations} ({success_rate:.1f}%) | "
             f"⏱️  Avg: {avg_response_time:.1f}ms | "
+            f"p99: {latency_ms['all']['p99']:.1f}ms | "
+            f"Max: {latency_ms['all']['max']:.1f}ms | "
             f"🎯 Shards: {len(shard_results)}"
         )
 
@@ -246,6 +340,7 @@ class RedisClusterPoller:
             "test_info": {
                 "environment": self.env,
                 "test_key_count": self.test_key_count,
+                "slot_step": self.slot_step,
                 "total_cycles": len(results),
                 "start_time": self.total_stats["start_time"],
                 "end_time": datetime.now(timezone.utc).isoformat(),
@@ -256,9 +351,13 @@ class RedisClusterPoller:
                 "total_errors": sum(r.error_count for r in results),
                 "overall_success_rate": 0,
                 "avg_response_time_ms": 0,
+                "latency_ms": self.run_latency.op_summaries(),
+                "node_latency_ms": self.run_latency.node_summaries(),
             },
             "cycles": [asdict(result) for result in results],
         }
+        if self.availability is not None:
+            output_data["availability"] = self.availability
 
         # 전체 통계 계산
         if output_data["summary"]["total_operations"] > 0:
@@ -271,10 +370,10 @@ class RedisClusterPoller:
                 2,
             )
 
-        if results:
-            output_data["summary"]["avg_response_time_ms"] = round(
-                sum(r.avg_response_time_ms for r in results) / len(results), 2
-            )
+        # 사이클 평균의 평균이 아니라 전체 명령의 평균
+        output_data["summary"]["avg_response_time_ms"] = round(
+            self.run_latency.overall.mean_ms(), 2
+        )
 
         try:
             save_json_results(output_data, f"polling-results-{self.env}")
@@ -305,11 +404,7 @@ class RedisClusterPoller:
                 try:
                     result = self.run_polling_cycle(self.cycle_count)
                     results.append(result)
-
-                    # 전체 통계 업데이트
-                    self.total_stats["total_cycles"] += 1
-                    self.total_stats["total_successes"] += result.success_count
-                    self.total_stats["total_errors"] += result.error_count
+                    self._record_result(result)
 
                 except Exception as e:
                     print(f"❌ Cycle #{self.cycle_count} failed: {e}")
@@ -328,28 +423,339 @@ class RedisClusterPoller:
 
         finally:
             self.running = False
+            self._print_final_stats()
+
+            # 결과 저장
+            if results:
+                self.save_results(results)
+
+    def _record_result(self, result: PollingResult):
+        """전체 통계 업데이트"""
+        self.total_stats["total_cycles"] += 1
+        self.total_stats["total_successes"] += result.success_count
+        self.total_stats["total_errors"] += result.error_count
+
+    def _print_final_stats(self):
+        """최종 통계 출력"""
+        print("\n📈 Final Statistics:")
+        print(f"   Cycles completed: {self.total_stats['total_cycles']}")
+        print(
+            f"   Total operations: {self.total_stats['total_successes'] + self.total_stats['total_errors']}"
+        )
+        print(f"   Successful operations: {self.total_stats['total_successes']}")
+        print(f"   Failed operations: {self.total_stats['total_errors']}")
+
+        if (
+            self.total_stats["total_successes"] + self.total_stats["total_errors"]
+            > 0
+        ):
+            success_rate = (
+                self.total_stats["total_successes"]
+                / (
+                    self.total_stats["total_successes"]
+                    + self.total_stats["total_errors"]
+                )
+            ) * 100
+            print(f"   Overall success rate: {success_rate:.2f}%")
 
-            # 최종 통계 출력
-            print("\n📈 Final Statistics:")
-            print(f"   Cycles completed: {self.total_stats['total_cycles']}")
+        if self.run_latency.overall.count:
+            overall = self.run_latency.overall.summary()
             print(
-                f"   Total operations: {self.total_stats['total_successes'] + self.total_stats['total_errors']}"
+                f"   Latency (ms): p50 {overall['p50']} | p90 {overall['p90']} | "
+                f"p99 {overall['p99']} | p99.9 {overall['p99_9']} | max {overall['max']}"
             )
-            print(f"   Successful operations: {self.total_stats['total_successes']}")
-            print(f"   Failed operations: {self.total_stats['total_errors']}")
-
-            if (
-                self.total_stats["total_successes"] + self.total_stats["total_errors"]
-                > 0
-            ):
-                success_rate = (
-                    self.total_stats["total_successes"]
-                    / (
-                        self.total_stats["total_successes"]
-                        + self.total_stats["total_errors"]
-                    )
-                ) * 100
-                print(f"   Overall success rate: {success_rate:.2f}%")
+
+
+class AsyncRedisClusterPoller(RedisClusterPoller):
+    """asyncio 클러스터 클라이언트 기반 폴러
+
+    사이클의 키를 담당 노드별로 묶어 SET 파이프라인, 이어서 GET 파이프라인으로
+    보내고, 여러 배치를 동시에 실행합니다. 결과는 PollingResult 그대로입니다.
+    """
+
+    def __init__(
+        self,
+        env: Environment,
+        test_key_count: int = 50,
+        slot_step: Optional[int] = None,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        pipeline_size: int = DEFAULT_PIPELINE_SIZE,
+        prober: Optional[SlotAvailabilityProber] = None,
+    ):
+        """
+        Args:
+            env: 실행 환경 ('local', 'dev', 'prd')
+            test_key_count: 테스트할 키의 개수 (여러 샤드에 분산됨)
+            slot_step: 지정하면 test_key_count 대신 N개 슬롯마다 카나리 키 하나
+            concurrency: 동시에 실행할 파이프라인 최대 개수
+            pipeline_size: 배치 하나에 담을 키 개수 (SET, GET 파이프라인 하나씩)
+            prober: 사이클과 함께 실행할 슬롯별 가용성 프로버 (선택)
+        """
+        super().__init__(env, test_key_count, slot_step)
+        self.concurrency = max(1, concurrency)
+        self.pipeline_size = max(1, pipeline_size)
+        self.arc: Optional[AsyncRedisCluster] = None
+        self.prober = prober
+        self._probe_task: Optional[asyncio.Future] = None
+
+    async def connect_async(self) -> bool:
+        """asyncio 클라이언트로 Redis 클러스터에 연결"""
+        try:
+            print(f"🔗 Connecting to Redis cluster ({self.env} environment, async)...")
+            self.arc = create_async_redis_cluster(
+                self.env,
+                health_check_interval=5,
+                socket_connect_timeout=2,
+                socket_timeout=2,
+            )
+            await self.arc.initialize()
+            await self.arc.ping()
+
+            print("✅ Connected successfully!")
+            print_cluster_nodes(self.arc, "Available nodes")  # type: ignore
+
+            return True
+
+        except Exception as e:
+            print(f"❌ Connection failed: {e}")
+            return False
+
+    def _plan_batches(self, keys: List[str]) -> List[Tuple[str, List[str]]]:
+        """
+        키를 담당 노드별로 묶어 pipeline_size 단위 배치로 나눔
+
+        Args:
+            keys: 사이클의 키 목록
+
+        Returns:
+            List[Tuple[str, List[str]]]: (노드, 그 노드의 키 목록) 배치 목록
+        """
+        # 담당 노드가 없는 슬롯("unknown")은 파이프라인 실행 시 에러로 집계됨
+        key_nodes = self._key_nodes(self.arc)
+        by_node: Dict[str, List[str]] = {}
+        for key in keys:
+            by_node.setdefault(key_nodes[key], []).append(key)
+
+        batches = []
+        for node, node_keys in by_node.items():
+            for i in range(0, len(node_keys), self.pipeline_size):
+                batches.append((node, node_keys[i : i + self.pipeline_size]))
+        return batches
+
+    async def _execute(
+        self, batch: List[str], queue: Callable[[Any, str], Any]
+    ) -> Tuple[float, List[Any]]:
+        """
+        배치의 키마다 명령 하나씩 담은 파이프라인 실행
+
+        Returns:
+            Tuple[float, List[Any]]: (응답 시간 ms, 응답들; 실패한 명령은 예외 객체)
+        """
+        op_start = time.time()
+        try:
+            pipe = self.arc.pipeline()  # type: ignore
+            for key in batch:
+                queue(pipe, key)
+            replies = await pipe.execute(raise_on_error=False)
+        except Exception as e:
+            replies = [e] * len(batch)
+        return (time.time() - op_start) * 1000, replies
+
+    async def _run_batch(
+        self,
+        semaphore: asyncio.Semaphore,
+        batch: List[str],
+        test_data: Dict[str, str],
+    ) -> Tuple[Tuple[float, List[Any]], Tuple[float, List[Any]]]:
+        """
+        배치 하나를 SET 파이프라인, 이어서 GET 파이프라인으로 실행
+
+        Args:
+            semaphore: 동시 실행 파이프라인 수 제한
+            batch: 한 노드에 속한 키 목록
+            test_data: 키-값 데이터
+
+        Returns:
+            Tuple: ((SET 응답 시간 ms, SET 응답들), (GET 응답 시간 ms, GET 응답들))
+        """
+        async with semaphore:
+            sets = await self._execute(
+                batch, lambda pipe, key: pipe.set(key, test_data[key], ex=300)
+            )
+            # SET 응답을 받은 뒤 보내므로 방금 쓴 값을 읽음
+            gets = await self._execute(batch, lambda pipe, key: pipe.get(key))
+            return sets, gets
+
+    async def run_polling_cycle_async(self, cycle: int) -> PollingResult:
+        """단일 폴링 사이클 실행 (노드별 파이프라인 동시 실행)"""
+        if not self.arc:
+            raise RuntimeError("Redis cluster not connected")
+
+        success_count = 0
+        error_count = 0
+        errors = []
+        shard_results = {}
+        latency = LatencyRecorder()
+
+        # 테스트 데이터 생성
+        test_data = self.generate_test_data(cycle)
+
+        print(f"\n🔄 Cycle #{cycle} - Testing {len(test_data)} keys across shards...")
+
+        batches = self._plan_batches(list(test_data))
+        semaphore = asyncio.Semaphore(self.concurrency)
+        outcomes = await asyncio.gather(
+            *(self._run_batch(semaphore, batch, test_data) for _, batch in batches)
+        )
+
+        printed = 0
+        for (node, batch), (sets, gets) in zip(batches, outcomes):
+            # 파이프라인의 명령은 모두 그 왕복 시간만큼 응답을 기다렸으므로, 성공한
+            # 명령마다 한 번씩 기록 (동기 모드의 명령별 SET/GET 지연과 같은 의미)
+            for op, (op_time, op_replies) in (("SET", sets), ("GET", gets)):
+                ok = sum(not isinstance(reply, Exception) for reply in op_replies)
+                if ok:
+                    latency.record(op, node, op_time, count=ok)
+            set_replies, get_replies = sets[1], gets[1]
+            for key, set_reply, get_reply in zip(batch, set_replies, get_replies):
+                # 샤드별 통계 수집
+                slot = self.key_slots[key]
+                shard = shard_results.setdefault(
+                    f"slot_{slot}", {"set_count": 0, "get_count": 0, "errors": 0}
+                )
+
+                if isinstance(set_reply, Exception):
+                    error_msg = f"SET {key}: {str(set_reply)}"
+                    shard["errors"] += 1
+                else:
+                    error_msg = None
+                    success_count += 1
+                    shard["set_count"] += 1
+
+                get_error = None
+                if isinstance(get_reply, Exception):
+                    get_error = f"GET {key}: {str(get_reply)}"
+                    shard["errors"] += 1
+                else:
+                    shard["get_count"] += 1
+                    if get_reply:
+                        success_count += 1
+                        # 데이터 무결성 검증
+                        check_error = self._check_value(key, get_reply, cycle)
+                        if check_error:
+                            error_count += 1
+                            errors.append(check_error)
+                    else:
+                        error_count += 1
+                        errors.append(f"GET {key}: key not found")
+
+                for msg in (error_msg, get_error):
+                    if msg:
+                        error_count += 1
+                        errors.append(msg)
+                        if printed < MAX_PRINTED_ERRORS:
+                            print(f"  ⚠️  {msg}")
+                        printed += 1
+
+        if printed > MAX_PRINTED_ERRORS:
+            print(f"  ⚠️  ... and {printed - MAX_PRINTED_ERRORS} more errors")
+
+        total_operations = len(test_data) * 2  # SET + GET
+        return self._build_result(
+            cycle,
+            success_count,
+            error_count,
+            total_operations,
+            latency,
+            errors,
+            shard_results,
+        )
+
+    def run(self, duration_seconds: Optional[int] = None):
+        """폴링 테스트 실행 (asyncio 이벤트 루프에서)"""
+        asyncio.run(self._run_async(duration_seconds))
+
+    async def _run_async(self, duration_seconds: Optional[int]):
+        try:
+            if not await self.connect_async():
+                return
+            if not self.prober:
+                await self._poll(duration_seconds)
+                return
+
+            if not await self.prober.refresh_topology():
+                print("❌ Could not read the slot table (CLUSTER SLOTS) for --timeline")
+                return
+            print(
+                f"🧭 Probing {self.prober.slots_per_round} of "
+                f"{len(self.prober.keys)} slots every "
+                f"{self.prober.interval * 1000:.0f}ms "
+                f"(~{self.prober.probe_rate:.0f} ops/s, every slot every "
+                f"{self.prober.sweep_seconds:.1f}s)"
+            )
+            self._probe_task = asyncio.ensure_future(self.prober.run())
+            await self._poll(duration_seconds)
+        finally:
+            if self.prober:
+                await self.prober.close()
+            if self.arc:
+                await self.arc.aclose()
+
+    async def _stop_prober(self):
+        """프로버를 멈추고 가용성 타임라인 요약을 결과에 추가"""
+        if not (self.prober and self._probe_task):
+            return
+        self.prober.running = False
+        await self._probe_task
+        self.availability = self.prober.timeline.summary()
+        print_timeline_summary(self.availability)
+
+    async def _poll(self, duration_seconds: Optional[int]):
+        self.running = True
+        self.total_stats["start_time"] = datetime.now(timezone.utc).isoformat()
+        results = []
+
+        print("\n🚀 Starting Redis cluster polling test (async)...")
+        print(f"📊 Testing {self.test_key_count} keys per cycle")
+        print(
+            f"⚡ Up to {self.concurrency} pipelines in flight, "
+            f"{self.pipeline_size} keys per pipeline "
+            "(SET and GET pipelines; each command's latency is its pipeline round trip)"
+        )
+        if duration_seconds:
+            print(f"⏰ Duration: {duration_seconds} seconds")
+        print("💡 Press Ctrl+C to stop gracefully\n")
+
+        start_time = time.time()
+
+        try:
+            while self.running:
+                self.cycle_count += 1
+
+                try:
+                    result = await self.run_polling_cycle_async(self.cycle_count)
+                    results.append(result)
+                    self._record_result(result)
+
+                except Exception as e:
+                    print(f"❌ Cycle #{self.cycle_count} failed: {e}")
+                    self.total_stats["total_errors"] += self.test_key_count * 2
+
+                # 지속시간 체크
+                if duration_seconds and (time.time() - start_time) >= duration_seconds:
+                    print(f"\n⏰ Reached duration limit ({duration_seconds}s)")
+                    break
+
+                # 1초 대기
+                await asyncio.sleep(1)
+
+        except (KeyboardInterrupt, asyncio.CancelledError):
+            print("\n⏹️  Stopping gracefully...")
+
+        finally:
+            self.running = False
+            await self._stop_prober()
+            self._print_final_stats()
 
             # 결과 저장
             if results:
@@ -362,6 +768,12 @@ def main():
     parser.add_argument(
         "--keys", type=int, default=50, help="테스트할 키 개수 (기본값: 50)"
     )
+    parser.add_argument(
+        "--slot-coverage",
+        type=int,
+        metavar="N",
+        help="--keys 대신 N개 슬롯마다 카나리 키 하나 (1이면 16384개 슬롯 전부)",
+    )
     parser.add_argument(
         "--duration", type=int, help="테스트 지속시간(초). 미지정시 무한 실행"
     )
@@ -371,14 +783,80 @@ def main():
         default="local",
         help="환경 선택 (기본값: local)",
     )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="asyncio 클라이언트로 노드별 파이프라인을 동시에 실행",
+    )
+    parser.add_argument(
+        "--timeline",
+        action="store_true",
+        help="슬롯별 카나리 키로 불가용 구간/리다이렉트/토폴로지 변경 기록 (--async 포함)",
+    )
+    parser.add_argument(
+        "--probe-interval-ms",
+        type=int,
+        default=DEFAULT_PROBE_INTERVAL_MS,
+        help=f"--timeline: 프로브 라운드 간격(ms) (기본값: {DEFAULT_PROBE_INTERVAL_MS})",
+    )
+    parser.add_argument(
+        "--probe-slots",
+        type=int,
+        default=DEFAULT_PROBE_SLOTS,
+        help=f"--timeline: 라운드마다 프로브할 슬롯 수 (기본값: 모든 슬롯 {DEFAULT_PROBE_SLOTS}, "
+        "줄이면 슬롯별 해상도가 16384 / 이 값 라운드로 떨어짐)",
+    )
+    parser.add_argument(
+        "--probe-timeout-ms",
+        type=int,
+        default=DEFAULT_PROBE_TIMEOUT_MS,
+        help=f"--timeline: 노드 응답 제한 시간(ms) (기본값: {DEFAULT_PROBE_TIMEOUT_MS})",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help=f"--async: 동시에 실행할 파이프라인 최대 개수 (기본값: {DEFAULT_CONCURRENCY})",
+    )
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=DEFAULT_PIPELINE_SIZE,
+        help=f"--async: 파이프라인당 키 개수 (기본값: {DEFAULT_PIPELINE_SIZE})",
+    )
 
     args = parser.parse_args()
+    if args.slot_coverage is not None and args.slot_coverage < 1:
+        parser.error("--slot-coverage must be positive")
+    if args.probe_slots < 1 or args.probe_interval_ms < 1:
+        parser.error("--probe-slots and --probe-interval-ms must be positive")
 
     # Type validation - ensure args.env is a valid Environment
     env: Environment = args.env  # type: ignore - validated by argparse choices
 
     # 우아한 종료를 위한 시그널 핸들러
-    poller = RedisClusterPoller(env=env, test_key_count=args.keys)
+    if args.use_async or args.timeline:
+        prober = None
+        if args.timeline:
+            prober = SlotAvailabilityProber(
+                env,
+                interval_ms=args.probe_interval_ms,
+                slots_per_round=args.probe_slots,
+                timeout_ms=args.probe_timeout_ms,
+            )
+        poller = AsyncRedisClusterPoller(
+            env=env,
+            test_key_count=args.keys,
+            slot_step=args.slot_coverage,
+            concurrency=args.concurrency,
+            pipeline_size=args.pipeline,
+            prober=prober,
+        )
+    else:
+        poller = RedisClusterPoller(
+            env=env, test_key_count=args.keys, slot_step=args.slot_coverage
+        )
 
     def signal_handler(signum, frame):
         print(f"\n🛑 Received signal {signum}, stopping...")
@@ -7,6 +7,10 @@ Redis 클러스터 공통 설정 및 유틸리티 함수
 
 from typing import Literal, List, Optional
 from redis.cluster import RedisCluster, ClusterNode
+from redis.asyncio.cluster import (
+    RedisCluster as AsyncRedisCluster,
+    ClusterNode as AsyncClusterNode,
+)
 from redis.exceptions import RedisClusterException
 import json
 
@@ -72,6 +76,32 @@ def create_redis_cluster(env: Environment, **kwargs) -> RedisCluster:
     return RedisCluster(**default_config)
 
 
+def create_async_redis_cluster(env: Environment, **kwargs) -> AsyncRedisCluster:
+    """
+    asyncio Redis 클러스터 클라이언트 생성 (연결은 첫 명령 또는 initialize() 시점)
+
+    Args:
+        env: 환경 ('local', 'dev', 'prd')
+        **kwargs: asyncio RedisCluster에 전달할 추가 매개변수
+
+    Returns:
+        AsyncRedisCluster: asyncio Redis 클러스터 객체
+    """
+    # asyncio 클라이언트는 자체 ClusterNode 타입만 받음
+    nodes = [AsyncClusterNode(node.host, node.port) for node in get_cluster_nodes(env)]
+
+    default_config = {
+        "startup_nodes": nodes,
+        "decode_responses": True,
+        "health_check_interval": 30,
+        "socket_connect_timeout": 5,
+        "socket_timeout": 5,
+    }
+    default_config.update(kwargs)
+
+    return AsyncRedisCluster(**default_config)
+
+
 def get_cluster_key_counts(rc: RedisCluster) -> int:
     """
     클러스터의 총 키 개수를 반환
@@ -0,0 +1,127 @@
+import asyncio
+
+import pytest
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS
+
+from availability import UNCOVERED, SlotAvailabilityProber, SlotTimeline, slot_ranges
+
+
+def test_slot_ranges():
+    assert slot_ranges([5, 0, 1, 2, 7, 8]) == "0-2,5,7-8"
+    assert slot_ranges([]) == ""
+
+
+def test_windows_of_one_failure_are_merged():
+    timeline = SlotTimeline()
+    t = timeline.started_at
+    assert timeline.record_failure([0, 1, 2, 3], "a:1", t + 1, "ConnectionError") == 4
+    # Already down: the window keeps its first failure
+    assert timeline.record_failure([2, 3], "a:1", t + 1.5, "TimeoutError") == 0
+    assert timeline.record_ok([0, 1, 2, 3, 9], t + 2) == (4, pytest.approx(1000))
+    timeline.finish(t + 3)
+
+    summary = timeline.summary()
+    assert summary["slots_affected"] == 4
+    assert summary["unavailable_slot_seconds"] == pytest.approx(4.0)
+    assert summary["longest_gap_ms"] == pytest.approx(1000, abs=0.1)
+    assert len(summary["windows"]) == 1
+    window = summary["windows"][0]
+    assert (window["slots"], window["slot_count"]) == ("0-3", 4)
+    assert (window["node"], window["error"], window["ongoing"]) == (
+        "a:1",
+        "ConnectionError",
+        False,
+    )
+    assert summary["nodes"]["a:1"]["slots_affected"] == 4
+
+
+def test_window_bounds_cover_the_unprobed_edges():
+    timeline = SlotTimeline(resolution=0.5)
+    t = timeline.started_at
+    timeline.record_ok([0], t + 1)
+    timeline.record_failure([0], "a:1", t + 1.5, "ConnectionError")
+    timeline.record_failure([0], "a:1", t + 2, "ConnectionError")
+    timeline.record_ok([0], t + 2.5)
+
+    summary = timeline.summary()
+    assert summary["probe_resolution_ms"] == 500.0
+    (window,) = summary["windows"]
+    assert window["duration_ms"] == pytest.approx(1000, abs=0.1)
+    # Down at least from the first to the last failed probe, at most from the
+    # last good probe before it to the first good probe after it
+    assert window["duration_bounds_ms"] == pytest.approx([500, 1500], abs=0.1)
+
+
+def test_windows_split_by_node_error_and_time():
+    timeline = SlotTimeline()
+    t = timeline.started_at
+    timeline.record_failure([0, 1], "a:1", t, "ConnectionError")
+    timeline.record_failure([2], "a:1", t, "TimeoutError")
+    timeline.record_failure([3], "b:2", t, "ConnectionError")
+    timeline.record_failure([4], "a:1", t + 0.5, "ConnectionError")
+    timeline.record_ok([0, 1, 2, 3, 4], t + 1)
+    summary = timeline.summary()
+    assert sorted(w["slots"] for w in summary["windows"]) == ["0-1", "2", "3", "4"]
+    assert set(summary["nodes"]) == {"a:1", "b:2"}
+
+
+def test_open_windows_end_as_ongoing():
+    timeline = SlotTimeline()
+    t = timeline.started_at
+    timeline.record_failure([10, 11], UNCOVERED, t, "RuntimeError: slot not covered")
+    timeline.finish(t + 2)
+    assert timeline.down_since == {}
+    (window,) = timeline.summary()["windows"]
+    assert window["ongoing"]
+    assert window["duration_ms"] == pytest.approx(2000, abs=0.1)
+
+
+def test_redirects_and_events():
+    timeline = SlotTimeline()
+    timeline.record_redirect("a:1", "moved", 3)
+    timeline.record_redirect("a:1", "ask")
+    timeline.record_redirect("b:2", "moved")
+    timeline.record_event(timeline.started_at, "primary_added", node="c:3")
+    summary = timeline.summary()
+    assert summary["redirects"]["moved"] == 4
+    assert summary["redirects"]["ask"] == 1
+    assert summary["redirects"]["by_node"]["a:1"] == {"moved": 3, "ask": 1}
+    assert summary["topology_events"][0]["type"] == "primary_added"
+
+
+@pytest.mark.parametrize("slots_per_round", [256, 1000, REDIS_CLUSTER_HASH_SLOTS])
+def test_rounds_sweep_every_slot(slots_per_round):
+    prober = SlotAvailabilityProber(
+        "local", interval_ms=250, slots_per_round=slots_per_round
+    )
+    half = REDIS_CLUSTER_HASH_SLOTS // 2
+    prober.slot_owner = ["a:1"] * half + ["b:2"] * half
+    prober._refresh_needed = False
+    prober.topology_interval = float("inf")
+    probed = []
+
+    async def probe_node(node, slots):
+        probed.append((node, slots))
+
+    prober._probe_node = probe_node
+
+    async def sweep():
+        for _ in range(prober.stride):
+            await prober.probe_round()
+
+    asyncio.run(sweep())
+    slots = sorted(slot for _node, node_slots in probed for slot in node_slots)
+    assert slots == list(range(REDIS_CLUSTER_HASH_SLOTS))
+    # Every primary is probed every round
+    assert len(probed) == 2 * prober.stride
+    rounds = [probed[i : i + 2] for i in range(0, len(probed), 2)]
+    assert all(sum(len(s) for _n, s in r) <= slots_per_round for r in rounds)
+    assert prober.probe_rate <= slots_per_round * 4
+    assert prober.sweep_seconds == pytest.approx(prober.stride * 0.25)
+
+
+def test_default_probes_every_slot_each_round():
+    prober = SlotAvailabilityProber("local")
+    assert prober.stride == 1
+    assert prober.slots_per_round == REDIS_CLUSTER_HASH_SLOTS
+    assert prober.timeline.resolution == pytest.approx(prober.interval)
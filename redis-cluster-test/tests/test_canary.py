@@ -0,0 +1,46 @@
+import json
+
+import pytest
+from redis.crc import REDIS_CLUSTER_HASH_SLOTS, key_slot
+
+import canary
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    path = tmp_path / "slot-tags.json"
+    monkeypatch.setenv(canary.CANARY_CACHE_ENV, str(path))
+    monkeypatch.setattr(canary, "_slot_tags", None)
+    return path
+
+
+def test_canary_keys_cover_every_slot(cache):
+    keys = canary.canary_keys()
+    assert len(keys) == REDIS_CLUSTER_HASH_SLOTS
+    assert [key_slot(k.encode()) for k in keys] == list(range(REDIS_CLUSTER_HASH_SLOTS))
+    assert len(set(canary.canary_keys("other"))) == REDIS_CLUSTER_HASH_SLOTS
+    assert canary.canary_keys("other")[0].startswith("other:{")
+
+
+def test_coverage_keys_step(cache):
+    keys = canary.coverage_keys(16, prefix="cov")
+    assert [slot for _key, slot in keys] == list(range(0, REDIS_CLUSTER_HASH_SLOTS, 16))
+    assert all(key_slot(key.encode()) == slot for key, slot in keys)
+    assert len(canary.coverage_keys(0)) == REDIS_CLUSTER_HASH_SLOTS
+
+
+def test_tags_are_cached(cache):
+    tags = canary.slot_tags()
+    assert json.loads(cache.read_text()) == tags
+    canary._slot_tags = None
+    assert canary.slot_tags() == tags
+
+
+def test_bad_cache_is_rebuilt(cache):
+    tags = canary._build_slot_tags()
+    cache.write_text(json.dumps(tags[1:] + tags[:1]))
+    assert canary._load_cached_tags(cache) is None
+    assert canary.slot_tags() == tags
+    assert canary._load_cached_tags(cache) == tags
+    cache.write_text("not json")
+    assert canary._load_cached_tags(cache) is None
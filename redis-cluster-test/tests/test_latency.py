@@ -0,0 +1,82 @@
+import random
+
+import pytest
+
+from latency import LatencyHistogram, LatencyRecorder
+
+
+def test_empty_histogram():
+    hist = LatencyHistogram()
+    assert hist.percentile_ms(99) == 0.0
+    assert hist.summary() == {
+        "count": 0,
+        "min": 0.0,
+        "mean": 0.0,
+        "p50": 0.0,
+        "p90": 0.0,
+        "p99": 0.0,
+        "p99_9": 0.0,
+        "max": 0.0,
+    }
+
+
+def test_small_values_are_exact():
+    hist = LatencyHistogram()
+    for us in range(1, 101):
+        hist.record(us / 1000)
+    assert hist.percentile_ms(50) == 0.05
+    assert hist.percentile_ms(99) == 0.099
+    assert hist.percentile_ms(100) == 0.1
+    assert hist.summary()["min"] == 0.001
+
+
+def test_percentiles_within_one_percent():
+    rng = random.Random(1)
+    values = sorted(rng.lognormvariate(0, 1.5) for _ in range(20000))
+    hist = LatencyHistogram()
+    for ms in values:
+        hist.record(ms)
+    for percentile in (50, 90, 99, 99.9):
+        exact = values[int(len(values) * percentile / 100) - 1]
+        assert hist.percentile_ms(percentile) == pytest.approx(exact, rel=0.01)
+    assert hist.percentile_ms(100) == pytest.approx(values[-1], abs=0.001)
+    assert hist.mean_ms() == pytest.approx(sum(values) / len(values), rel=0.001)
+
+
+def test_record_count():
+    hist = LatencyHistogram()
+    hist.record(2.0, count=50)
+    hist.record(10.0)
+    assert hist.count == 51
+    assert hist.percentile_ms(50) == pytest.approx(2.0, rel=0.01)
+    assert hist.percentile_ms(99.9) == pytest.approx(10.0, rel=0.01)
+
+
+def test_merge_matches_single_histogram():
+    rng = random.Random(2)
+    values = [rng.expovariate(0.5) for _ in range(5000)]
+    whole, merged = LatencyHistogram(), LatencyHistogram()
+    parts = [LatencyHistogram() for _ in range(4)]
+    for i, ms in enumerate(values):
+        whole.record(ms)
+        parts[i % 4].record(ms)
+    merged.merge(LatencyHistogram())
+    for part in parts:
+        merged.merge(part)
+    assert merged.summary() == whole.summary()
+    assert merged.counts == whole.counts
+
+
+def test_recorder_groups_by_op_and_node():
+    a, b = LatencyRecorder(), LatencyRecorder()
+    a.record("SET", "n1:7001", 1.0)
+    a.record("GET", "n2:7002", 3.0, count=3)
+    b.record("SET", "n2:7002", 5.0)
+    a.merge(b)
+    ops = a.op_summaries()
+    assert list(ops) == ["all", "GET", "SET"]
+    assert ops["all"]["count"] == 5
+    assert ops["SET"]["max"] == 5.0
+    nodes = a.node_summaries()
+    assert nodes["n1:7001"]["count"] == 1
+    assert nodes["n2:7002"]["count"] == 4